@@ -362,6 +362,10 @@ def subject(name):
         sub = Subject(subpath).persist()
         if isinstance(sub, Subject): subject._cache[fpath] = sub
         return sub
+# Subjects are cached by their canonical path rather than by a content hash (see
+# neuropythy.util.content_hash) because the cache exists to avoid loading the subject, and its
+# content is not known until it has been loaded; caches of values derived from a subject's meshes
+# should be keyed on the meshes' content_hash values instead.
 subject._cache = {}
 
 ####################################################################################################
@@ -33,10 +33,20 @@ from .util import (
     triangle_address,
     triangle_unaddress,
     point_in_triangle,
+    batch_triangle_area,
+    batch_triangle_normal,
+    batch_cartesian_to_barycentric,
+    batch_barycentric_to_cartesian,
+    batch_point_in_triangle,
     point_in_tetrahedron,
     point_in_prism,
     tetrahedral_barycentric_coordinates,
-    prism_barycentric_coordinates)
+    prism_barycentric_coordinates,
+    batch_tetrahedral_barycentric_coordinates,
+    batch_point_in_tetrahedron,
+    batch_prism_barycentric_coordinates,
+    batch_point_in_prism)
 from .mesh import (VertexSet, Tesselation, Mesh, Topology, MapProjection,
-                   to_tess, to_mesh, to_property, tkr_vox2ras)
+                   to_tess, to_mesh, to_property, tkr_vox2ras, to_shared, attach_shared,
+                   load_neuropythy, save_neuropythy, native_format_version, icosphere)
 
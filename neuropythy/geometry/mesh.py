@@ -9,20 +9,24 @@ import numpy.linalg                 as npla
 import scipy                        as sp
 import scipy.spatial                as space
 import scipy.sparse                 as sps
+import scipy.sparse.linalg          as spsla
+import scipy.sparse.csgraph         as csgraph
 import scipy.optimize               as spopt
 import nibabel                      as nib
 import nibabel.freesurfer.mghformat as fsmgh
 import pyrsistent                   as pyr
-import sys, six, pimms
+import os, sys, six, json, tempfile, weakref, multiprocessing, multiprocessing.pool, pimms
 
 if sys.version_info[0] == 3: from   collections import abc as colls
 else:                        import collections            as colls
+from collections import OrderedDict
 
 from .util import (triangle_area, triangle_address, alignment_matrix_3D, rotation_matrix_3D,
                    cartesian_to_barycentric_3D, cartesian_to_barycentric_2D,
-                   barycentric_to_cartesian, point_in_triangle)
-from neuropythy.util import (ObjectWithMetaData, to_affine, zinv)
-from neuropythy.io   import (load, importer)
+                   barycentric_to_cartesian, point_in_triangle, batch_triangle_area)
+from neuropythy.util import (ObjectWithMetaData, to_affine, zinv, simplex_summation_matrix,
+                             precision_policy, apply_precision, content_hash)
+from neuropythy.io   import (load, importer, exporter)
 from functools import reduce
 
 # This function creates the tkr matrix for a volume given the dims
@@ -71,7 +75,7 @@ class VertexSet(ObjectWithMetaData):
         '''
         vset.labels is an array of the integer vertex labels.
         '''
-        return pimms.imm_array(lbls)
+        return pimms.imm_array(apply_precision(lbls, 'index'))
     @pimms.param
     def _properties(props):
         '''
@@ -79,9 +83,11 @@ class VertexSet(ObjectWithMetaData):
         pre-processed input version of the value obj.properties.
         '''
         if props is None: return None
-        if pimms.is_itable(props): return props
-        elif pimms.is_map(props): return pimms.itable(props)
+        if   pimms.is_itable(props): pass
+        elif pimms.is_map(props): props = pimms.itable(props)
         else: raise ValueError('provided properties data must be a mapping')
+        if precision_policy() == 'double': return props
+        return pimms.itable({k:apply_precision(props[k]) for k in six.iterkeys(props)})
     @pimms.value
     def vertex_count(labels):
         '''
@@ -93,7 +99,7 @@ class VertexSet(ObjectWithMetaData):
         '''
         vset.indices is the list of vertex indices for the given vertex-set vset.
         '''
-        return pimms.imm_array(np.asarray(range(vertex_count), dtype=np.int))
+        return pimms.imm_array(apply_precision(np.arange(vertex_count), 'index'))
     @pimms.require
     def validate_vertex_properties_size(_properties, vertex_count):
         '''
@@ -115,7 +121,8 @@ class VertexSet(ObjectWithMetaData):
         '''
         obj.properties is an itable of property values given to the vertex-set obj.
         '''
-        return _properties.set('index', indices).set('label', labels)
+        pp = pimms.itable() if _properties is None else _properties
+        return pp.set('index', indices).set('label', labels)
     @pimms.value
     def repr(vertex_count):
         '''
@@ -126,6 +133,41 @@ class VertexSet(ObjectWithMetaData):
     # Normal Methods
     def __repr__(self):
         return self.repr
+    def __reduce_ex__(self, protocol):
+        # objects attached to shared storage (see to_shared) are pickled as a reference to it
+        d = self.meta_data.get('shared_directory', None)
+        if d is not None and _shared_objects.get(d) is self: return (attach_shared, (d,))
+        return object.__reduce_ex__(self, protocol)
+    def share(self, directory=None):
+        '''
+        obj.share() is equivalent to to_shared(obj).
+        obj.share(directory) is equivalent to to_shared(obj, directory).
+        '''
+        return to_shared(self, directory)
+    def copy(self, **kwargs):
+        '''
+        obj.copy(param1=val1, param2=val2...) yields a duplicate of the given vertex-set object obj
+          in which the given parameters have been replaced with the given values. Parameters whose
+          new values are identical to (or are arrays equal to) the current values are ignored, so
+          that any cached values of obj that depend only on unchanged parameters (e.g., the spatial
+          hashes and normals of a mesh whose properties were changed) are reused by the copy.
+        '''
+        return pimms.imm_copy(self, **self._changed_params(kwargs))
+    def _changed_params(self, kwargs):
+        # the subset of the given parameter dict whose values differ from those of self
+        kw = {}
+        for (k,v) in six.iteritems(kwargs):
+            u = getattr(self, k)
+            if v is u: continue
+            if isinstance(u, np.ndarray) and isinstance(v, np.ndarray) and u.shape == v.shape \
+               and u.dtype == v.dtype and np.array_equal(u, v): continue
+            kw[k] = v
+        # values precomputed for self (see load_neuropythy) are only kept by copies that change
+        # nothing those values depend on
+        if getattr(self, '_precomputed', None) is not None and '_precomputed' not in kw and \
+           any(k not in ('_properties', 'meta_data', '_spatial_hashes') for k in kw):
+            kw['_precomputed'] = None
+        return kw
     def prop(self, name):
         '''
         obj.prop(name) yields the vertex property in the given object with the given name.
@@ -169,6 +211,22 @@ class VertexSet(ObjectWithMetaData):
             else:
                 pp = pp.discard(a)
         return self if pp is self._properties else self.copy(_properties=pp)
+    def _precision_params(self, policy):
+        # the parameters that with_precision() replaces; overloaded by Tesselation and Mesh
+        pp = self._properties
+        if pp is None or pp.row_count == 0: return {}
+        return {'_properties': pimms.itable({k:apply_precision(pp[k], policy=policy)
+                                             for k in six.iterkeys(pp)})}
+    def with_precision(self, policy):
+        '''
+        obj.with_precision(policy) yields a duplicate of the given object whose data are stored
+          according to the given precision policy, which may be 'single' or 'double'; see
+          neuropythy.util.set_precision_policy for details. This converts the properties of obj
+          and, for tesselations and meshes, the faces and coordinates; derived values such as
+          normals are computed in the new precision. Note that if the global precision policy is
+          'single', data cannot be converted back to double precision.
+        '''
+        return self.copy(**self._precision_params(policy))
     def property(self, prop,
                  dtype=Ellipsis,
                  outliers=None,  data_range=None,    clipped=np.inf,
@@ -181,28 +239,84 @@ class VertexSet(ObjectWithMetaData):
         return to_property(self, prop,
                            dtype=dtype,           null=null,
                            outliers=outliers,     data_range=data_range,
-                           clipped=clipped,       weight=weight,
+                           clipped=clipped,       weight=weights,
                            weight_min=weight_min, weight_transform=weight_transform,
                            mask=mask,             valid_range=valid_range,
                            transform=transform,   yield_weight=yield_weight)
 
-    def map(self, f):
+    def map(self, f, vectorized=False):
         '''
         tess.map(f) is equivalent to tess.properties.map(f).
-        '''
-        return self.properties.map(f)
-    def where(self, f, indices=False):
+        tess.map(f, vectorized=True) instead calls f once with the entire properties table, so that
+          f(p)['name'] operates on the whole property array 'name'; f must yield either a vector
+          with one element per vertex or a matrix with one row per vertex, and the result is
+          returned as a numpy array.
+        '''
+        if not vectorized: return self.properties.map(f)
+        res = np.asarray(f(self.properties))
+        if len(res.shape) == 0 or res.shape[0] != self.vertex_count:
+            raise ValueError('vectorized map function must yield one row per vertex')
+        return res
+    def mask(self, f, vectorized=False):
+        '''
+        obj.mask(f) yields a boolean array with one element per vertex in the given vertex-set obj
+          that is True for the vertices for which the predicate f holds. The predicate f may be:
+          * a function, in which case it is applied to each vertex as in obj.map(f), or to the
+            entire properties table at once if the optional argument vectorized is True;
+          * a mapping of property names to conditions, all of which must hold; these are evaluated
+            using numpy over the entire property arrays. Each condition may be a tuple (min, max)
+            (the property must be in the closed interval [min, max]; either may be None), a list
+            or set (the property must be one of the given values), a function (which is called
+            with the property array and must yield a boolean array), or any other value (the
+            property must be equal to the value).
+        For example, obj.mask({'visual_area': [1,2,3], 'eccentricity': (0, 10)}) yields a mask of
+        the vertices in V1-V3 whose eccentricity is between 0 and 10.
+        '''
+        if not pimms.is_map(f):
+            return np.asarray(self.map(f, vectorized=vectorized), dtype=np.bool)
+        props = self.properties
+        res = np.ones(self.vertex_count, dtype=np.bool)
+        for (k,c) in six.iteritems(f):
+            x = np.asarray(props[k])
+            if   hasattr(c, '__call__'):   res &= np.asarray(c(x), dtype=np.bool)
+            elif isinstance(c, tuple):
+                if len(c) != 2: raise ValueError('range conditions must be (min, max) tuples')
+                if c[0] is not None: res &= (x >= c[0])
+                if c[1] is not None: res &= (x <= c[1])
+            elif isinstance(c, (list, colls.Set, np.ndarray)):
+                res &= np.in1d(x, list(c))
+            else: res &= (x == c)
+        return res
+    def where(self, f, indices=False, vectorized=False):
         '''
         obj.where(f) yields a list of vertex labels l such that f(p[l]) yields True, where p is the
           properties value for the vertex-set obj (i.e., p[l] is the property map for the vertex
           with label l. The function f should operate on a dict p which is identical to that passed
           to the method obj.properties.map().
+        obj.where(f, vectorized=True) instead calls f once with the entire properties table and
+          expects a boolean vector; obj.where(conditions) uses a mapping of property names to
+          conditions; see obj.mask() for details.
         The optional third parameter indices (default: False) may be set to True to indicate that
         indices should be returned instead of labels.
         '''
-        idcs = np.where(self.map(f))[0]
+        idcs = np.where(self.mask(f, vectorized=vectorized))[0]
         return idcs if indices else self.labels[idcs]
 
+# to_property() memoizes the properties that it extracts by name from each vertex-set; the memos are
+# kept outside of the (immutable) vertex-sets, keyed by the id of the vertex-set and dropped when it
+# is collected, and each holds at most VertexSet.property_cache_size entries
+_property_caches = {}
+def _property_cache(vset):
+    k = id(vset)
+    ent = _property_caches.get(k)
+    if ent is not None and ent[0]() is vset: return ent[1]
+    def _drop(ref):
+        if _property_caches.get(k, (None,))[0] is ref: del _property_caches[k]
+    cache = OrderedDict()
+    _property_caches[k] = (weakref.ref(vset, _drop), cache)
+    return cache
+VertexSet.property_cache_size = 32
+
 def to_property(obj, prop=None,
                 dtype=Ellipsis,
                 outliers=None,  data_range=None,    clipped=np.inf,
@@ -282,6 +396,18 @@ def to_property(obj, prop=None,
     elif pimms.is_map(obj):        (vset, obj) = (None, obj)
     elif obj is None:              (vset, obj) = (None, None)
     else: ValueError('Data object given to to_properties() is neither a vertex-set nor a mapping')
+    # properties requested by name from a vertex-set are memoized on the vertex-set
+    (cache, cache_key) = (None, None)
+    if vset is not None and pimms.is_str(prop):
+        cache_key = (prop, dtype, outliers, data_range, clipped, weight, weight_min,
+                     weight_transform, mask, valid_range, null, transform, yield_weight)
+        try: hash(cache_key)
+        except TypeError: cache_key = None
+        if cache_key is not None:
+            cache = _property_cache(vset)
+            res = cache.get(cache_key)
+            if res is not None:
+                return tuple([np.array(u) for u in res]) if yield_weight else np.array(res)
     # Now, get the property array, as an array
     if pimms.is_str(prop):
         if obj is None: raise ValueError('a property name but no data object given to to_property')
@@ -309,15 +435,20 @@ def to_property(obj, prop=None,
     elif not pimms.is_vector(prop):
         raise ValueError('prop must be a property name or a vector or a combination of these')
     if dtype is Ellipsis:  dtype = np.asarray(prop).dtype
-    if not np.isnan(null): prop  = np.asarray([np.nan if x == null else x for x in prop])
+    prop = np.asarray(prop)
+    if not np.isnan(null):
+        isnull = (prop == null)
+        if np.any(isnull):
+            prop = np.array(prop, dtype=np.float)
+            prop[isnull] = np.nan
     prop = np.asarray(prop, dtype=dtype)
+    n = len(prop)
     # Next, do the same for weight:
     if pimms.is_str(weight):
         if obj is None: raise ValueError('a weight name but no data object given to to_property')
         else: weight = obj[weight]
-    weight_orig = weight
     if weight is None or weight_min is None:
-        low_weight = []
+        low_weight = np.zeros(n, dtype=np.bool)
     else:
         if weight_transform is Ellipsis:
             weight = np.array(weight, dtype=np.float)
@@ -327,36 +458,40 @@ def to_property(obj, prop=None,
             weight = weight_transform(np.asarray(weight))
         if not pimms.is_vector(weight, 'real'):
             raise ValueError('weight must be a real-valued vector or property name for such')
-        low_weight = [] if weight_min is None else np.where(weight <= weight_min)[0]
-    # Next, find the mask; these are values that can be included theoretically;
-    all_vertices = np.asarray(range(len(prop)), dtype=np.int)
-    where_nan = np.where(np.isnan(prop))[0]
-    where_inf = np.where(np.isinf(prop))[0]
-    where_ok  = reduce(np.setdiff1d, [all_vertices, where_nan, where_inf])
-    # look at the valid_range...
-    where_inv = [] if valid_range is None else \
-                where_ok[(prop[where_ok] < valid_range[0]) | (prop[where_ok] > valid_range[1])]
-    # Whittle down the mask to what we are sure is in the spec:
-    where_nan = np.union1d(where_nan, where_inv)
-    mask = np.setdiff1d(all_vertices if mask is None else all_vertices[mask], where_nan)
-    # Find the outliers: values specified as outliers or inf values; will build this as we go
-    outliers = [] if outliers is None else all_vertices[outliers]
-    outliers = np.intersect1d(outliers, mask) # outliers not in the mask don't matter anyway
-    outliers = np.union1d(outliers, low_weight) # low-weight vertices are treated as outliers
-    # If there's a data range argument, deal with how it affects outliers
-    if data_range is not None:
-        if hasattr(data_range, '__iter__'):
-            outliers = np.union1d(outliers, mask[np.where(prop[mask] < data_range[0])[0]])
-            outliers = np.union1d(outliers, mask[np.where(prop[mask] > data_range[1])[0]])
+        low_weight = (weight <= weight_min)
+    # Next, find the mask; these are values that can be included theoretically; all of these are
+    # boolean vectors over the vertices
+    all_vertices = np.arange(n)
+    where_nan = np.isnan(prop)
+    where_inf = np.isinf(prop)
+    where_ok  = ~(where_nan | where_inf)
+    with np.errstate(invalid='ignore'):
+        # look at the valid_range...
+        if valid_range is not None:
+            where_nan |= where_ok & ((prop < valid_range[0]) | (prop > valid_range[1]))
+        # Whittle down the mask to what we are sure is in the spec:
+        if mask is None: mask = np.ones(n, dtype=np.bool)
+        else:
+            tmp = np.zeros(n, dtype=np.bool)
+            tmp[all_vertices[mask]] = True
+            mask = tmp
+        mask &= ~where_nan
+        # Find the outliers: values specified as outliers or inf values
+        if outliers is None: outliers = np.zeros(n, dtype=np.bool)
         else:
-            outliers = np.union1d(outliers, mask[np.where(prop[mask] < 0)[0]])
-            outliers = np.union1d(outliers, mask[np.where(prop[mask] > data_range)[0]])
+            tmp = np.zeros(n, dtype=np.bool)
+            tmp[all_vertices[outliers]] = True
+            outliers = tmp
+        outliers &= mask # outliers not in the mask don't matter anyway
+        outliers |= low_weight # low-weight vertices are treated as outliers
+        # If there's a data range argument, deal with how it affects outliers
+        if data_range is not None:
+            (mn,mx) = data_range if hasattr(data_range, '__iter__') else (0, data_range)
+            outliers |= mask & ((prop < mn) | (prop > mx))
     # no matter what, trim out the infinite values (even if inf was in the data range)
-    outliers = np.union1d(outliers, mask[np.where(np.isinf(prop[mask]))[0]])
+    outliers |= mask & where_inf
     # Okay, mark everything in the prop:
-    where_nan = np.asarray(where_nan, dtype=np.int)
-    outliers = np.asarray(outliers, dtype=np.int)
-    if len(where_nan) + len(outliers) > 0:
+    if np.any(where_nan) or np.any(outliers):
         prop = np.array(prop)
         prop[where_nan] = null
         prop[outliers]  = clipped
@@ -367,7 +502,12 @@ def to_property(obj, prop=None,
     # transform?
     if transform: prop = transform(prop)
     # That's it, just return
-    return (prop, weight) if yield_weight else prop
+    res = (prop, weight) if yield_weight else prop
+    if cache is not None:
+        while len(cache) >= VertexSet.property_cache_size: cache.popitem(last=False)
+        cache[cache_key] = res
+        res = tuple([np.array(u) for u in res]) if yield_weight else np.array(res)
+    return res
     
 
 @pimms.immutable
@@ -431,6 +571,27 @@ class TesselationIndex(object):
         else:
             return vi[index]
 
+def _label_indices(labels, x):
+    # yields the indices into the vector of vertex labels of the labels in the array x; labels that
+    # do not appear in the vector raise an error rather than yielding a neighboring index
+    x = np.asarray(x)
+    n = len(labels)
+    srt = None if n < 2 or np.all(labels[1:] > labels[:-1]) else np.argsort(labels, kind='mergesort')
+    idx = np.searchsorted(labels, x, sorter=srt)
+    idx = np.minimum(idx, max(n - 1, 0))
+    if srt is not None: idx = srt[idx]
+    if x.size > 0 and (n == 0 or not np.array_equal(labels[idx], x)):
+        bad = x[labels[idx] != x] if n > 0 else x
+        raise ValueError('vertex labels not in the tesselation: %s' % (np.unique(bad)[:8],))
+    return idx
+def _precomputed_param(pre):
+    # the _precomputed param of a Tesselation or Mesh: a persistent map of read-only arrays
+    if pre is None: return None
+    return pyr.pmap({k:pimms.imm_array(v) for (k,v) in six.iteritems(pre)})
+def _precomputed_value(pre, name):
+    # the array given for the named value in a _precomputed param, or None if there is none
+    return None if pre is None else pre.get(name)
+
 @pimms.immutable
 class Tesselation(VertexSet):
     '''
@@ -438,12 +599,14 @@ class Tesselation(VertexSet):
     Tesselation inherits from the immutable class VertexSet, which provides functionality for
     tracking the properties of the tesselation's vertices.
     '''
-    def __init__(self, faces, properties=None, meta_data=None):
+    def __init__(self, faces, properties=None, meta_data=None, labels=None):
         self.faces = faces
         # we don't call VertexSet.__init__ because it sets vertex labels, which we have changed in
         # this class to a value instead of a param; instead we just set _properties directly
+        self._labels = labels
         self._properties = properties
         self.meta_data = meta_data
+        self._precomputed = None
 
     # The immutable parameters:
     @pimms.param
@@ -453,21 +616,67 @@ class Tesselation(VertexSet):
           given tesselation object; the matrix is (3 x m) where m is the number of triangles, and
           the cells are valid indices into the rows of the coordinates matrix.
         '''
-        tris = pimms.imm_array(np.asarray(tris, dtype=np.int))
+        tris = np.asarray(tris)
+        # narrower integer types (e.g., from the 'single' precision policy) are kept as they are
+        if tris.dtype != np.int32 and tris.dtype != np.int: tris = tris.astype(np.int)
+        tris = pimms.imm_array(apply_precision(tris, 'index'))
         if tris.shape[0] != 3:
             tris = tris.T
             if tris.shape[0] != 3:
                 raise ValueError('faces must be a (3 x m) or (m x 3) matrix')
         return tris
 
+    @pimms.param
+    def _labels(lbls):
+        '''
+        tess._labels is either None or the vector of vertex labels, in vertex-index order, that was
+        given to the tesselation tess (via the labels option); see tess.labels.
+        '''
+        if lbls is None: return None
+        lbls = np.asarray(lbls)
+        if lbls.dtype != np.int32 and lbls.dtype != np.int: lbls = lbls.astype(np.int)
+        return pimms.imm_array(lbls)
+    @pimms.param
+    def _precomputed(pre):
+        '''
+        tess._precomputed is either None or a persistent map of arrays that were calculated for an
+        identical tesselation, keyed by the names of the values they stand in for (labels,
+        indexed_faces, edges, or indexed_edges). This parameter is set by load_neuropythy(), is
+        dropped by copies that change the faces, and should not generally be given explicitly.
+        '''
+        return _precomputed_param(pre)
+
     # The immutable values:
     @pimms.value
-    def labels(faces):
+    def labels(faces, _labels, _precomputed):
         '''
         tess.labels is an array of the integer vertex labels; subsampling the tesselation object
-        will maintain vertex labels (but not indices).
+        will maintain vertex labels (but not indices). By default, the labels are sorted, so that
+        the vertex with index k has the k'th smallest label; if the tesselation was given the labels
+        option, then the vertices are in that order instead (labels that do not appear in the faces
+        are dropped, so copies with fewer faces keep the order of the remaining vertices).
+        '''
+        pre = _precomputed_value(_precomputed, 'labels')
+        if pre is not None: return pre
+        if _labels is None: return pimms.imm_array(np.unique(faces))
+        if len(np.unique(_labels)) != len(_labels):
+            raise ValueError('tesselation labels must be unique')
+        used = np.unique(faces)
+        lbls = _labels[np.isin(_labels, used)]
+        if len(lbls) != len(used):
+            raise ValueError('tesselation faces contain labels not in the given labels')
+        return pimms.imm_array(lbls)
+    @pimms.value
+    def content_hash(faces, _labels):
         '''
-        return pimms.imm_array(np.unique(faces))
+        tess.content_hash is a hexadecimal string that identifies the faces (and the vertex order) of
+        the given tesselation (regardless of the integer type in which they are stored);
+        tesselations with equal faces have equal content hashes, which can be used as cache keys
+        (see neuropythy.util.content_hash).
+        '''
+        i64 = lambda u: u if u.dtype == np.int64 else u.astype(np.int64)
+        if _labels is None: return content_hash(('Tesselation', i64(faces)))
+        return content_hash(('Tesselation', i64(faces), i64(_labels)))
     @pimms.value
     def face_count(faces):
         '''
@@ -519,12 +728,19 @@ class Tesselation(VertexSet):
                      edge_index=pyr.pmap(idx),
                      edge_face_index=pyr.pmap(edge2face))
     @pimms.value
-    def edges(edge_data):
+    def edges(faces, _precomputed):
         '''
         tess.edges is a (2 x p) numpy array containing the p edge pairs that are included in the
         given tesselation.
         '''
-        return edge_data['edges']
+        pre = _precomputed_value(_precomputed, 'edges')
+        if pre is not None: return pre
+        # the edges in order of their first appearance, as in tess.edge_data
+        (u, v) = (np.concatenate(faces), np.concatenate(np.roll(faces, -1, axis=0)))
+        uv = np.asarray([np.minimum(u, v), np.maximum(u, v)])
+        if uv.shape[1] == 0: return pimms.imm_array(np.zeros((2,0), dtype=faces.dtype))
+        (_, ii) = np.unique(uv[0] * (np.max(uv) + 1) + uv[1], return_index=True)
+        return pimms.imm_array(uv[:, np.sort(ii)])
     @pimms.value
     def edge_count(edges):
         '''
@@ -583,17 +799,21 @@ class Tesselation(VertexSet):
         idx = TesselationIndex(vertex_index, edge_index, face_index)
         return idx.persist()
     @pimms.value
-    def indexed_edges(edges, vertex_index):
+    def indexed_edges(edges, labels, _precomputed):
         '''
         tess.indexed_edges is identical to tess.edges except that each element has been indexed.
         '''
-        return pimms.imm_array([[vertex_index[u] for u in row] for row in edges])
+        pre = _precomputed_value(_precomputed, 'indexed_edges')
+        if pre is not None: return pre
+        return pimms.imm_array(_label_indices(labels, edges))
     @pimms.value
-    def indexed_faces(faces, vertex_index):
+    def indexed_faces(faces, labels, _precomputed):
         '''
         tess.indexed_faces is identical to tess.faces except that each element has been indexed.
         '''
-        return pimms.imm_array([[vertex_index[u] for u in row] for row in faces])
+        pre = _precomputed_value(_precomputed, 'indexed_faces')
+        if pre is not None: return pre
+        return pimms.imm_array(_label_indices(labels, faces))
     @pimms.value
     def vertex_edge_index(labels, edges):
         '''
@@ -661,6 +881,68 @@ class Tesselation(VertexSet):
         indices where tess.neighborhoods gives the vertex labels.
         '''
         return tuple([tuple([vertex_index[u] for u in nei]) for nei in neighborhoods])
+    @pimms.value
+    def adjacency_matrix(indexed_faces, vertex_count):
+        '''
+        tess.adjacency_matrix is the (n x n) symmetric boolean scipy.sparse.csr_matrix whose element
+        (i,j) is True if the vertices with indices i and j share an edge in the given tesselation.
+        '''
+        (a,b,c) = indexed_faces
+        (u,v) = (np.concatenate((a,b,c,b,c,a)), np.concatenate((b,c,a,a,b,c)))
+        return sps.csr_matrix((np.ones(len(u), dtype=np.bool), (u,v)),
+                              shape=(vertex_count, vertex_count))
+    @pimms.value
+    def _boundary_data(indexed_faces, vertex_count, labels):
+        '''
+        tess._boundary_data is a persistent map of the data describing the boundary of the given
+        tesselation; see tess.boundary_edges and tess.boundary_loops.
+        '''
+        n = vertex_count
+        (a,b,c) = indexed_faces
+        (u,v) = (np.concatenate((a,b,c)), np.concatenate((b,c,a)))
+        # an edge is on the boundary if only one face contains it
+        key = np.minimum(u,v).astype(np.int64) * n + np.maximum(u,v)
+        (_, first, counts) = np.unique(key, return_index=True, return_counts=True)
+        bidx = first[counts == 1]
+        (bu, bv) = (u[bidx], v[bidx]) # these retain the orientation of their faces
+        # each loop is a weakly-connected component of the directed boundary graph
+        q = len(bu)
+        g = sps.csr_matrix((np.ones(q), (bu, bv)), shape=(n,n))
+        lbl = csgraph.connected_components(g, directed=True, connection='weak')[1][bu]
+        (_, starts, lbl) = np.unique(lbl, return_index=True, return_inverse=True)
+        # a depth-first search from a root that points to one vertex of each loop visits the loops
+        # one after the other, each in order
+        g = sps.csr_matrix((np.ones(q + len(starts)),
+                            (np.concatenate((bu, np.full(len(starts), n, dtype=np.int))),
+                             np.concatenate((bv, bu[starts])))),
+                           shape=(n+1, n+1))
+        order = csgraph.depth_first_order(g, n, directed=True, return_predecessors=False)[1:]
+        lens = np.bincount(lbl, minlength=len(starts))
+        loops = np.split(labels[order], np.cumsum(lens)[:-1]) if q > 0 else []
+        return pyr.m(edges=pimms.imm_array([labels[bu], labels[bv]]),
+                     loops=tuple([pimms.imm_array(l) for l in loops]))
+    @pimms.value
+    def boundary_edges(_boundary_data):
+        '''
+        tess.boundary_edges is a (2 x q) numpy array of the vertex labels of the q edges that lie on
+        the boundary of the given tesselation (i.e., that are contained by only one face); each edge
+        (u,v) is oriented in the same direction as in its face.
+        '''
+        return _boundary_data['edges']
+    @pimms.value
+    def boundary_loops(_boundary_data):
+        '''
+        tess.boundary_loops is a tuple of arrays, one per closed boundary of the given tesselation,
+        each of which contains the vertex labels of the boundary in order.
+        '''
+        return _boundary_data['loops']
+    @pimms.value
+    def boundary_vertices(boundary_edges):
+        '''
+        tess.boundary_vertices is a numpy array of the vertex labels of the vertices that lie on the
+        boundary of the given tesselation.
+        '''
+        return pimms.imm_array(np.unique(boundary_edges))
 
     # Requirements/checks
     @pimms.require
@@ -679,6 +961,9 @@ class Tesselation(VertexSet):
     # Normal Methods
     def __repr__(self):
         return 'Tesselation(<%d faces>, <%d vertices>)' % (self.face_count, self.vertex_count)
+    def _precision_params(self, policy):
+        return dict(VertexSet._precision_params(self, policy),
+                    faces=apply_precision(self.faces, 'index', policy=policy))
     def make_mesh(self, coords, properties=None, meta_data=None):
         '''
         tess.make_mesh(coords) yields a Mesh object with the given coordinates and with the
@@ -708,9 +993,10 @@ class Tesselation(VertexSet):
         fsum = np.sum([vertices[f] for f in self.indexed_faces], axis=0)
         fids = np.where(fsum == 3)[0]
         faces = self.faces[:,fids]
-        vidcs = self.index(np.unique(faces))
+        # the remaining vertices keep their order (see tess.labels)
+        vidcs = np.unique(self.indexed_faces[:,fids])
         props = self._properties
-        if props is not None and len(props) > 1: props = props[vidcs]
+        if props is not None and props.row_count > 0: props = props[vidcs]
         md = self.meta_data.set(tag, self) if pimms.is_str(tag)   else \
              self.meta_data.set('supertess', self) if tag is True else \
              self.meta_data
@@ -718,14 +1004,492 @@ class Tesselation(VertexSet):
         if props is not self._properties: dat['_properties'] = props
         if md is not self.meta_data: dat['meta_data'] = md
         return self.copy(**dat)
-    def select(self, fn, tag=None):
+    def connected_components(self, mask=None):
+        '''
+        tess.connected_components() yields a length-n numpy array of integer component ids, one per
+          vertex, such that two vertices have the same id if they are connected by a path along the
+          edges of the given tesselation; ids run from 0 to k-1 for k components.
+        tess.connected_components(mask) yields the components of the vertices in the given mask,
+          which may be specified as a boolean vector or as a list of vertex labels; only edges whose
+          vertices are both in the mask connect vertices, and vertices outside the mask are given
+          the id -1.
+        '''
+        adj = self.adjacency_matrix
+        if mask is None: return csgraph.connected_components(adj, directed=False)[1]
+        mask = np.asarray(mask)
+        if len(mask) != self.vertex_count or not np.array_equal(mask, np.asarray(mask, np.bool)):
+            tmp = self.index(mask)
+            mask = np.zeros(self.vertex_count, dtype=np.bool)
+            mask[tmp] = 1
+        ii = self.indices[np.asarray(mask, dtype=np.bool)]
+        res = np.full(self.vertex_count, -1, dtype=np.int)
+        res[ii] = csgraph.connected_components(adj[ii][:,ii], directed=False)[1]
+        return res
+    def select(self, fn, tag=None, vectorized=False):
         '''
         tess.select(fn) is equivalent to tess.subtess(tess.properties.map(fn)); any vertex whose
           property data yields True or 1 will be included in the new subtess and all other vertices
           will be excluded.
-        The optional parameter tag is used identically as in tess.subtess().
+        The optional parameter tag is used identically as in tess.subtess(); fn and the optional
+        parameter vectorized are interpreted as in tess.mask(), so fn may also be a mapping of
+        property names to conditions.
+        '''
+        return self.subtess(self.mask(fn, vectorized=vectorized), tag=tag)
+    def _permuted(self, fwd):
+        # yields the tesselation whose vertex k is vertex fwd[k] of this tesselation, with the same
+        # labels; faces are sorted by their first vertex in the new order
+        inv = np.empty(len(fwd), dtype=np.int)
+        inv[fwd] = np.arange(len(fwd))
+        fids = np.lexsort(np.sort(inv[self.indexed_faces], axis=0)[::-1])
+        props = self._properties
+        if props is not None and props.row_count > 0: props = props[fwd]
+        return (self.copy(faces=self.faces[:,fids], _labels=self.labels[fwd], _properties=props),
+                inv)
+    def reorder(self, method='rcm'):
+        '''
+        tess.reorder() yields a tuple (rtess, fwd, inv) in which rtess is a duplicate of the given
+          tesselation tess whose vertices have been reordered to improve the locality of the sparse
+          matrices built over them (e.g., interpolation and smoothing matrices). The vertex with
+          index k in rtess is the vertex with index fwd[k] in tess, and the vertex with index i in
+          tess is the vertex with index inv[i] in rtess; accordingly, for any vertex property p of
+          tess, p[fwd] is the same property over rtess and, for any property q of rtess, q[inv] is
+          the same property over tess.
+        The vertices of rtess keep their labels, so rtess.labels is tess.labels[fwd] and label-based
+        lookups (e.g., rtess.index) refer to the same vertices as in tess; the faces are written in
+        the same labels and are sorted such that faces that share vertices tend to be adjacent.
+        The optional argument method (default: 'rcm') specifies the ordering to use; tesselations
+        support only 'rcm', the reverse Cuthill-McKee ordering of the vertex adjacency matrix; see
+        also Mesh.reorder.
         '''
-        return self.subtess(self.map(fn), tag=tag)
+        method = method.lower()
+        if method in ('rcm', 'cuthill-mckee', 'reverse-cuthill-mckee'):
+            fwd = csgraph.reverse_cuthill_mckee(self.adjacency_matrix, symmetric_mode=True)
+        else: raise ValueError('unrecognized reordering method: %s' % method)
+        fwd = np.asarray(fwd, dtype=np.int)
+        (rtess, inv) = self._permuted(fwd)
+        return (rtess, fwd, inv)
+    def coarsen(self):
+        '''
+        tess.coarsen() yields a persistent map describing a coarser version of the given
+          tesselation; the map contains the following keys:
+            * 'tess': the coarse tesselation, whose vertices are a subset of the vertices of tess
+              (with the same labels);
+            * 'vertices': the indices in tess of the vertices of the coarse tesselation;
+            * 'prolongation': the (n x k) scipy.sparse.csr_matrix that interpolates a property of
+              the k coarse vertices onto the n vertices of tess;
+            * 'restriction': the (k x n) scipy.sparse.csr_matrix that averages a property of the
+              vertices of tess onto the coarse vertices.
+        The coarse tesselation is made by collapsing edges of tess, each of which merges one vertex
+        into a neighboring vertex, until about a quarter of the vertices remain. Only collapses that
+        pass the link condition are made, and boundary vertices are only merged along the
+        boundary, so a manifold tesselation yields a manifold coarse tesselation with the same Euler
+        characteristic and the same number of boundary loops. The coarse faces and the matrices
+        depend only on the faces (and labels) of tess, so they are cached by tess.content_hash in
+        the dictionary Tesselation.coarsening_cache (see also Tesselation.coarsening_cache_size);
+        the properties of tess, restricted to the coarse vertices, are attached to the coarse
+        tesselation on each call.
+        '''
+        cache = Tesselation.coarsening_cache
+        key = self.content_hash
+        dat = cache.get(key)
+        if dat is None:
+            dat = _coarsen_tess(self)
+            while len(cache) >= Tesselation.coarsening_cache_size: cache.popitem(last=False)
+            cache[key] = dat
+        props = self._properties
+        if props is None or props.row_count == 0: return dat
+        ctess = dat['tess'].copy(_properties=props[dat['vertices']]).persist()
+        return dat.set('tess', ctess)
+    def pyramid(self, levels=None, min_vertices=64):
+        '''
+        tess.pyramid() yields a tuple of persistent maps, one per level of a multi-resolution
+          pyramid of the given tesselation, built by repeatedly coarsening tess (see
+          tess.coarsen()). The first level is tess itself and each later level is coarser than the
+          one before it. Each map contains the keys 'tess', 'prolongation', and 'restriction', as in
+          tess.coarsen(), which relate the level to the level before it (these are None for the
+          first level), and 'vertices', the indices in tess of the level's vertices.
+
+        The following options are accepted:
+          * levels (default: None) specifies the largest number of levels, including tess itself.
+          * min_vertices (default: 64) specifies that no level with fewer vertices than this is
+            included.
+        Coarsening also stops when a level is not substantially smaller than the level before it.
+        '''
+        res = [pyr.m(tess=self, vertices=self.indices, prolongation=None, restriction=None)]
+        while levels is None or len(res) < levels:
+            prev = res[-1]
+            dat = prev['tess'].coarsen()
+            (n, k) = (prev['tess'].vertex_count, dat['tess'].vertex_count)
+            if k < min_vertices or k > 0.9 * n: break
+            res.append(dat.set('vertices', pimms.imm_array(prev['vertices'][dat['vertices']])))
+        return tuple(res)
+
+# coarsenings of tesselations (see Tesselation.coarsen) are cached by the content hashes of their
+# faces; entries are discarded oldest-first beyond the given size
+Tesselation.coarsening_cache = OrderedDict()
+Tesselation.coarsening_cache_size = 16
+
+def _csr_row_max(mtx, x):
+    # the largest of the values x, which are given in the order of the stored elements of the csr
+    # matrix mtx, in each row of mtx (or 0 for rows with no stored elements)
+    (ptr, res) = (mtx.indptr, np.zeros(mtx.shape[0]))
+    nz = ptr[1:] > ptr[:-1]
+    if nz.any(): res[nz] = np.maximum.reduceat(x, ptr[:-1][nz])
+    return res
+def _coarsen_tess(tess):
+    # the work behind Tesselation.coarsen(); vertices are removed by rounds of edge collapses, each
+    # of which merges a vertex v into a neighbor u. A collapse is only made if it passes the link
+    # condition (u and v share exactly the neighbors opposite their edge), which keeps the
+    # tesselation manifold with the same topology; the collapses of a round are chosen so that the
+    # closed neighborhoods of their removed vertices are disjoint, so that each can be checked
+    # against the tesselation at the start of the round. Ties are broken with fixed (pseudo-random)
+    # priorities so that coarsening is deterministic.
+    n = tess.vertex_count
+    target = n // 4
+    rnd = np.random.RandomState(0).permutation(n) + 1.0
+    faces = tess.indexed_faces
+    alive = np.zeros(n, dtype=np.bool)
+    alive[faces.flatten()] = True
+    while np.sum(alive) > target:
+        # ne[u,v] is the number of faces containing the edge (u,v)
+        (a, b) = (np.concatenate(faces), np.concatenate(np.roll(faces, -1, axis=0)))
+        ne = sps.csr_matrix((np.ones(len(a)), (a, b)), shape=(n, n))
+        ne = (ne + ne.T).tocsr()
+        ne.sort_indices()
+        adj = sps.csr_matrix((np.ones(len(ne.data)), ne.indices, ne.indptr), shape=(n, n))
+        deg = np.diff(adj.indptr)
+        (v, u) = (np.repeat(np.arange(n), deg), adj.indices)
+        bdry = ne.data == 1
+        bv = np.zeros(n, dtype=np.bool)
+        bv[v[bdry]] = True
+        common = np.asarray(adj.dot(adj)[v, u]).flatten()
+        # boundary vertices are only merged along the boundary, and the last collapse of a
+        # tetrahedron (whose vertices all have three neighbors) is never made
+        ok = np.where(bdry, (common == 1) & bv[v] & bv[u], (common == 2) & ~bv[v])
+        ok &= (deg[v] > 3) | (deg[u] > 3)
+        # each vertex v is merged into the allowed neighbor u of lowest valence
+        key = np.where(ok, deg[u] * (n + 1.0) + rnd[u], np.inf)
+        sel = ok & (key == -_csr_row_max(adj, -key)[v])
+        (v, u) = (v[sel], u[sel])
+        if len(v) == 0: break
+        prio = (2.0 * n - deg[v] - deg[u]) * (n + 1.0) + rnd[v]
+        # choose a maximal set of collapses whose closed neighborhoods are disjoint
+        nbhd = (adj + sps.eye(n)).tocsr()[v]
+        nbhd.data[:] = 1
+        nbhdt = nbhd.T.tocsr()
+        (cand, win) = (np.ones(len(v), dtype=np.bool), np.zeros(len(v), dtype=np.bool))
+        while cand.any():
+            mx = _csr_row_max(nbhdt, (prio * cand)[nbhdt.indices])
+            new = cand & (_csr_row_max(nbhd, mx[nbhd.indices]) == prio)
+            win |= new
+            taken = nbhdt.dot(new.astype(np.float)) > 0
+            cand &= ~(nbhd.dot(taken.astype(np.float)) > 0)
+        (v, u, prio) = (v[win], u[win], prio[win])
+        extra = np.sum(alive) - target
+        if len(v) > extra: (v, u) = [x[np.argsort(-prio)[:extra]] for x in (v, u)]
+        mrg = np.arange(n)
+        mrg[v] = u
+        faces = mrg[faces]
+        faces = faces[:, (faces[0] != faces[1]) & (faces[1] != faces[2]) & (faces[2] != faces[0])]
+        alive[v] = False
+    vidx = np.unique(faces)
+    k = len(vidx)
+    cidx = np.full(n, -1, dtype=np.int)
+    cidx[vidx] = np.arange(k)
+    adj = sps.csr_matrix(tess.adjacency_matrix, dtype=np.float)
+    # prolongation: coarse vertices keep their values; other vertices average their nearest coarse
+    # vertices (those one edge away or, failing that, two edges away, etc.)
+    sel = sps.csr_matrix((np.ones(k), (vidx, np.arange(k))), shape=(n, k))
+    wts = adj.dot(sel).tocsr()
+    rs = np.asarray(wts.sum(axis=1)).flatten()
+    miss = (rs == 0) & (cidx < 0)
+    while miss.any():
+        wts = wts + sps.diags(miss.astype(np.float)).dot(adj.dot(wts)).tocsr()
+        rs = np.asarray(wts.sum(axis=1)).flatten()
+        (nmiss, miss) = (np.sum(miss), (rs == 0) & (cidx < 0))
+        if np.sum(miss) == nmiss: break
+    wts = sps.diags(((cidx < 0) & (rs > 0)) / (rs + (rs == 0))).dot(wts)
+    pmtx = (sel + wts).tocsr()
+    pmtx.eliminate_zeros()
+    pmtx.sort_indices()
+    cs = np.asarray(pmtx.sum(axis=0)).flatten()
+    rmtx = sps.diags(1.0 / (cs + (cs == 0))).dot(pmtx.T).tocsr()
+    rmtx.sort_indices()
+    ctess = Tesselation(tess.labels[faces],
+                        labels=(None if tess._labels is None else tess.labels[vidx])).persist()
+    return pyr.m(tess=ctess, vertices=pimms.imm_array(vidx), prolongation=pmtx, restriction=rmtx)
+
+def _morton_order(x):
+    # yields the permutation that sorts the points in the columns of x along a z-order (Morton)
+    # space-filling curve
+    x = np.asarray(x, dtype=np.float)
+    (d, n) = x.shape
+    bits = 63 // d
+    (mn, mx) = (np.min(x, axis=1), np.max(x, axis=1))
+    q = (x - mn[:,None]) / (mx - mn + (mx == mn))[:,None]
+    q = np.clip(q * (2**bits - 1), 0, 2**bits - 1).astype(np.uint64)
+    code = np.zeros(n, dtype=np.uint64)
+    for b in range(bits):
+        for k in range(d):
+            code |= ((q[k] >> np.uint64(b)) & np.uint64(1)) << np.uint64(b*d + k)
+    return np.argsort(code, kind='mergesort')
+
+def _geometry_dtype(x):
+    # derived geometry (normals, lengths, areas, interpolation weights) is stored in the precision of
+    # the coordinates from which it is derived, even when it is calculated in double precision
+    return np.result_type(np.asarray(x).dtype, np.float32)
+def _kdtree_call(f, n_jobs, *args, **kwargs):
+    # scipy has called the parallelism option of the cKDTree queries both n_jobs and workers, and
+    # older versions support neither; this calls f with whichever is accepted
+    if n_jobs == 1: return f(*args, **kwargs)
+    for k in ('workers', 'n_jobs'):
+        try: return f(*args, **dict(kwargs, **{k:n_jobs}))
+        except TypeError: pass
+    return f(*args, **kwargs)
+def _pool_map(pool, f, args):
+    # pool.map(f, args), after which the pool is shut down and its workers are joined; if f raises
+    # an error, the workers are terminated rather than left running
+    try:
+        res = pool.map(f, args)
+    except:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    return res
+def _ranges(starts, ends):
+    # yields (ids, positions) for the concatenated ranges [starts[k], ends[k]); ids gives the k of
+    # each position
+    lens = ends - starts
+    ids = np.repeat(np.arange(len(lens)), lens)
+    return (ids, np.arange(len(ids)) - np.repeat(np.cumsum(lens) - lens - starts, lens))
+def _build_bvh(tris, leaf_size):
+    '''
+    _build_bvh(tris, leaf_size) yields a bounding-volume hierarchy over the triangles in the given
+      (3 x d x m) array of face coordinates. The hierarchy is built top-down, one level at a time,
+      by splitting each node at the median of its triangles' centers along the node's longest axis
+      until nodes contain no more than leaf_size triangles. The result is a persistent map of:
+        * order: the triangle indices sorted such that each node's triangles are contiguous;
+        * start, end: the range of each node in order;
+        * child: the index of each node's first child (the second is child + 1) or -1 for leaves;
+        * lower, upper: the (k x d) corners of each node's bounding box.
+    '''
+    tris = np.asarray(tris, dtype=np.float)
+    (lo, hi) = (np.min(tris, axis=0).T, np.max(tris, axis=0).T)
+    ctr = 0.5 * (lo + hi)
+    m = len(ctr)
+    leaf_size = max(1, int(leaf_size))
+    order = np.arange(m)
+    (starts, ends, children, lowers, uppers) = ([], [], [], [], [])
+    (st, en, nnodes) = (np.asarray([0]), np.asarray([m]), 0)
+    def _reduce(f, x, st, en):
+        x = np.vstack([x, x[-1:]])
+        return f.reduceat(x, np.ravel(np.transpose([st, en])), axis=0)[::2]
+    if m == 0:
+        z = pimms.imm_array(np.zeros((1, tris.shape[1])))
+        return pyr.m(order=pimms.imm_array(order), start=pimms.imm_array([0]),
+                     end=pimms.imm_array([0]), child=pimms.imm_array([-1]), lower=z, upper=z)
+    while len(st) > 0:
+        (nlo, nhi) = (_reduce(np.minimum, lo[order], st, en), _reduce(np.maximum, hi[order], st, en))
+        split = (en - st) > leaf_size
+        child = np.full(len(st), -1, dtype=np.int)
+        child[split] = nnodes + len(st) + 2*np.arange(np.sum(split))
+        (starts, ends, children, lowers, uppers) = [
+            u + [v] for (u,v) in zip((starts, ends, children, lowers, uppers),
+                                     (st, en, child, nlo, nhi))]
+        nnodes += len(st)
+        (st, en) = (st[split], en[split])
+        if len(st) == 0: break
+        # sort the triangles of each splitting node along its longest axis
+        (clo, chi) = (_reduce(np.minimum, ctr[order], st, en), _reduce(np.maximum, ctr[order], st, en))
+        ax = np.argmax(chi - clo, axis=1)
+        (ids, pos) = _ranges(st, en)
+        ii = np.lexsort((ctr[order[pos], ax[ids]], ids))
+        order[pos] = order[pos[ii]]
+        mid = st + (en - st) // 2
+        (st, en) = (np.ravel(np.transpose([st, mid])), np.ravel(np.transpose([mid, en])))
+    (start, end, child) = [np.concatenate(u) for u in (starts, ends, children)]
+    (lower, upper) = [np.vstack(u) for u in (lowers, uppers)]
+    return pyr.m(order=pimms.imm_array(order), start=pimms.imm_array(start),
+                 end=pimms.imm_array(end), child=pimms.imm_array(child),
+                 lower=pimms.imm_array(lower), upper=pimms.imm_array(upper))
+def _bvh_cost(bvh):
+    # the surface-area cost of a bounding-volume hierarchy relative to the area of its root box:
+    # the area of each node's box, weighted by its triangle count for leaves
+    ext = np.asarray(bvh['upper']) - np.asarray(bvh['lower'])
+    area = np.sum(ext * np.roll(ext, 1, axis=1), axis=1) if ext.shape[1] > 2 else np.sum(ext, axis=1)
+    leaf = np.asarray(bvh['child']) < 0
+    cnt = np.where(leaf, np.asarray(bvh['end']) - np.asarray(bvh['start']), 1)
+    return np.sum(area * cnt) / area[0] if area[0] > 0 else 0
+def _refit_bvh(bvh, tris, tolerance):
+    '''
+    _refit_bvh(bvh, tris, tolerance) yields a bounding-volume hierarchy (see _build_bvh) over the
+      triangles in the given (3 x d x m) array of face coordinates that keeps the nodes of the given
+      hierarchy, which must have been built over the same m triangles, and recalculates only their
+      bounding boxes, which costs O(m). If the surface-area cost of the refit hierarchy exceeds
+      tolerance times that of the given hierarchy, or if the hierarchy was built over a different
+      number of triangles or in a different number of dimensions, then None is yielded instead.
+    '''
+    tris = np.asarray(tris, dtype=np.float)
+    order = bvh['order']
+    if len(order) != tris.shape[2] or tris.shape[2] == 0 or not tolerance: return None
+    if bvh['lower'].shape[1] != tris.shape[1]: return None
+    (lo, hi) = (np.min(tris, axis=0).T[order], np.max(tris, axis=0).T[order])
+    (start, end, child) = [np.asarray(bvh[k]) for k in ('start', 'end', 'child')]
+    (lower, upper) = (np.empty(bvh['lower'].shape), np.empty(bvh['upper'].shape))
+    leaf = np.where(child < 0)[0]
+    ii = np.ravel(np.transpose([start[leaf], end[leaf]]))
+    (lo, hi) = [np.vstack([u, u[-1:]]) for u in (lo, hi)]
+    lower[leaf] = np.minimum.reduceat(lo, ii, axis=0)[::2]
+    upper[leaf] = np.maximum.reduceat(hi, ii, axis=0)[::2]
+    # the nodes of each level of the hierarchy are contiguous and are followed by their children,
+    # so the boxes of the internal nodes are filled in one level at a time, from the bottom up
+    levels = [(0, 1)]
+    while True:
+        (a, b) = levels[-1]
+        nsplit = np.sum(child[a:b] >= 0)
+        if nsplit == 0: break
+        levels.append((b, b + 2*nsplit))
+    for (a,b) in reversed(levels):
+        nd = a + np.where(child[a:b] >= 0)[0]
+        for (x,f) in [(lower, np.minimum), (upper, np.maximum)]:
+            x[nd] = f(x[child[nd]], x[child[nd] + 1])
+    res = bvh.set('lower', pimms.imm_array(lower)).set('upper', pimms.imm_array(upper))
+    return res if _bvh_cost(res) <= tolerance * _bvh_cost(bvh) else None
+def _ray_triangle(x0, u, a, b, c, tol):
+    # the Moller-Trumbore ray/triangle test for the rays x0 + t*u and the triangles (a,b,c), all
+    # given as (n x 3) matrices; yields (t, b1, b2, hit) where b1 and b2 are the barycentric weights
+    # of b and c, and hit is True where the line of the ray passes through the triangle
+    (e1, e2) = (b - a, c - a)
+    pv = np.cross(u, e2)
+    det = np.sum(e1 * pv, axis=1)
+    z = np.isclose(det, 0, atol=1e-12 * np.sum(e1**2, axis=1) * np.sum(u**2, axis=1))
+    idet = ~z / (det + z)
+    tv = x0 - a
+    b1 = np.sum(tv * pv, axis=1) * idet
+    qv = np.cross(tv, e1)
+    b2 = np.sum(u * qv, axis=1) * idet
+    t = np.sum(e2 * qv, axis=1) * idet
+    return (t, b1, b2, ~z & (b1 >= -tol) & (b2 >= -tol) & (b1 + b2 <= 1 + tol))
+def _bvh_ray_query(bvh, tris, x0, u, max_t, first):
+    # yields (ray ids, face ids, t, b1, b2) for the hits of the given rays on the triangles of the
+    # given (3 x 3 x m) face-coordinate array tris; if first is True, only the nearest hit of each
+    # ray is found. Hits are tested with the Moller-Trumbore algorithm and are two-sided.
+    (order, start, end, child) = [bvh[k] for k in ('order', 'start', 'end', 'child')]
+    (lower, upper) = (bvh['lower'], bvh['upper'])
+    q = len(x0)
+    tol = 1e-9
+    with np.errstate(divide='ignore', invalid='ignore'):
+        uinv = 1.0 / u
+    best = np.array(max_t, dtype=np.float)
+    (rr, nn) = (np.arange(q), np.zeros(q, dtype=np.int))
+    hits = []
+    while len(rr) > 0:
+        # slab test of the rays against the nodes' bounding boxes (padded a little)
+        (o, ui) = (x0[rr], uinv[rr])
+        pad = tol * (1 + np.abs(upper[nn] - lower[nn]))
+        with np.errstate(invalid='ignore'):
+            (ta, tb) = ((lower[nn] - pad - o) * ui, (upper[nn] + pad - o) * ui)
+            tnear = np.max(np.fmin(ta, tb), axis=1)
+            tfar = np.min(np.fmax(ta, tb), axis=1)
+        ok = (tfar >= np.maximum(tnear, 0)) & (tnear <= best[rr])
+        (rr, nn) = (rr[ok], nn[ok])
+        leaf = child[nn] < 0
+        # the triangles in the leaves are tested directly
+        (ids, pos) = _ranges(start[nn[leaf]], end[nn[leaf]])
+        (r, f) = (rr[leaf][ids], order[pos])
+        if len(r) > 0:
+            (t, b1, b2, hit) = _ray_triangle(x0[r], u[r], tris[0][:,f].T, tris[1][:,f].T,
+                                             tris[2][:,f].T, tol)
+            hit &= (t >= 0) & (t <= best[r])
+            if np.any(hit):
+                (r, f, t, b1, b2) = (r[hit], f[hit], t[hit], b1[hit], b2[hit])
+                if first: np.minimum.at(best, r, t)
+                hits.append((r, f, t, b1, b2))
+        # the remaining nodes are split into their children
+        (rr, nn) = (np.repeat(rr[~leaf], 2), np.repeat(child[nn[~leaf]], 2))
+        nn[1::2] += 1
+    if len(hits) == 0:
+        return (np.zeros(0, dtype=np.int), np.zeros(0, dtype=np.int)) + (np.zeros(0),)*3
+    (r, f, t, b1, b2) = [np.concatenate(u) for u in zip(*hits)]
+    ii = np.lexsort((f, t, r))
+    if first: ii = ii[np.concatenate(([True], r[ii][1:] != r[ii][:-1]))]
+    return (r[ii], f[ii], t[ii], np.clip(b1[ii], 0, 1), np.clip(b2[ii], 0, 1))
+def _boxes_overlap(alo, ahi, i, blo, bhi, j):
+    # yields the indices k for which box i[k] of the (d x n) corner matrices alo/ahi overlaps box
+    # j[k] of blo/bhi; the pairs are filtered one dimension at a time
+    k = np.arange(len(i))
+    for (al, ah, bl, bh) in zip(alo, ahi, blo, bhi):
+        (ii, jj) = (i[k], j[k])
+        k = k[(al[ii] <= bh[jj]) & (bl[jj] <= ah[ii])]
+    return k
+def _bvh_overlaps(bvh, lo, hi):
+    # yields (f, g) for all pairs of distinct faces f < g in the given bounding-volume hierarchy
+    # whose bounding boxes, given by the (d x m) matrices lo and hi, overlap; the hierarchy is
+    # traversed against itself breadth-first
+    (order, start, end, child) = [bvh[k] for k in ('order', 'start', 'end', 'child')]
+    (lower, upper) = [np.ascontiguousarray(bvh[k].T) for k in ('lower', 'upper')]
+    (lo, hi) = [np.ascontiguousarray(x[:,order]) for x in (lo, hi)]
+    (aa, bb) = (np.asarray([0]), np.asarray([0]))
+    res = []
+    while len(aa) > 0:
+        ok = _boxes_overlap(lower, upper, aa, lower, upper, bb)
+        (aa, bb) = (aa[ok], bb[ok])
+        (la, lb) = (child[aa] < 0, child[bb] < 0)
+        leaves = la & lb
+        # pairs of leaves are expanded into pairs of faces; the faces of each leaf are first tested
+        # against the box of the other leaf
+        (a, b) = (aa[leaves], bb[leaves])
+        (ids, pos) = _ranges(start[a], end[a])
+        ii = _boxes_overlap(lo, hi, pos, lower, upper, b[ids])
+        (ids, pos) = (ids[ii], pos[ii])
+        (jds, qos) = _ranges(start[b], end[b])
+        ii = _boxes_overlap(lo, hi, qos, lower, upper, a[jds])
+        (jds, qos) = (jds[ii], qos[ii])
+        cnt = np.bincount(jds, minlength=len(a))
+        off = np.cumsum(cnt) - cnt
+        (kk, jj) = _ranges(off[ids], off[ids] + cnt[ids])
+        (same, pos, qos) = ((a == b)[ids[kk]], pos[kk], qos[jj])
+        # a leaf paired with itself yields each of its pairs of faces once
+        ii = (pos < qos) | ~same
+        (pos, qos) = (pos[ii], qos[ii])
+        ii = _boxes_overlap(lo, hi, pos, lo, hi, qos)
+        (f, g) = (order[pos[ii]], order[qos[ii]])
+        if len(f) > 0: res.append(np.transpose([np.minimum(f, g), np.maximum(f, g)]))
+        # the other pairs are replaced by the pairs of their children (a leaf stands in for itself,
+        # and a node paired with itself yields each pair of its children once)
+        (aa, bb, la, lb) = [x[~leaves] for x in (aa, bb, la, lb)]
+        same = aa == bb
+        (ka, kb) = (np.where(la, aa, child[aa]), np.where(lb, bb, child[bb]))
+        (ia, ib, iab) = (~la & ~same, ~lb, ~la & ~lb)
+        aa = np.concatenate([ka, ka[ia] + 1, ka[ib], ka[iab] + 1])
+        bb = np.concatenate([kb, kb[ia], kb[ib] + 1, kb[iab] + 1])
+    if len(res) == 0: return np.zeros((0,2), dtype=np.int)
+    return np.vstack(res)
+def _rank_chains(pred):
+    # for the predecessor vector pred (-1 marks a node without a predecessor) of a set of disjoint
+    # chains, yields (root, rank) where root[i] is the first node of i's chain and rank[i] is i's
+    # distance from it; chains are ranked by pointer jumping, so the cost is O(n log n); nodes that
+    # lie on cycles yield a negative root, and for these rank[i] is instead the smallest node id on
+    # the cycle
+    n = len(pred)
+    idx = np.arange(n)
+    anc = np.where(pred < 0, idx, pred)
+    (rank, mn) = ((pred >= 0).astype(np.int), idx.copy())
+    for _ in range(int(np.ceil(np.log2(max(n, 2)))) + 1):
+        rank = rank + rank[anc]
+        mn = np.minimum(mn, mn[anc])
+        anc = anc[anc]
+    cyc = pred[anc] >= 0
+    return (np.where(cyc, -1, anc), np.where(cyc, mn, rank))
+def _geodesic_neighborhood_chunk(args):
+    # worker for Mesh.geodesic_neighborhoods(); must be at module level so that it can be pickled
+    (graph, chunk, local, radius) = args
+    d = csgraph.dijkstra(graph, directed=False, indices=np.searchsorted(local, chunk), limit=radius)
+    (rr, cc) = np.where(np.isfinite(d))
+    return (chunk[rr], local[cc], d[rr, cc])
 
 @pimms.immutable
 class Mesh(VertexSet):
@@ -741,6 +1505,8 @@ class Mesh(VertexSet):
         self.tess = faces
         self.meta_data = meta_data
         self._properties = properties
+        self._spatial_hashes = None
+        self._precomputed = None
 
     # The immutable parameters:
     @pimms.param
@@ -749,7 +1515,7 @@ class Mesh(VertexSet):
         mesh.coordinates is a read-only numpy array of size (d x n) where d is the number of
           dimensions and n is the number of vertices in the mesh.
         '''
-        crds = pimms.imm_array(crds)
+        crds = pimms.imm_array(apply_precision(crds, 'float'))
         if crds.shape[0] != 2 and crds.shape[0] != 3:
             crds = crds.T
             if crds.shape[0] != 2 and crds.shape[0] != 3:
@@ -765,6 +1531,26 @@ class Mesh(VertexSet):
             try: tris = Tesselation(tris)
             except: raise ValueError('mesh.tess must be a Tesselation object')
         return tris.persist()
+    @pimms.param
+    def _spatial_hashes(sh):
+        '''
+        mesh._spatial_hashes is either None or a persistent map whose optional key 'face_bvh' is the
+          face_bvh of a mesh with the same tesselation; mesh.face_bvh refits this hierarchy rather
+          than building a new one when the vertices have not moved far (see
+          Mesh.bvh_refit_tolerance). This parameter is set by mesh.copy() and should not generally
+          be given explicitly.
+        '''
+        return None if sh is None else pyr.pmap(sh)
+    @pimms.param
+    def _precomputed(pre):
+        '''
+        mesh._precomputed is either None or a persistent map of arrays that were calculated for an
+        identical mesh, keyed by the names of the values they stand in for (face_normals,
+        vertex_normals, face_areas, or edge_lengths). This parameter is set by load_neuropythy(), is
+        dropped by copies that change the coordinates or the tesselation, and should not generally
+        be given explicitly.
+        '''
+        return _precomputed_param(pre)
 
     # The immutable values:
     @pimms.value
@@ -820,12 +1606,14 @@ class Mesh(VertexSet):
         '''
         return pimms.imm_array(np.sum(face_coordinates, axis=0) / 3.0)
     @pimms.value
-    def face_normals(face_coordinates):
+    def face_normals(face_coordinates, _precomputed):
         '''
         mesh.face_normals is the (3 x m) array of the outward-facing normal vectors of each
           triangle in the given mesh. If mesh is a 2D mesh, these are all either [0,0,1] or
           [0,0,-1].
         '''
+        pre = _precomputed_value(_precomputed, 'face_normals')
+        if pre is not None: return pre
         u01 = face_coordinates[1] - face_coordinates[0]
         u02 = face_coordinates[2] - face_coordinates[0]
         if len(u01) == 2:
@@ -835,18 +1623,24 @@ class Mesh(VertexSet):
         xp = np.cross(u01, u02, axisa=0, axisb=0).T
         norms = np.sqrt(np.sum(xp**2, axis=0))
         wz = np.isclose(norms, 0)
-        return pimms.imm_array(xp * (np.logical_not(wz) / (norms + wz)))
+        xp = xp * (np.logical_not(wz) / (norms + wz))
+        return pimms.imm_array(np.asarray(xp, dtype=_geometry_dtype(face_coordinates)))
     @pimms.value
-    def vertex_normals(face_normals, tess):
+    def vertex_normals(face_normals, tess, _precomputed):
         '''
         mesh.vertex_normals is the (3 x n) array of the outward-facing normal vectors of each
           vertex in the given mesh. If mesh is a 2D mesh, these are all either [0,0,1] or
           [0,0,-1].
         '''
-        tmp = np.array([np.sum(face_normals[:,fs], axis=1) for fs in tess.vertex_faces]).T
+        pre = _precomputed_value(_precomputed, 'vertex_normals')
+        if pre is not None: return pre
+        fs = tess.indexed_faces
+        (ii, n) = (fs.flatten(), tess.vertex_count)
+        tmp = np.asarray([np.bincount(ii, weights=np.tile(u, 3), minlength=n) for u in face_normals])
         norms = np.sqrt(np.sum(tmp ** 2, axis=0))
         wz = np.isclose(norms, 0)
-        return pimms.imm_array(tmp * (np.logical_not(wz) / (norms + wz)))
+        tmp = tmp * (np.logical_not(wz) / (norms + wz))
+        return pimms.imm_array(np.asarray(tmp, dtype=face_normals.dtype))
     @pimms.value
     def face_angle_cosines(face_coordinates):
         '''
@@ -855,7 +1649,7 @@ class Mesh(VertexSet):
         number of faces in the mesh.
         '''
         X = face_coordinates
-        X = np.asarray([x * (zs / (xl + np.logical_not(zs)))
+        X = np.asarray([x * (np.logical_not(zs) / (xl + zs))
                         for x  in [X[1] - X[0], X[2] - X[1], X[0] - X[2]]
                         for xl in [np.sqrt(np.sum(x**2, axis=0))]
                         for zs in [np.isclose(xl, 0)]])
@@ -873,17 +1667,170 @@ class Mesh(VertexSet):
         tmp.setflags(write=False)
         return tmp
     @pimms.value
-    def face_areas(face_coordinates):
+    def face_areas(face_coordinates, _precomputed):
         '''
         mesh.face_areas is the length-m numpy array of the area of each face in the given mesh.
         '''
-        return pimms.imm_array(triangle_area(*face_coordinates))
+        pre = _precomputed_value(_precomputed, 'face_areas')
+        if pre is not None: return pre
+        areas = batch_triangle_area(np.transpose(face_coordinates, (2,0,1)))
+        return pimms.imm_array(np.asarray(areas, dtype=_geometry_dtype(face_coordinates)))
+    @pimms.value
+    def face_quality(face_coordinates):
+        '''
+        mesh.face_quality is a persistent map of per-face quality metrics of the given mesh, all
+          computed together from mesh.face_coordinates; see mesh.quality() for the keys.
+        '''
+        dt = _geometry_dtype(face_coordinates)
+        x = np.asarray(face_coordinates, dtype=np.float)
+        # edge k of each face is opposite vertex k
+        e = [x[2] - x[1], x[0] - x[2], x[1] - x[0]]
+        lens = np.sqrt([np.sum(u**2, axis=0) for u in e])
+        if x.shape[1] == 2: area2 = np.abs(e[1][0]*e[2][1] - e[1][1]*e[2][0])
+        else:               area2 = np.sqrt(np.sum(np.cross(e[1], e[2], axis=0)**2, axis=0))
+        # the angle at vertex k is between edges k+1 and k+2 (both pointing away from the vertex)
+        dots = np.asarray([-np.sum(e[(k+1) % 3] * e[(k+2) % 3], axis=0) for k in range(3)])
+        angles = np.arctan2(area2, dots)
+        (lmin, lmax, perim) = (np.min(lens, axis=0), np.max(lens, axis=0), np.sum(lens, axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # circumradius / (2 * inradius), which is 1 for equilateral triangles
+            aspect = np.prod(lens, axis=0) * perim / (4 * area2**2)
+            ratio = lmax / lmin
+        aspect[np.isclose(area2, 0)] = np.inf
+        ratio[~np.isfinite(ratio)] = np.inf
+        res = {'areas': 0.5 * area2, 'edge_lengths': lens, 'angles': angles,
+               'min_angles': np.min(angles, axis=0), 'max_angles': np.max(angles, axis=0),
+               'aspect_ratios': aspect, 'edge_ratios': ratio}
+        return pyr.pmap({k: pimms.imm_array(np.asarray(v, dtype=dt)) for (k,v) in six.iteritems(res)})
+    @pimms.value
+    def vertex_curvature(tess, coordinates, face_quality, vertex_normals):
+        '''
+        mesh.vertex_curvature is a lazy map of per-vertex curvature estimates for the given 3D mesh;
+          each entry is computed when first requested, using sparse accumulation over the faces and
+          edges of the mesh. The map contains the following:
+            * 'areas': the mixed Voronoi area of each vertex, over which the estimates are averaged;
+            * 'gaussian': the Gaussian curvature from the angle deficit at each vertex (on the
+              boundary, the deficit is measured from pi instead of 2 pi);
+            * 'mean': the mean curvature from the cotangent Laplacian of the coordinates;
+            * 'k1', 'k2': the principal curvatures (k1 >= k2), from a least-squares fit of each
+              vertex's curvature tensor to the normal curvatures of its edges;
+            * 'principal_directions': the (2 x 3 x n) unit vectors of the directions of k1 and k2;
+            * 'shape_index': (2/pi) * arctan((k1 + k2) / (k1 - k2)), from -1 (cup) to 1 (cap);
+            * 'curvedness': sqrt((k1**2 + k2**2) / 2).
+          Curvatures are positive where the surface is convex with respect to mesh.vertex_normals,
+          e.g., 1/r for a sphere of radius r with outward normals. For 2D meshes, an error is
+          raised.
+        '''
+        if coordinates.shape[0] != 3:
+            raise ValueError('vertex_curvature is only defined for 3D meshes')
+        n = tess.vertex_count
+        fs = tess.indexed_faces
+        x = np.asarray(coordinates, dtype=np.float)
+        nrm = np.asarray(vertex_normals, dtype=np.float)
+        dt = _geometry_dtype(coordinates)
+        def _acc(ii, w): return np.bincount(ii.flatten(), weights=w.flatten(), minlength=n)
+        def _areas():
+            # the mixed Voronoi area (Meyer et al., 2003); edge k and angle k are opposite vertex k
+            (lens, angs, fa) = [np.asarray(face_quality[k], dtype=np.float)
+                                for k in ('edge_lengths', 'angles', 'areas')]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cot = np.cos(angs) / np.sin(angs)
+            cot[~np.isfinite(cot)] = 0
+            l2c = lens**2 * cot
+            vor = np.asarray([l2c[(k+1) % 3] + l2c[(k+2) % 3] for k in range(3)]) / 8.0
+            obt = angs > 0.5*np.pi
+            a = np.where(np.any(obt, axis=0), np.where(obt, 0.5, 0.25) * fa, vor)
+            return _acc(fs, a)
+        def _gaussian():
+            deficit = np.full(n, 2*np.pi)
+            deficit[_label_indices(tess.labels, tess.boundary_vertices)] = np.pi
+            deficit -= _acc(fs, np.asarray(face_quality['angles'], dtype=np.float))
+            return _curv(deficit)
+        def _mean():
+            # cotangent weights: the edge opposite vertex k of each face gets cot(angle k) / 2
+            angs = np.asarray(face_quality['angles'], dtype=np.float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                w = 0.5 * np.cos(angs) / np.sin(angs)
+            w[~np.isfinite(w)] = 0
+            (u, v) = (fs[[1,2,0]].flatten(), fs[[2,0,1]].flatten())
+            w = w.flatten()
+            (rows, cols, w) = (np.concatenate((u, v)), np.concatenate((v, u)), np.concatenate((w, w)))
+            lap = sps.csr_matrix((w, (rows, cols)), shape=(n, n))
+            lx = x * np.asarray(lap.sum(axis=1)).flatten() - lap.dot(x.T).T
+            return _curv(0.5 * np.sum(lx * nrm, axis=0))
+        def _curv(q):
+            a = vc['areas']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                res = np.where(a > 0, q / a, 0)
+            return pimms.imm_array(np.asarray(res, dtype=dt))
+        def _tensor():
+            # an orthonormal tangent basis (t1, t2) for each vertex
+            ref = np.zeros((3, n))
+            ref[np.argmin(np.abs(nrm), axis=0), np.arange(n)] = 1
+            t1 = np.cross(nrm, ref, axis=0)
+            tl = np.sqrt(np.sum(t1**2, axis=0))
+            t1 /= tl + (tl == 0)
+            t2 = np.cross(nrm, t1, axis=0)
+            # each edge gives the normal curvature at both of its ends in its tangent direction
+            (u, v) = (fs.flatten(), fs[[1,2,0]].flatten())
+            key = np.unique(np.concatenate((u * n + v, v * n + u)))
+            (u, v) = (key // n, key % n)
+            d = x[:,v] - x[:,u]
+            d2 = np.sum(d**2, axis=0)
+            ok = d2 > 0
+            (u, d, d2) = (u[ok], d[:,ok], d2[ok])
+            kn = -2 * np.sum(d * nrm[:,u], axis=0) / d2
+            (p, q) = (np.sum(d * t1[:,u], axis=0), np.sum(d * t2[:,u], axis=0))
+            pq = np.sqrt(p**2 + q**2)
+            pq[pq == 0] = 1
+            (p, q) = (p / pq, q / pq)
+            # least squares for the tensor [a b; b c] in kn = a p^2 + 2 b p q + c q^2
+            f = np.asarray([p*p, 2*p*q, q*q])
+            mtx = np.asarray([[_acc(u, fi*fj) for fj in f] for fi in f]).transpose((2,0,1))
+            rhs = np.asarray([_acc(u, fi*kn) for fi in f]).T
+            mtx += 1e-12 * np.trace(mtx, axis1=1, axis2=2)[:,None,None] * np.eye(3)
+            mtx[np.trace(mtx, axis1=1, axis2=2) == 0] = np.eye(3)
+            (a, b, c) = np.linalg.solve(mtx, rhs[:,:,None])[:,:,0].T
+            (mid, rad) = (0.5*(a + c), np.sqrt((0.5*(a - c))**2 + b**2))
+            th = 0.5 * np.arctan2(2*b, a - c)
+            e1 = np.cos(th)*t1 + np.sin(th)*t2
+            e2 = np.cross(nrm, e1, axis=0)
+            return pyr.m(k1=mid + rad, k2=mid - rad, directions=np.asarray([e1, e2]))
+        def _shape_index():
+            (k1, k2) = (vc['k1'], vc['k2'])
+            return pimms.imm_array(np.asarray(2/np.pi * np.arctan2(k1 + k2, k1 - k2), dtype=dt))
+        def _curvedness():
+            (k1, k2) = (vc['k1'], vc['k2'])
+            return pimms.imm_array(np.asarray(np.sqrt(0.5*(k1**2 + k2**2)), dtype=dt))
+        tns = pimms.lazy_map({'tensor': _tensor})
+        def _tget(k): return lambda:pimms.imm_array(np.asarray(tns['tensor'][k], dtype=dt))
+        vc = pimms.lazy_map({'areas':  lambda:pimms.imm_array(np.asarray(_areas(), dtype=dt)),
+                             'gaussian': _gaussian, 'mean': _mean,
+                             'k1': _tget('k1'), 'k2': _tget('k2'),
+                             'principal_directions': _tget('directions'),
+                             'shape_index': _shape_index, 'curvedness': _curvedness})
+        return vc
     @pimms.value
-    def edge_lengths(edge_coordinates):
+    def signed_face_areas(face_coordinates):
+        '''
+        mesh.signed_face_areas is the length-m numpy array of the signed area of each face in the
+          given 2D mesh; faces whose vertices are in counter-clockwise order have positive areas.
+          For 3D meshes, an error is raised.
+        '''
+        if face_coordinates.shape[1] != 2:
+            raise ValueError('signed_face_areas is only defined for 2D meshes')
+        (u, v) = (face_coordinates[1] - face_coordinates[0], face_coordinates[2] - face_coordinates[0])
+        areas = 0.5 * (u[0]*v[1] - u[1]*v[0])
+        return pimms.imm_array(np.asarray(areas, dtype=_geometry_dtype(face_coordinates)))
+    @pimms.value
+    def edge_lengths(edge_coordinates, _precomputed):
         '''
         mesh.edge_lengths is a numpy array of the lengths of each edge in the given mesh.
         '''
+        pre = _precomputed_value(_precomputed, 'edge_lengths')
+        if pre is not None: return pre
         tmp = np.sqrt(np.sum((edge_coordinates[1] - edge_coordinates[0])**2, axis=0))
+        tmp = np.array(tmp, dtype=_geometry_dtype(edge_coordinates))
         tmp.setflags(write=False)
         return tmp
     @pimms.value
@@ -900,6 +1847,134 @@ class Mesh(VertexSet):
         '''
         try:    return space.cKDTree(coordinates.T)
         except: return space.KDTree(coordinates.T)
+    @pimms.value
+    def edge_hash(edge_coordinates, edge_lengths):
+        '''
+        mesh.edge_hash is a uniform-grid spatial hash of the edges of the given 2D mesh, used by
+          mesh.segment_intersections(); it is a persistent map whose 'matrix' is a scipy.sparse
+          csr_matrix whose row k contains the indices of the edges whose bounding boxes overlap
+          cell k of a grid with the given 'origin', 'cell_size', and 'shape' (cells are numbered in
+          row-major order). For 3D meshes, an error is raised.
+        '''
+        if edge_coordinates.shape[1] != 2:
+            raise ValueError('edge_hash is only defined for 2D meshes')
+        (a, b) = [np.asarray(x, dtype=np.float) for x in edge_coordinates]
+        ne = a.shape[1]
+        (lo, hi) = (np.minimum(a, b), np.maximum(a, b))
+        origin = np.min(lo, axis=1) if ne > 0 else np.zeros(2)
+        extent = (np.max(hi, axis=1) - origin) if ne > 0 else np.zeros(2)
+        # cells are about twice the median edge length, but no more than 4 cells per edge are used
+        cell = 2 * np.median(edge_lengths) if ne > 0 else 1.0
+        cell = max(cell, np.sqrt(np.prod(extent + 1e-12) / (4.0 * max(ne, 1))), 1e-12)
+        shape = np.floor(extent / cell).astype(np.int) + 1
+        (ilo, ihi) = [np.clip(np.floor((x - origin[:,None]) / cell).astype(np.int),
+                              0, shape[:,None] - 1)
+                      for x in (lo, hi)]
+        (ni, nj) = ihi - ilo + 1
+        cnt = ni * nj
+        eids = np.repeat(np.arange(ne), cnt)
+        k = np.arange(len(eids)) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        nj = np.repeat(nj, cnt)
+        cells = (np.repeat(ilo[0], cnt) + k // nj) * shape[1] + np.repeat(ilo[1], cnt) + k % nj
+        mtx = sps.csr_matrix((np.ones(len(eids), dtype=np.bool), (cells, eids)),
+                             shape=(shape[0]*shape[1], ne))
+        return pyr.m(origin=pimms.imm_array(origin), cell_size=cell, shape=tuple(shape),
+                     matrix=mtx)
+    @pimms.value
+    def face_bvh(face_coordinates, _spatial_hashes):
+        '''
+        mesh.face_bvh is a bounding-volume hierarchy over the faces of the given mesh, used by
+          mesh.ray_intersections(); it is a persistent map whose 'order' is a permutation of the face
+          indices and whose 'start', 'end', 'child', 'lower', and 'upper' arrays give, for each node
+          of the hierarchy, its range in order, the index of its first child (or -1 for a leaf), and
+          the corners of its bounding box. Leaves contain at most Mesh.bvh_leaf_size faces. If the
+          mesh was copied from a mesh whose face_bvh had been built, only the bounding boxes of that
+          hierarchy are recalculated, unless doing so would make it much less efficient (see
+          Mesh.bvh_refit_tolerance).
+        '''
+        bvh = (_spatial_hashes or {}).get('face_bvh')
+        if bvh is not None:
+            bvh = _refit_bvh(bvh, face_coordinates, Mesh.bvh_refit_tolerance)
+        return _build_bvh(face_coordinates, Mesh.bvh_leaf_size) if bvh is None else bvh
+    @pimms.value
+    def edge_graph(tess, edge_lengths):
+        '''
+        mesh.edge_graph is the (n x n) symmetric scipy.sparse.csr_matrix whose element (i,j) is the
+          length of the edge between the vertices with indices i and j, if any; this is the graph
+          over which mesh.geodesic_distances() runs Dijkstra's algorithm.
+        '''
+        (u,v) = tess.indexed_edges
+        n = tess.vertex_count
+        return sps.csr_matrix((np.concatenate((edge_lengths, edge_lengths)),
+                               (np.concatenate((u,v)), np.concatenate((v,u)))),
+                              shape=(n,n))
+    @pimms.value
+    def face_angle_cotangents(face_angle_cosines):
+        '''
+        mesh.face_angle_cotangents is the (3 x m) matrix of the cotangents of the angles of each of
+        the faces of the mesh; degenerate angles (0 or pi) are given a cotangent of 0.
+        '''
+        sines = np.sqrt(np.clip(1.0 - face_angle_cosines**2, 0.0, 1.0))
+        return pimms.imm_array(face_angle_cosines * zinv(sines))
+    @pimms.value
+    def vertex_areas(tess, face_areas):
+        '''
+        mesh.vertex_areas is the length-n numpy array of the barycentric area of each vertex in the
+        given mesh; i.e., one third of the summed area of the faces that contain the vertex.
+        '''
+        return pimms.imm_array(simplex_summation_matrix(tess.indexed_faces).dot(face_areas) / 3.0)
+    @pimms.value
+    def cotangent_laplacian(tess, face_angle_cotangents):
+        '''
+        mesh.cotangent_laplacian is the (n x n) positive semi-definite cotangent Laplacian matrix C
+          of the given mesh as a scipy.sparse.csc_matrix; for an edge (i,j) opposite the angles a and
+          b, C[i,j] is -(cot(a) + cot(b))/2, and each row of C sums to 0.
+        '''
+        (a,b,c) = tess.indexed_faces
+        n = tess.vertex_count
+        w = sps.csr_matrix((0.5 * np.concatenate(face_angle_cotangents),
+                            (np.concatenate((b,c,a)), np.concatenate((c,a,b)))),
+                           shape=(n,n))
+        w = w + w.T
+        return (sps.diags(np.asarray(w.sum(axis=1))[:,0], 0) - w).tocsc()
+    @pimms.value
+    def _heat_method_data(coordinates, tess, face_areas, face_angle_cotangents,
+                          cotangent_laplacian, vertex_areas, edge_lengths):
+        '''
+        mesh._heat_method_data is a persistent map of the data required by the heat method of
+        geodesic distance calculation (see mesh.geodesic_distances); this includes the factorized
+        heat-flow and Poisson operators, so that all heat-method queries on a mesh share a single
+        factorization.
+        '''
+        # 2D meshes are treated as lying in the z=0 plane
+        x = coordinates if coordinates.shape[0] == 3 else \
+            np.vstack((coordinates, np.zeros((1, coordinates.shape[1]))))
+        fx = np.asarray([x[:,f] for f in tess.indexed_faces]) # (3 x 3 x m)
+        # the edge opposite each corner, in counter-clockwise order
+        opp = np.roll(fx, -1, axis=0) - np.roll(fx, 1, axis=0)
+        nrm = np.cross(fx[1] - fx[0], fx[2] - fx[0], axisa=0, axisb=0).T
+        nrm = nrm * zinv(np.sqrt(np.sum(nrm**2, axis=0)))
+        # gradient basis: grad(u) on face f = sum_k u[k] * gbasis[k,:,f]
+        gbasis = np.cross(nrm, opp, axisa=0, axisb=1, axisc=1) * (0.5 * zinv(face_areas))
+        # divergence: for corner k, the edges to the other two corners weighted by the cotangents
+        # of the angles opposite them
+        (cot1, cot2) = [np.roll(face_angle_cotangents, s, axis=0) for s in (-1, -2)]
+        e1 = np.roll(fx, -1, axis=0) - fx
+        e2 = np.roll(fx, -2, axis=0) - fx
+        dbasis = 0.5 * (cot2[:,None,:] * e1 + cot1[:,None,:] * e2)
+        t = np.mean(edge_lengths)**2
+        mass = sps.diags(vertex_areas, 0)
+        eps = 1e-8 * np.mean(vertex_areas)
+        # the matrix that sums the (3*m) per-corner divergence terms onto the vertices
+        m3 = 3 * tess.face_count
+        dmtx = sps.csr_matrix((np.ones(m3), (np.concatenate(tess.indexed_faces), range(m3))),
+                              shape=(tess.vertex_count, m3))
+        return pyr.m(time=t,
+                     gradient_basis=gbasis,
+                     divergence_basis=dbasis,
+                     divergence_matrix=dmtx,
+                     heat_solver=spsla.splu((mass + t*cotangent_laplacian).tocsc()),
+                     poisson_solver=spsla.splu((cotangent_laplacian + eps*mass).tocsc()))
 
     # requirements/validators
     @pimms.require
@@ -914,6 +1989,13 @@ class Mesh(VertexSet):
             raise ValueError('Only 2D and 3D meshes are supported')
         return True
     @pimms.value
+    def content_hash(coordinates, tess):
+        '''
+        mesh.content_hash is a hexadecimal string that identifies the coordinates and tesselation of
+        the given mesh (but not its properties or meta-data); see neuropythy.util.content_hash.
+        '''
+        return content_hash(('Mesh', coordinates, tess))
+    @pimms.value
     def repr(coordinates, vertex_count, tess):
         '''
         mesh.repr is the representation string returned by mesh.__repr__().
@@ -925,6 +2007,36 @@ class Mesh(VertexSet):
     def __repr__(self):
         return self.repr
 
+    def _precision_params(self, policy):
+        return dict(VertexSet._precision_params(self, policy),
+                    coordinates=apply_precision(self.coordinates, 'float', policy=policy),
+                    tess=self.tess.with_precision(policy))
+    def spatial_hash_basis(self):
+        '''
+        mesh.spatial_hash_basis() yields a persistent map of the spatial hashes that have already
+          been built by mesh (or that mesh would refit), suitable for the _spatial_hashes parameter
+          of a mesh with the same tesselation; None is yielded if there are no such hashes. Only the
+          face_bvh is currently refit; the face_hash and vertex_hash are always rebuilt.
+        '''
+        dat = object.__getattribute__(self, '__dict__')
+        res = dict(self._spatial_hashes or {})
+        if 'face_bvh' in dat: res['face_bvh'] = dat['face_bvh']
+        return pyr.pmap(res) if len(res) > 0 else None
+    def copy(self, **kwargs):
+        '''
+        mesh.copy(...) is equivalent to VertexSet.copy(mesh, ...) except that, when only the
+          coordinates of the mesh are changed, the spatial hashes already built by mesh are refit
+          to the new coordinates by the copy instead of being rebuilt from scratch (see
+          mesh.spatial_hash_basis() and Mesh.bvh_refit_tolerance).
+        '''
+        kw = self._changed_params(kwargs)
+        if '_spatial_hashes' not in kw and ('coordinates' in kw or 'tess' in kw):
+            # the hashes can only be refit to points of the same number and dimension
+            x = np.asarray(kw.get('coordinates', self.coordinates))
+            if x.shape[0] not in (2, 3): x = x.T
+            same = 'tess' not in kw and x.shape == self.coordinates.shape
+            kw['_spatial_hashes'] = self.spatial_hash_basis() if same else None
+        return pimms.imm_copy(self, **kw)
     def submesh(self, vertices, tag=None, tag_tess=Ellipsis):
         '''
         mesh.submesh(vertices) yields a sub-mesh of the given mesh object that only contains the
@@ -952,14 +2064,108 @@ class Mesh(VertexSet):
         if props is not self._properties: dat['_properties'] = props
         if md is not self.meta_data: dat['meta_data'] = md
         return self.copy(**dat)
-    def select(self, fn, tag=None, tag_tess=Ellipsis):
+    def select(self, fn, tag=None, tag_tess=Ellipsis, vectorized=False):
         '''
         mesh.select(fn) is equivalent to mesh.subtess(mesh.map(fn)); any vertex whose
           property data yields True or 1 will be included in the new submesh and all other vertices
           will be excluded.
-        The optional parameters tag and tag_tess is used identically as in mesh.submesh().
+        The optional parameters tag and tag_tess is used identically as in mesh.submesh(); fn and
+        the optional parameter vectorized are interpreted as in mesh.mask(), so fn may also be a
+        mapping of property names to conditions.
+        '''
+        return self.submesh(self.mask(fn, vectorized=vectorized), tag=tag, tag_tess=tag_tess)
+    def reorder(self, method='rcm'):
+        '''
+        mesh.reorder() yields a tuple (rmesh, fwd, inv) in which rmesh is a duplicate of the given
+          mesh whose vertices have been reordered to improve the locality of the sparse matrices
+          built over them (e.g., interpolation and smoothing matrices). The vertex with index k in
+          rmesh is the vertex with index fwd[k] in mesh, and the vertex with index i in mesh is the
+          vertex with index inv[i] in rmesh; accordingly, for any vertex property p of mesh, p[fwd]
+          is the same property over rmesh and, for any property q of rmesh, q[inv] is the same
+          property over mesh. All properties of mesh are carried over to rmesh in this way.
+        As with Tesselation.reorder, the vertices of rmesh keep their labels, so rmesh.labels is
+        mesh.labels[fwd].
+        The optional argument method (default: 'rcm') specifies the ordering to use; this may be
+        'rcm', the reverse Cuthill-McKee ordering of the vertex adjacency matrix, or 'morton', the
+        order of the vertex coordinates along a z-order space-filling curve.
         '''
-        return self.submesh(self.map(fn), tag=tag, tag_tess=tag_tess)
+        method = method.lower()
+        if method in ('morton', 'z-order', 'zorder'):
+            fwd = _morton_order(self.coordinates)
+            (rtess, inv) = self.tess._permuted(fwd)
+        else: (rtess, fwd, inv) = self.tess.reorder(method)
+        props = self._properties
+        if props is not None and props.row_count > 0: props = props[fwd]
+        rmesh = self.copy(coordinates=self.coordinates[:,fwd], tess=rtess, _properties=props)
+        return (rmesh, fwd, inv)
+    def icosphere_interpolation(self, order=7, method='linear', n_jobs=1):
+        '''
+        mesh.icosphere_interpolation(k) yields a lazy persistent map of the data needed to resample
+          the given spherical mesh onto the icosahedral sphere of order k (see icosphere) and back:
+            * 'icosphere': the icosphere, scaled to the mean radius of the mesh's vertices;
+            * 'forward': the interpolation matrix from the vertices of mesh to those of the
+              icosphere, such that forward.dot(u) resamples a vertex property u onto the icosphere;
+            * 'inverse': the interpolation matrix from the icosphere back to the vertices of mesh.
+          The matrices are only computed when requested and can be used with mesh.apply_interpolation
+          and icosphere.apply_interpolation, respectively. The mesh should be a sphere centered at
+          the origin, such as a FreeSurfer sphere or spherical registration.
+        The optional argument method (default: 'linear') may be 'linear' or 'nearest', and n_jobs is
+        passed along to the interpolation functions. Results are cached by the mesh's content hash in
+        the dictionary Mesh.icosphere_interpolation_cache (see also
+        Mesh.icosphere_interpolation_cache_size), so the matrices for a subject's sphere are only
+        computed once.
+        '''
+        if self.coordinates.shape[0] != 3:
+            raise ValueError('icosphere_interpolation requires a 3D spherical mesh')
+        method = method.lower()
+        if method not in ('linear', 'nearest'):
+            raise ValueError('icosphere_interpolation method must be linear or nearest')
+        cache = Mesh.icosphere_interpolation_cache
+        key = (self.content_hash, int(order), method)
+        dat = cache.get(key)
+        if dat is not None: return dat
+        rad = np.mean(np.sqrt(np.sum(self.coordinates**2, axis=0)))
+        ico = icosphere(order, rad)
+        f = (lambda m:m.linear_interpolation) if method == 'linear' else \
+            (lambda m:m.nearest_interpolation)
+        dat = pimms.lazy_map({'icosphere': lambda:ico,
+                              'forward':   lambda:f(self)(ico.coordinates, n_jobs=n_jobs),
+                              'inverse':   lambda:f(ico)(self.coordinates, n_jobs=n_jobs)})
+        while len(cache) >= Mesh.icosphere_interpolation_cache_size: cache.popitem(last=False)
+        cache[key] = dat
+        return dat
+    def pyramid(self, levels=None, min_vertices=64):
+        '''
+        mesh.pyramid() yields a tuple of persistent maps, one per level of a multi-resolution
+          pyramid of the given mesh, as yielded by mesh.tess.pyramid(); each map additionally
+          contains the key 'mesh', whose value is the level's mesh. The vertices of each coarse
+          mesh are a subset of the vertices of mesh and keep their coordinates, and the
+          'prolongation' and 'restriction' matrices of each level interpolate vertex properties
+          between it and the level before it. The options levels and min_vertices are passed to
+          mesh.tess.pyramid(); because coarsening depends only on the tesselation, meshes that
+          share a tesselation (e.g., the surfaces of a cortex) share their pyramid operators.
+        The vertex properties of each coarse mesh are those of the level before it, restricted by
+        the level's 'restriction' matrix; properties that are not floating-point (e.g., labels)
+        are instead copied from the vertices of mesh that the coarse mesh keeps.
+        '''
+        (res, props) = ([], self._properties)
+        if props is not None and props.row_count == 0: props = None
+        for dat in self.tess.pyramid(levels=levels, min_vertices=min_vertices):
+            if dat['tess'] is self.tess:
+                res.append(dat.set('mesh', self))
+                continue
+            if props is not None:
+                (rmtx, vs) = (dat['restriction'], dat['vertices'])
+                props = pimms.itable(
+                    {k:(np.asarray(rmtx.dot(u), dtype=u.dtype)
+                        if np.issubdtype(u.dtype, np.floating) else
+                        np.asarray(self._properties[k])[vs])
+                     for k in six.iterkeys(props)
+                     for u in [np.asarray(props[k])]})
+            m = Mesh(dat['tess'], self.coordinates[:,dat['vertices']], meta_data=self.meta_data,
+                     properties=props)
+            res.append(dat.set('mesh', m))
+        return tuple(res)
     
     # True if the point is in the triangle, otherwise False; tri_no is an index into the faces
     def is_point_in_face(self, tri_no, pt):
@@ -972,11 +2178,8 @@ class Mesh(VertexSet):
         '''
         pt = np.asarray(pt)
         tri_no = np.asarray(tri_no)
-        if len(tri_no) == 0:
-            tri = self.coordinates[:, self.tess.indexed_faces[:, tri_no]]
-        else:
-            tri = np.transpose([self.coordinates[:,t] for t in self.tess.indexed_faces[:,tri_no]],
-                               (2,0,1))
+        tri = self.coordinates[:, self.tess.indexed_faces[:, tri_no]]
+        tri = tri.T if len(tri_no.shape) == 0 else np.transpose(tri, (2,1,0))
         return point_in_triangle(tri, pt)
 
     def _find_triangle_search(self, x, k=24, searched=set([])):
@@ -1067,6 +2270,409 @@ class Mesh(VertexSet):
         n = self.coordinates.shape[1]
         (_, nei) = self.vertex_hash.query(x, k=1) #n_jobs fails? version problem?
         return nei
+    def _element_query_data(self, x, element):
+        # yields (hash, coords, count, query_points) for the neighbor queries below
+        element = 'vertices' if element is None else element.lower()
+        if element in ['vertices', 'vertex', 'v']:
+            (hsh, crds) = (self.vertex_hash, self.coordinates)
+        elif element in ['faces', 'face', 'f', 'face_centers']:
+            (hsh, crds) = (self.face_hash, self.face_centers)
+        else: raise ValueError('element must be \'vertices\' or \'faces\'')
+        if not isinstance(x, Mesh):
+            x = np.asarray(x)
+            if len(x.shape) == 1: x = np.asarray([x])
+            elif x.shape[0] == crds.shape[0] and x.shape[1] != crds.shape[0]: x = x.T
+        return (hsh, crds, crds.shape[1], x)
+    def radius_neighbors(self, x, radius, element='vertices', n_jobs=1):
+        '''
+        mesh.radius_neighbors(x, r) yields a (p x n) scipy.sparse.csr_matrix whose row i contains,
+          in its sparsity structure, the indices of all vertices within the Euclidean distance r of
+          the i'th of the p points in the coordinate matrix x; the values of the matrix are the
+          distances. Because a point may coincide with a vertex, the matrix may contain explicit
+          zeros; the neighbors of point i should be read from the row's indices rather than from its
+          non-zero values.
+        mesh.radius_neighbors(m, r), for a mesh m, uses the vertices of m as the points x; in this
+          case the cached spatial hashes of both meshes are used to find all the pairs at once.
+
+        The following options are accepted:
+          * element (default: 'vertices') may be set to 'faces' to query the centers of the faces
+            (see mesh.face_hash) instead of the vertices; in this case the matrix is (p x m) where m
+            is the number of faces.
+          * n_jobs (default: 1) specifies the number of threads used by the spatial hash, if
+            supported by the installed version of scipy; -1 indicates all processors.
+        '''
+        (hsh, crds, n, x) = self._element_query_data(x, element)
+        if isinstance(x, Mesh):
+            res = x.vertex_hash.sparse_distance_matrix(hsh, radius, output_type='coo_matrix')
+            res = res.tocsr()
+            res.sort_indices()
+            return res
+        p = x.shape[0]
+        idcs = _kdtree_call(hsh.query_ball_point, n_jobs, x, radius)
+        lens = np.asarray([len(u) for u in idcs], dtype=np.int)
+        indptr = np.concatenate(([0], np.cumsum(lens)))
+        cols = np.concatenate([np.asarray(u, dtype=np.int) for u in idcs] + [[]]).astype(np.int)
+        rows = np.repeat(np.arange(p), lens)
+        dists = np.sqrt(np.sum((crds[:,cols].T - x[rows])**2, axis=1))
+        res = sps.csr_matrix((dists, cols, indptr), shape=(p, n))
+        res.sort_indices()
+        return res
+    def segment_intersections(self, x0, x1, edge_parameters=False):
+        '''
+        mesh.segment_intersections(x0, x1) yields a (q x e) scipy.sparse.csr_matrix for the 2D mesh
+          and the q line segments from the points in the coordinate matrix x0 to the points in x1,
+          where e is the number of edges in the mesh (see mesh.tess.indexed_edges). Row i of the
+          matrix contains, in its sparsity structure, the indices of the edges crossed by the i'th
+          segment, and the values are the parameters t (0 <= t <= 1) at which they are crossed, i.e.,
+          the crossing point is x0 + t*(x1 - x0). Because a segment may cross an edge at its start,
+          the matrix may contain explicit zeros; the crossed edges of segment i should be read from
+          the row's indices rather than from its non-zero values. Segments that are parallel to an
+          edge are not considered to cross it.
+        mesh.segment_intersections(x0, x1, edge_parameters=True) yields a tuple (T, U) of two such
+          matrices with the same sparsity structure; U contains the parameters u at which the edges
+          are crossed, i.e., the crossing point is a + u*(b - a) for the edge from vertex a to b.
+
+        The edges are found using the uniform-grid spatial hash mesh.edge_hash, so the cost of a
+        query is proportional to the number of grid cells that each segment passes through rather
+        than to the number of edges in the mesh.
+        '''
+        if self.coordinates.shape[0] != 2:
+            raise ValueError('segment_intersections requires a 2D mesh')
+        (x0, x1) = [np.asarray(x, dtype=np.float) for x in (x0, x1)]
+        (x0, x1) = [np.reshape(x, (1,2)) if len(x.shape) == 1 else
+                    x.T if x.shape[0] == 2 and x.shape[1] != 2 else x
+                    for x in (x0, x1)]
+        (x0, x1) = np.broadcast_arrays(x0, x1)
+        (q, ne) = (len(x0), self.tess.edge_count)
+        hsh = self.edge_hash
+        (origin, cell, shape) = (hsh['origin'], hsh['cell_size'], np.asarray(hsh['shape']))
+        # cover each segment with pieces no longer than a cell; each piece's bounding box touches at
+        # most 2 x 2 cells, and together these include every cell the segment passes through
+        r = x1 - x0
+        fin = np.isfinite(np.sum(x0 + r, axis=1))
+        npcs = np.zeros(q, dtype=np.int)
+        npcs[fin] = np.maximum(np.ceil(np.sqrt(np.sum(r[fin]**2, axis=1)) / cell), 1)
+        sids = np.repeat(np.arange(q), npcs)
+        k = np.arange(len(sids)) - np.repeat(np.cumsum(npcs) - npcs, npcs)
+        f = np.repeat(npcs, npcs).astype(np.float)
+        (pa, pb) = [x0[sids] + r[sids] * (kk / f)[:,None] for kk in (k, k + 1)]
+        (ilo, ihi) = [np.clip(np.floor((x - origin) / cell).astype(np.int), 0, shape - 1)
+                      for x in (np.minimum(pa, pb), np.maximum(pa, pb))]
+        rows = []
+        cols = []
+        for di in (0, 1):
+            for dj in (0, 1):
+                (ii, jj) = (np.minimum(ilo[:,0] + di, ihi[:,0]), np.minimum(ilo[:,1] + dj, ihi[:,1]))
+                rows.append(sids)
+                cols.append(ii * shape[1] + jj)
+        cover = sps.csr_matrix((np.ones(4*len(sids), dtype=np.bool),
+                                (np.concatenate(rows), np.concatenate(cols))),
+                               shape=(q, len(hsh['matrix'].indptr) - 1))
+        cand = (cover * hsh['matrix']).tocoo()
+        (si, ei) = (cand.row, cand.col)
+        # exact crossing tests for the candidate (segment, edge) pairs
+        (a, b) = [np.asarray(x, dtype=np.float).T for x in self.edge_coordinates]
+        (a, s) = (a[ei], b[ei] - a[ei])
+        (p, r) = (x0[si], r[si])
+        cross = lambda u,v: u[:,0]*v[:,1] - u[:,1]*v[:,0]
+        den = cross(r, s)
+        par = np.isclose(den, 0)
+        den = den + par
+        (t, u) = (cross(a - p, s) / den, cross(a - p, r) / den)
+        tol = 1e-9
+        ok = ~par & (t >= -tol) & (t <= 1 + tol) & (u >= -tol) & (u <= 1 + tol)
+        (si, ei, t, u) = (si[ok], ei[ok], np.clip(t[ok], 0, 1), np.clip(u[ok], 0, 1))
+        ii = np.lexsort((ei, si))
+        (si, ei, t, u) = (si[ii], ei[ii], t[ii], u[ii])
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(si, minlength=q))))
+        res = sps.csr_matrix((t, ei, indptr), shape=(q, ne))
+        if not edge_parameters: return res
+        return (res, sps.csr_matrix((u, ei, indptr), shape=(q, ne)))
+    def ray_intersections(self, x0, u, max_t=None, all_hits=False):
+        '''
+        mesh.ray_intersections(x0, u) yields a dictionary describing where the q rays that start at
+          the points in the coordinate matrix x0 and point in the directions given by the coordinate
+          matrix u first hit the faces of the given 3D mesh. The dictionary contains the following:
+            * 'face_id': the index of the face hit by each ray, or -1 if the ray hits nothing;
+            * 't': the ray parameter of each hit (the point of the hit is x0 + t*u), or nan;
+            * 'faces' and 'coordinates': the address of each hit, in the format yielded by
+              mesh.address(), such that mesh.unaddress(hits) yields the (3 x q) hit points.
+        mesh.ray_intersections(x0, x1 - x0, max_t=1) finds the first hits of the line segments from
+          the points x0 to the points x1.
+
+        The following options are accepted:
+          * max_t (default: None) specifies the largest ray parameter at which a hit is found; this
+            may be a number or a vector with one value per ray.
+          * all_hits (default: False) may be set to True to find every hit of each ray; in this case
+            the dictionary contains one entry per hit, and an additional key 'ray' gives the index
+            of the ray of each hit. Hits are sorted by ray then by t; a ray that crosses an edge or
+            vertex of the mesh may hit each of the faces that share it.
+
+        Faces are hit from either side. The mesh's face_bvh is used to find the faces near each
+        ray, so the cost of a query grows with the logarithm of the number of faces.
+        '''
+        if self.coordinates.shape[0] != 3:
+            raise ValueError('ray_intersections requires a 3D mesh')
+        (x0, u) = [np.asarray(x, dtype=np.float) for x in (x0, u)]
+        (x0, u) = [np.reshape(x, (1,3)) if len(x.shape) == 1 else
+                   x.T if x.shape[0] == 3 and x.shape[1] != 3 else x
+                   for x in (x0, u)]
+        (x0, u) = [np.array(x) for x in np.broadcast_arrays(x0, u)]
+        q = len(x0)
+        max_t = np.full(q, np.inf) if max_t is None else \
+                np.array(np.broadcast_to(np.asarray(max_t, dtype=np.float), (q,)))
+        (r, f, t, b1, b2) = _bvh_ray_query(self.face_bvh, self.face_coordinates, x0, u, max_t,
+                                           not all_hits)
+        # in the Moller-Trumbore algorithm, b1 and b2 weight the 2nd and 3rd vertices of each face
+        bc = np.asarray([1 - b1 - b2, b1])
+        if all_hits:
+            return {'ray': r, 'face_id': f, 't': t, 'faces': self.tess.faces[:,f],
+                    'coordinates': np.clip(bc, 0, 1)}
+        fids = np.full(q, -1, dtype=np.int)
+        fids[r] = f
+        tt = np.full(q, np.nan)
+        tt[r] = t
+        coords = np.full((2, q), np.nan)
+        coords[:,r] = np.clip(bc, 0, 1)
+        found = fids >= 0
+        faces = self.tess.faces[:, np.where(found, fids, 0)]
+        if not found.all():
+            faces = faces.astype(np.object)
+            faces[:,~found] = None
+        return {'face_id': fids, 't': tt, 'faces': faces, 'coordinates': coords}
+    def quality(self, reference=None):
+        '''
+        mesh.quality() yields a persistent map of per-face quality metrics of the given mesh:
+            * 'areas': the area of each face;
+            * 'edge_lengths': the (3 x m) lengths of the edges of each face, where edge k is
+              opposite vertex k;
+            * 'angles': the (3 x m) interior angles (in radians) of each face at each vertex;
+            * 'min_angles', 'max_angles': the smallest and largest angle of each face;
+            * 'aspect_ratios': the ratio of each face's circumradius to twice its inradius, which is
+              1 for equilateral faces and infinite for degenerate faces;
+            * 'edge_ratios': the ratio of each face's longest edge to its shortest edge.
+        mesh.quality(ref) additionally compares the mesh to the mesh ref, which must have the same
+          tesselation, and includes the following distortion metrics:
+            * 'area_ratios': the ratio of each face's area to its area in ref;
+            * 'log_area_ratios': the base-2 logarithm of the area ratios;
+            * 'edge_length_ratios': the (3 x m) ratios of the edge lengths to those in ref;
+            * 'angle_differences': the (3 x m) differences between the angles and those in ref;
+            * 'angle_distortions': the largest absolute angle difference of each face.
+
+        The per-mesh metrics are computed in one pass and cached (see mesh.face_quality), so
+        comparing a sequence of meshes, e.g., the steps of a registration, to the same reference
+        requires only element-wise operations on cached arrays.
+        '''
+        q = self.face_quality
+        if reference is None: return q
+        if not isinstance(reference, Mesh):
+            raise ValueError('quality reference must be a Mesh object')
+        if reference.tess is not self.tess and \
+           (reference.tess.faces.shape != self.tess.faces.shape or
+            not np.array_equal(reference.tess.faces, self.tess.faces)):
+            raise ValueError('quality reference must have the same tesselation as the mesh')
+        r = reference.face_quality
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ar = q['areas'] / r['areas']
+            lr = q['edge_lengths'] / r['edge_lengths']
+            lar = np.log2(ar)
+        da = q['angles'] - r['angles']
+        res = {'area_ratios': ar, 'log_area_ratios': lar, 'edge_length_ratios': lr,
+               'angle_differences': da, 'angle_distortions': np.max(np.abs(da), axis=0)}
+        return q.update({k: pimms.imm_array(v) for (k,v) in six.iteritems(res)})
+    def flipped_faces(self):
+        '''
+        mesh.flipped_faces() yields the indices of the faces of the given 2D mesh whose orientation
+          is opposite that of the mesh as a whole, i.e., whose signed areas (see
+          mesh.signed_face_areas) have the opposite sign of the sum of all the signed areas. In a
+          registered 2D map, such faces have been folded over their neighbors.
+        '''
+        sa = self.signed_face_areas
+        return np.where(sa * np.sign(np.sum(sa)) < 0)[0]
+    def self_intersections(self):
+        '''
+        mesh.self_intersections() yields a (k x 2) numpy array of the pairs of indices (f, g), f < g,
+          of the faces of the given 3D mesh that intersect each other anywhere other than along
+          their shared vertices or edge. Candidate pairs are found using the bounding boxes of the
+          mesh's face_bvh, and each candidate is tested according to the vertices it shares:
+            * faces that share no vertex intersect if an edge of either passes through the other;
+            * faces that share one vertex intersect if the edge of either that is opposite the
+              shared vertex passes through the other;
+            * faces that share an edge intersect if they lie in the same plane with their other
+              vertices on the same side of that edge, i.e., if one is folded onto the other.
+          Faces that share no edge but lie in the same plane are not detected.
+        '''
+        if self.coordinates.shape[0] != 3:
+            raise ValueError('self_intersections requires a 3D mesh')
+        tris = self.face_coordinates
+        pairs = _bvh_overlaps(self.face_bvh, np.min(tris, axis=0), np.max(tris, axis=0))
+        fs = self.tess.indexed_faces
+        # eq[i,j,p] is True if vertex i of the first face of pair p is vertex j of the second face
+        eq = fs[:,None,pairs[:,0]] == fs[None,:,pairs[:,1]]
+        nshared = np.sum(eq, axis=(0,1))
+        (inf, ing) = (np.any(eq, axis=1), np.any(eq, axis=0))
+        hit = np.zeros(len(pairs), dtype=np.bool)
+        tol = 1e-9
+        def _edge_hits(ii, f, g, ks):
+            # whether the edges (ks, ks + 1) of faces f pass through faces g
+            (a, b, c) = [x[:,g].T for x in tris]
+            (x0, x1) = (tris[ks, :, f], tris[(ks + 1) % 3, :, f])
+            (t, _, _, ok) = _ray_triangle(x0, x1 - x0, a, b, c, tol)
+            hit[ii] |= ok & (t >= -tol) & (t <= 1 + tol)
+        ii = np.where(nshared == 0)[0]
+        for (f, g) in [(pairs[ii,0], pairs[ii,1]), (pairs[ii,1], pairs[ii,0])]:
+            for k in range(3): _edge_hits(ii, f, g, np.full(len(ii), k, dtype=np.int))
+        ii = np.where(nshared == 1)[0]
+        for (f, g, sh) in [(pairs[ii,0], pairs[ii,1], inf[:,ii]),
+                           (pairs[ii,1], pairs[ii,0], ing[:,ii])]:
+            _edge_hits(ii, f, g, (np.argmax(sh, axis=0) + 1) % 3)
+        ii = np.where(nshared == 2)[0]
+        (f, g) = (pairs[ii,0], pairs[ii,1])
+        (kf, kg) = (np.argmin(inf[:,ii], axis=0), np.argmin(ing[:,ii], axis=0))
+        (u, v) = (tris[(kf + 1) % 3, :, f], tris[(kf + 2) % 3, :, f])
+        (nf, ng) = [np.cross(v - u, x - u) for x in (tris[kf, :, f], tris[kg, :, g])]
+        (lf, lg) = [np.sqrt(np.sum(x**2, axis=1)) for x in (nf, ng)]
+        sn = np.sqrt(np.sum(np.cross(nf, ng)**2, axis=1))
+        hit[ii] = (np.sum(nf * ng, axis=1) > 0) & (sn <= tol * lf * lg)
+        pairs = pairs[hit]
+        return pairs[np.lexsort((pairs[:,1], pairs[:,0]))]
+    def fold_report(self):
+        '''
+        mesh.fold_report() yields a dictionary that summarizes the folds in the given mesh. For 2D
+          meshes, the dictionary contains the 'signed_areas' of the faces (see
+          mesh.signed_face_areas) and the 'flipped_faces' and 'flipped_count' (see
+          mesh.flipped_faces). For 3D meshes, it contains the 'intersecting_faces' and
+          'intersection_count' (see mesh.self_intersections) and the 'intersecting_face_count' of
+          the faces that intersect any other face.
+        '''
+        if self.coordinates.shape[0] == 2:
+            ff = self.flipped_faces()
+            return {'signed_areas': self.signed_face_areas, 'flipped_faces': ff,
+                    'flipped_count': len(ff)}
+        else:
+            ii = self.self_intersections()
+            return {'intersecting_faces': ii, 'intersection_count': len(ii),
+                    'intersecting_face_count': len(np.unique(ii))}
+    def isolines(self, data, values, mask=None, parameters=None):
+        '''
+        mesh.isolines(data, values) yields a dictionary that describes the polylines along which the
+          given vertex data (a vector or property name) crosses each of the given values (a number
+          or vector of numbers), as found by marching triangles. The lines of all values are stored
+          in compact arrays; the points of line k are points[offsets[k]:offsets[k+1]], and each
+          point lies on an edge of the mesh. The dictionary contains the following:
+            * 'coordinates': the (d x p) coordinates of the points;
+            * 'edges': the (2 x p) vertex indices (u, v) of the edge that each point lies on;
+            * 'weights': the fraction w of the way from u to v at which each point lies, i.e., the
+              point is (1 - w)*x[u] + w*x[v];
+            * 'offsets': the (l + 1) offsets of the l lines into the point arrays;
+            * 'value_index', 'values': the index into values and the value of each line;
+            * 'closed': whether each line is a closed loop, in which case its last point connects
+              back to its first;
+            * 'face_counts': the number of faces crossed by each line.
+          Lines are sorted by value index.
+
+        The following options are accepted:
+          * mask (default: None) may be a boolean mask or a list of vertex indices; only faces whose
+            vertices are all in the mask are included. Faces with non-finite data are always
+            excluded.
+          * parameters (default: None) may be a (k x n) matrix of additional per-vertex coordinates,
+            such as the visual-field coordinates of a retinotopic map, that are interpolated to the
+            points in the same way; these are included in the result as 'parameters' (k x p).
+
+        A vertex is considered above a value if its datum is greater than or equal to the value, so
+        each face is crossed by at most one segment per value. The segments are chained into lines
+        using the orientation of the faces, which must be consistent (as for the faces of a cortical
+        surface); the chaining is vectorized over all segments of all values.
+        '''
+        if pimms.is_str(data): data = self.prop(data)
+        data = np.asarray(data, dtype=np.float)
+        vals = np.asarray(values, dtype=np.float).flatten()
+        n = self.vertex_count
+        if len(data) != n: raise ValueError('isolines data must have one value per vertex')
+        ok = np.isfinite(data)
+        if mask is not None:
+            mask = np.asarray(mask)
+            if mask.dtype != np.bool or len(mask) != n:
+                tmp = np.zeros(n, dtype=np.bool)
+                tmp[mask.astype(np.int)] = True
+                mask = tmp
+            ok &= mask
+        fs = self.tess.indexed_faces
+        fs = fs[:, np.all(ok[fs], axis=0)]
+        # the side of each vertex of each face for each value (q x 3 x m)
+        side = (data[None,:] >= vals[:,None])[:, fs]
+        nxt = side[:, [1,2,0]]
+        # each crossed face yields a segment from its edge that goes from above to below the value
+        # to its edge that goes from below to above; in the neighboring face across the latter edge,
+        # the edge runs in the opposite direction and so begins the next segment
+        (jj, ff) = np.where(np.any(side, axis=1) & ~np.all(side, axis=1))
+        (k0, k1) = [np.argmax(x[jj, :, ff], axis=1)
+                    for x in (side & ~nxt, ~side & nxt)]
+        (es, ne) = (self.tess.indexed_edges, self.tess.edge_count)
+        ekeys = es[0] * n + es[1]
+        eord = np.argsort(ekeys)
+        def _edge_ids(k):
+            (u, v) = (fs[k, ff], fs[(k + 1) % 3, ff])
+            key = np.minimum(u, v) * n + np.maximum(u, v)
+            return jj * ne + eord[np.searchsorted(ekeys, key, sorter=eord)]
+        (nodes, inv) = np.unique(np.concatenate([_edge_ids(k0), _edge_ids(k1)]),
+                                 return_inverse=True)
+        nseg = len(jj)
+        pred = np.full(len(nodes), -1, dtype=np.int)
+        pred[inv[nseg:]] = inv[:nseg]
+        # cycles are cut at their smallest node, then the chains are ranked and sorted
+        (root, rank) = _rank_chains(pred)
+        cut = (root < 0) & (rank == np.arange(len(nodes)))
+        pred[cut] = -1
+        (root, rank) = _rank_chains(pred)
+        order = np.lexsort((rank, root))
+        (heads, cnts) = np.unique(root, return_counts=True)
+        (closed, lvi) = (cut[heads], nodes[heads] // ne)
+        nodes = nodes[order]
+        (vi, ei) = (nodes // ne, nodes % ne)
+        (u, v) = es[:, ei]
+        (du, dv) = (data[u], data[v])
+        w = (vals[vi] - du) / (dv - du)
+        interp = lambda x: x[:,u] * (1 - w) + x[:,v] * w
+        res = {'coordinates': interp(self.coordinates), 'edges': np.asarray([u, v]), 'weights': w,
+               'offsets': np.concatenate(([0], np.cumsum(cnts))).astype(np.int),
+               'value_index': lvi, 'values': vals[lvi], 'closed': closed,
+               'face_counts': np.where(closed, cnts, cnts - 1)}
+        if parameters is not None:
+            parameters = np.asarray(parameters)
+            if len(parameters.shape) == 1: parameters = parameters[None,:]
+            elif parameters.shape[1] != n: parameters = parameters.T
+            res['parameters'] = interp(parameters)
+        return res
+    def nearest_neighbors(self, x, k, element='vertices', radius=None, n_jobs=1):
+        '''
+        mesh.nearest_neighbors(x, k) yields a (p x n) scipy.sparse.csr_matrix whose row i contains,
+          in its sparsity structure, the indices of the k vertices nearest the i'th of the p points
+          in the coordinate matrix x (or of the vertices of x, if x is a mesh); the values of the
+          matrix are the distances, which may include explicit zeros (see radius_neighbors).
+
+        The following options are accepted:
+          * element (default: 'vertices') may be set to 'faces' to query the centers of the faces
+            instead of the vertices; in this case the matrix is (p x m) where m is the number of
+            faces.
+          * radius (default: None) may give an upper bound on the distance of the neighbors; points
+            with fewer than k neighbors in this radius have fewer entries in their rows.
+          * n_jobs (default: 1) specifies the number of threads used by the spatial hash, if
+            supported by the installed version of scipy; -1 indicates all processors.
+        '''
+        (hsh, crds, n, x) = self._element_query_data(x, element)
+        if isinstance(x, Mesh): x = x.coordinates.T
+        p = x.shape[0]
+        k = min(k, n)
+        ub = np.inf if radius is None else radius
+        (d, ii) = _kdtree_call(hsh.query, n_jobs, x, k=k, distance_upper_bound=ub)
+        (d, ii) = [np.reshape(u, (p, k)) for u in (d, ii)]
+        ok = ii < n
+        lens = np.sum(ok, axis=1)
+        res = sps.csr_matrix((d[ok], ii[ok], np.concatenate(([0], np.cumsum(lens)))),
+                             shape=(p, n))
+        res.sort_indices()
+        return res
 
     def distance(self, pt, k=2, n_jobs=1):
         '''
@@ -1089,7 +2695,7 @@ class Mesh(VertexSet):
           closer to p than x0 is to p. The value n depends on your starting parameter k, but is
           approximately 256.
         '''
-        pt = np.asarray(pt, dtype=np.float32)
+        pt = np.asarray(pt, dtype=np.float)
         if len(pt.shape) == 1:
             return self.container([pt], k=k, n_jobs=n_jobs)[0]
         else:
@@ -1185,22 +2791,26 @@ class Mesh(VertexSet):
         else:
             mask_mtx = sps.lil_matrix((n,n))
             diag = np.zeros(n + 1, dtype=np.bool)
-            diag[mask] = 1
+            mask = np.asarray(mask)
+            diag[np.where(mask)[0] if mask.dtype == np.bool else mask] = 1
             mask = diag
             mask_mtx.setdiag(diag[:-1])
             interp = interp.dot(mask_mtx.tocsc())
             interp.eliminate_zeros()
-        # we may need to rescale the rows now:
-        (closest, rowdivs) = np.transpose(
-            [(r.indices[np.argsort(r.data)[-1]], 1/ss) if np.isfinite(ss) and ss > 0 else (n,0)
-             for r in interp
-             for ss in [r.data.sum()]])
-        closest = np.asarray(closest, dtype=np.int)
+        # we may need to rescale the rows now; the closest vertex of each row is the one with the
+        # largest weight (of ties, the last stored)
+        ss = np.asarray(interp.sum(axis=1)).flatten()
+        ok = np.isfinite(ss)
+        ok[ok] = ss[ok] > 0
+        lens = np.diff(interp.indptr)
+        srt = np.lexsort((interp.data, np.repeat(np.arange(m), lens)))
+        closest = np.full(m, n, dtype=np.int)
+        closest[ok] = interp.indices[srt[interp.indptr[1:][ok] - 1]]
+        rowdivs = np.zeros(m)
+        rowdivs[ok] = 1.0 / ss[ok]
         if not np.array_equal(rowdivs, np.ones(len(rowdivs))):
             # rescale the rows
-            rescale_mtx = sps.lil_matrix((m,m))
-            rescale_mtx.setdiag(rowdivs)
-            interp = rescale_mtx.tocsc().dot(interp)
+            interp = sps.diags(rowdivs, format='csr').dot(interp)
         # any row with no interpolation weights or that is nearest to a vertex not in the mesh
         # needs to be given a nan value upon interpolation
         bad_pts = np.logical_not(mask[closest])
@@ -1236,7 +2846,6 @@ class Mesh(VertexSet):
         if coords.shape[0] == self.coordinates.shape[0]: coords = coords.T
         n = self.coordinates.shape[1]
         m = coords.shape[0]
-        mtx = sps.lil_matrix((m, n), dtype=np.float)
         tris = self.tess.indexed_faces
         # first, find the triangle containing each point...
         containers = self.container(coords, n_jobs=n_jobs)
@@ -1246,25 +2855,28 @@ class Mesh(VertexSet):
         containers = containers[contained_idcs].astype(np.int)
         # interpolate for these points
         tris = tris[:,containers]
-        corners = np.transpose(self.face_coordinates[:,:,containers], (0,2,1))
+        corners = np.transpose(self.face_coordinates[:,:,containers], (2,0,1))
         coords = coords[contained_idcs]
-        # get the mini-triangles' areas
-        a_area = triangle_area(coords.T, corners[1].T, corners[2].T)
-        b_area = triangle_area(coords.T, corners[2].T, corners[0].T)
-        c_area = triangle_area(coords.T, corners[0].T, corners[1].T)
-        tot = a_area + b_area + c_area
-        for (x,ii,f,aa,ba,ca,tt) in zip(coords, contained_idcs, tris.T, a_area,b_area,c_area,tot):
-            if np.isclose(tt, 0):
-                (aa,ba,ca) = np.sqrt(np.sum((coords[:,f].T - x)**2, axis=1))
-                # check if we can do line interpolation
-                (zab,zbc,zca) = np.isclose((aa,ba,ca), (ba,ca,aa))
-                (aa,ba,ca) = (1.0,   1.0,      1.0) if zab and zbc and zca else \
-                             (ca,     ca,    aa+ba) if zab                 else \
-                             (ba+ca,  aa,       aa) if zbc                 else \
-                             (ba,     aa+ca,    ba)
-                tt = aa + ba + ca
-            mtx[ii, f] = (aa/tt, ba/tt, ca/tt)
-        return mtx.tocsr()
+        # get the mini-triangles' areas; the k'th is opposite the k'th corner
+        areas = np.empty((len(coords), 3))
+        for k in range(3):
+            sub = np.stack((coords, corners[:,(k+1) % 3], corners[:,(k+2) % 3]), axis=1)
+            batch_triangle_area(sub, out=areas[:,k])
+        for i in np.where(np.isclose(np.sum(areas, axis=1), 0))[0]:
+            (aa,ba,ca) = np.sqrt(np.sum((corners[i] - coords[i])**2, axis=1))
+            # check if we can do line interpolation
+            (zab,zbc,zca) = np.isclose((aa,ba,ca), (ba,ca,aa))
+            areas[i] = (1.0,   1.0,      1.0) if zab and zbc and zca else \
+                       (ca,     ca,    aa+ba) if zab                 else \
+                       (ba+ca,  aa,       aa) if zbc                 else \
+                       (ba,     aa+ca,    ba)
+        areas /= np.sum(areas, axis=1)[:,None]
+        mtx = sps.csr_matrix((areas.flatten(), (np.repeat(contained_idcs, 3), tris.T.flatten())),
+                             shape=(m, n))
+        mtx.eliminate_zeros()
+        mtx.sort_indices()
+        mtx.data = np.asarray(mtx.data, dtype=_geometry_dtype(self.coordinates))
+        return mtx
     def apply_interpolation(self, interp, data, mask=None, weights=None):
         '''
         mesh.apply_interpolation(interp, data) yields the result of applying the given interpolation
@@ -1414,13 +3026,14 @@ class Mesh(VertexSet):
         else:
             data = data if data.shape[1] == 3 or data.shape[1] == 2 else data.T
             face_id = np.asarray(self.container(data))
-            null = np.full((idxfs.shape[0], self.coordinates.shape[0]), np.nan)
-            tx = np.transpose([self.coordinates[:,idxfs[:,f]] if f is not None else null
-                               for f in face_id],
-                              (2,1,0))
-            faces = self.tess.faces
-            null = [None,None,None]
-            faces = np.transpose([faces[:,f] if f is not None else null for f in face_id])
+            found = np.not_equal(face_id, None)
+            fids = np.where(found, face_id, 0).astype(np.int)
+            tx = np.transpose(self.coordinates[:, idxfs[:,fids]], (1,0,2)).astype(np.float)
+            tx[:,:,~found] = np.nan
+            faces = self.tess.faces[:,fids]
+            if not found.all():
+                faces = faces.astype(np.object)
+                faces[:,~found] = None
         bc = cartesian_to_barycentric_3D(tx, data) if self.coordinates.shape[0] == 3 else \
              cartesian_to_barycentric_2D(tx, data)
         return {'faces': faces, 'coordinates': bc}
@@ -1446,9 +3059,10 @@ class Mesh(VertexSet):
                 raise ValueError('%d non-finite coords found when unaddressing (%s)' % (len(w),w))
         selfx = self.coordinates
         if all(len(np.shape(x)) > 1 for x in (faces, coords)):
-            null = np.full((3, selfx.shape[0]), np.nan)
-            tx = np.transpose([selfx[:,ff] if ff[0] is not None else null for ff in faces.T],
-                              (2,1,0))
+            found = np.not_equal(faces[0], None)
+            fids = np.where(found, faces, 0).astype(np.int)
+            tx = np.transpose(selfx[:,fids], (1,0,2)).astype(np.float)
+            tx[:,:,~found] = np.nan
         elif faces is None:
             return np.full(selfx.shape[0], np.nan)
         else:
@@ -1668,6 +3282,152 @@ class Mesh(VertexSet):
         result[mask] = sm_prop
         return result
 
+    # geodesic distances on the surface
+    def _geodesic_source_sets(self, sources):
+        # parses the sources argument of geodesic_distances into (batchq, [index-array...])
+        if pimms.is_int(sources): return (False, [np.asarray([self.tess.index(sources)])])
+        sources = list(sources)
+        if all(pimms.is_int(u) for u in sources):
+            return (False, [np.unique(self.tess.index(sources))])
+        return (True, [np.asarray([self.tess.index(u)]) if pimms.is_int(u) else
+                       np.unique(self.tess.index(list(u)))
+                       for u in sources])
+    def _dijkstra_distances(self, srcs, radius):
+        # one row of distances per source set in srcs (a list of index arrays)
+        g = self.edge_graph
+        n = self.vertex_count
+        lim = np.inf if radius is None else radius
+        if all(len(s) == 1 for s in srcs):
+            return csgraph.dijkstra(g, directed=False, indices=np.concatenate(srcs), limit=lim)
+        # multi-source sets are handled by adding a super-source vertex with zero-length edges
+        # to each of the sources in the set
+        res = np.empty((len(srcs), n))
+        for (k,s) in enumerate(srcs):
+            sg = sps.vstack((sps.hstack((g, sps.csr_matrix((n,1)))),
+                             sps.csr_matrix((np.zeros(len(s)), (np.zeros(len(s)), s)),
+                                            shape=(1,n+1))))
+            res[k] = csgraph.dijkstra(sg.tocsr(), directed=True, indices=n, limit=lim)[:n]
+        return res
+    def _heat_distances(self, srcs, radius):
+        # one row of distances per source set in srcs (a list of index arrays)
+        dat = self._heat_method_data
+        n = self.vertex_count
+        u0 = np.zeros((n, len(srcs)))
+        for (k,s) in enumerate(srcs): u0[s,k] = 1
+        # (1) flow heat from the sources
+        u = dat['heat_solver'].solve(u0)
+        # (2) normalized negative gradient of the heat on each face
+        uf = u[self.tess.indexed_faces]                               # (3 x m x k)
+        grad = np.einsum('idm,imk->dmk', dat['gradient_basis'], uf)   # (3 x m x k)
+        # (the heat is tiny far from the sources, so we normalize by anything that isn't exactly 0)
+        gnorm = np.sqrt(np.sum(grad**2, axis=0))
+        gnorm[gnorm == 0] = np.inf
+        grad /= -gnorm
+        # (3) divergence of the normalized field at the vertices
+        div = np.einsum('idm,dmk->imk', dat['divergence_basis'], grad)
+        div = dat['divergence_matrix'].dot(np.reshape(div, (-1, len(srcs))))
+        # (4) solve the Poisson equation for the distances
+        phi = dat['poisson_solver'].solve(div)
+        phi = (phi - np.min(phi, axis=0)).T
+        if radius is not None: phi[phi > radius] = np.inf
+        return phi
+    def geodesic_distances(self, sources, method='dijkstra', radius=None):
+        '''
+        mesh.geodesic_distances(u) yields a length-n vector of the geodesic distances along the
+          surface of the given mesh from the vertex with label u to each vertex in the mesh.
+        mesh.geodesic_distances([u1, u2...]) yields the distances from each vertex in the mesh to
+          the nearest of the given source vertices.
+        mesh.geodesic_distances([s1, s2...]), where each si is a vertex label or a list of vertex
+          labels, yields a (k x n) matrix whose k'th row is the result of
+          mesh.geodesic_distances(sk); all of these queries share the same mesh data, so batches
+          of queries are much faster than individual calls.
+
+        The following options are accepted:
+          * method (default: 'dijkstra') specifies the algorithm used. The 'dijkstra' method (or
+            'exact' or 'graph') yields exact shortest-path distances along the edges of the mesh
+            (see mesh.edge_graph); these overestimate true geodesic distances somewhat, as paths
+            cannot cross the interiors of faces. The 'heat' method uses the heat method of Crane et
+            al. (2013) to find smooth approximate geodesic distances; its operators are factorized
+            once per mesh and are reused for all subsequent heat-method queries.
+          * radius (default: None) may specify a maximum distance; vertices farther than the radius
+            from the sources are given a distance of numpy.inf. For the dijkstra method, the search
+            is halted at the radius, so small radii yield much faster queries.
+        '''
+        (batchq, srcs) = self._geodesic_source_sets(sources)
+        method = 'dijkstra' if method is None else method.lower()
+        if method in ['dijkstra', 'exact', 'graph', 'edges']:
+            res = self._dijkstra_distances(srcs, radius)
+        elif method in ['heat', 'heat_method', 'smooth']:
+            res = self._heat_distances(srcs, radius)
+        else:
+            raise ValueError('geodesic distance method must be \'dijkstra\' or \'heat\'')
+        return res if batchq else res[0]
+    def geodesic_neighborhoods(self, radius, distances=True, n_jobs=1, chunk_size=256,
+                               cache_directory=None):
+        '''
+        mesh.geodesic_neighborhoods(r) yields an (n x n) scipy.sparse.csr_matrix N whose row i
+          contains, in its sparsity structure, every vertex within a graph-geodesic distance r of the
+          vertex with index i (including i itself); the value N[i,j] is the distance between the two
+          vertices. Note that the diagonal is stored as explicit zeros, so the neighborhood of a
+          vertex i should be read from N[i].indices rather than from the non-zero values.
+
+        Because graph-geodesic distances are never shorter than Euclidean distances, each chunk of
+        vertices is searched using only the sub-graph of vertices within a Euclidean distance r of
+        the chunk (see mesh.vertex_hash); this makes the search exact and its cost independent of
+        the size of the mesh beyond the neighborhoods themselves.
+
+        The following options are accepted:
+          * distances (default: True) may be set to False to indicate that the values of the matrix
+            should all be 1 rather than distances.
+          * n_jobs (default: 1) specifies the number of processes over which to divide the chunks
+            of vertices; -1 indicates that all processors should be used.
+          * chunk_size (default: 256) specifies the number of vertices searched at once.
+          * cache_directory (default: None) may specify a directory in which the neighborhood matrix
+            is cached; the cache file name is based on a hash of the mesh and the radius, so repeated
+            calls on identical meshes in later sessions load the matrix from disk.
+        '''
+        n = self.vertex_count
+        cache_file = None
+        if cache_directory is not None:
+            cache_file = os.path.join(os.path.expanduser(cache_directory),
+                                      'geonei_%s_r%s.npz' % (self.content_hash, repr(float(radius))))
+        if cache_file is not None and os.path.isfile(cache_file):
+            res = sps.load_npz(cache_file).tocsr()
+        else:
+            x = self.coordinates
+            g = self.edge_graph
+            # group spatially nearby vertices into the same chunks
+            cells = np.floor(x / float(radius)).astype(np.int)
+            order = np.lexsort(cells[::-1])
+            chunks = [order[k:(k + chunk_size)] for k in range(0, n, chunk_size)]
+            def _chunk_args(chunk):
+                near = self.vertex_hash.query_ball_point(x[:,chunk].T, radius)
+                local = np.unique(np.concatenate([chunk] + [np.asarray(u, dtype=np.int)
+                                                            for u in near]))
+                return (g[local][:,local], chunk, local, radius)
+            args = (_chunk_args(c) for c in chunks)
+            if n_jobs == 1:
+                dat = [_geodesic_neighborhood_chunk(a) for a in args]
+            else:
+                pool = multiprocessing.Pool(None if n_jobs < 1 else n_jobs)
+                dat = _pool_map(pool, _geodesic_neighborhood_chunk, args)
+            (rows, cols, vals) = [np.concatenate(u) for u in zip(*dat)]
+            res = sps.csr_matrix((vals, (rows, cols)), shape=(n,n))
+            res.sort_indices()
+            if cache_file is not None: sps.save_npz(cache_file, res)
+        if not distances:
+            res = sps.csr_matrix((np.ones(len(res.indices), dtype=np.int), res.indices, res.indptr),
+                                 shape=(n,n))
+        return res
+# The largest number of faces in a leaf of the bounding-volume hierarchy (see Mesh.face_bvh).
+Mesh.bvh_leaf_size = 8
+# A copied mesh refits the bounding boxes of its original's face_bvh unless the surface-area cost of
+# the refit hierarchy exceeds this many times that of the original (0 or None disables refitting).
+Mesh.bvh_refit_tolerance = 2.0
+# the cache used by Mesh.icosphere_interpolation; entries are discarded oldest-first beyond the size
+Mesh.icosphere_interpolation_cache = OrderedDict()
+Mesh.icosphere_interpolation_cache_size = 16
+
 @pimms.immutable
 class MapProjection(ObjectWithMetaData):
     '''
@@ -1920,6 +3680,16 @@ class MapProjection(ObjectWithMetaData):
         if sd/mu > 0.05: warnings.war('Given mesh does not appear to be a sphere centered at 0')
         return mu
     @pimms.value
+    def _domain_cache_key(alignment_matrix, post_affine, radius, method, _sphere_radius):
+        '''
+        proj._domain_cache_key is a tuple of the parameters that determine the domain selection and
+        the forward projection of the given map projection; it is used as part of the key into the
+        MapProjection.domain_cache dictionary.
+        '''
+        return (method, str(radius), float(_sphere_radius),
+                np.asarray(alignment_matrix, dtype=np.float).tostring(),
+                None if post_affine is None else np.asarray(post_affine, dtype=np.float).tostring())
+    @pimms.value
     def repr(chirality, registration):
         '''
         proj.repr is the representation string yielded by proj.__repr__().
@@ -2020,7 +3790,70 @@ class MapProjection(ObjectWithMetaData):
         x = aff0.dot(np.concatenate((x, ones)))[0:3]
         # that's it!
         return x
-    def __call__(self, obj, tag='projection'):
+    def _domain_data(self, mesh, cache=None):
+        '''
+        proj._domain_data(mesh) yields a persistent map of the data produced by projecting the given
+          3D mesh: 'vertex_indices' and 'face_indices' give the indices of the vertices and faces of
+          mesh that are in the domain of the projection, and 'coordinates' gives the projected 2D
+          coordinates of these vertices.
+        proj._domain_data(mesh, cache) additionally looks up and stores the data in the given dict,
+          keyed by the projection parameters and a hash of the coordinates and faces of the mesh.
+        '''
+        if cache is not None:
+            key = (self._domain_cache_key, mesh.content_hash)
+            dat = cache.get(key)
+            if dat is not None: return dat
+        inq = self.in_domain(mesh)
+        fids = np.where(np.all(inq[mesh.tess.indexed_faces], axis=0))[0]
+        vids = np.unique(mesh.tess.indexed_faces[:,fids])
+        dat = pyr.m(vertex_indices=pimms.imm_array(vids),
+                    face_indices=pimms.imm_array(fids),
+                    coordinates=pimms.imm_array(self.forward(mesh.coordinates[:,vids])))
+        if cache is not None:
+            if cache is MapProjection.domain_cache:
+                while len(cache) >= MapProjection.domain_cache_size: cache.popitem(last=False)
+            cache[key] = dat
+        return dat
+    def _project_mesh(self, mesh, cache=None, tess_cache=None):
+        '''
+        proj._project_mesh(mesh) is equivalent to proj.forward(proj.select_domain(mesh)) but uses
+          proj._domain_data(mesh, cache) to perform the selection and projection.
+        proj._project_mesh(mesh, cache, tess_cache) additionally looks up and stores the trimmed
+          tesselation in the given dict, keyed by the id of mesh.tess, so that meshes sharing one
+          tesselation also share its trimmed copy.
+        '''
+        dat = self._domain_data(mesh, cache=cache)
+        (vids, fids) = (dat['vertex_indices'], dat['face_indices'])
+        # the spatial hashes of the 3D mesh cannot be reused by the 2D map
+        if len(vids) == mesh.vertex_count and len(fids) == mesh.tess.face_count:
+            return mesh.copy(coordinates=dat['coordinates'], _spatial_hashes=None)
+        tess = mesh.tess
+        subt = None if tess_cache is None else tess_cache.get(id(tess))
+        if subt is None:
+            tprops = tess._properties
+            if tprops is not None and tprops.row_count > 0: tprops = tprops[vids]
+            subt = tess.copy(faces=tess.faces[:,fids], _properties=tprops)
+            if tess_cache is not None: tess_cache[id(tess)] = subt
+        props = mesh._properties
+        if props is not None and props.row_count > 0: props = props[vids]
+        return mesh.copy(coordinates=dat['coordinates'], tess=subt, _properties=props,
+                         _spatial_hashes=None)
+    def _source_mesh(self, obj):
+        '''
+        proj._source_mesh(obj) yields obj if obj is a mesh and otherwise yields the mesh of the
+          topology obj that matches the registration of proj.
+        '''
+        if not isinstance(obj, Topology): return obj
+        # check the chiralities
+        if obj.chirality is not None and self.chirality is not None:
+            if obj.chirality != self.chirality:
+                raise ValueError('given topology is the wrong chirality for projection')
+        # We need to figure out if there is a matching registration
+        reg = self.registration
+        if self.registration is None: reg = 'native'
+        if reg in obj.registrations: return obj.registrations[reg]
+        else: raise ValueError('given topology does not include the registration %s' % reg)
+    def __call__(self, obj, tag='projection', cache=True):
         '''
         proj(x) performs the map projection proj on the given coordinate or coordinate matrix x and
           yields the resulting coordinate or coordinate matrix. If no coordinates in x are part of
@@ -2033,28 +3866,53 @@ class MapProjection(ObjectWithMetaData):
           no tag should be included.
         proj(topo) yields a 2D mesh that is derived from one of the registrations in the given
           topology topo, determined by the proj.registration parameter.
-        '''
+        The optional argument cache (default: True) specifies whether the domain selection and
+        projection of meshes should be looked up in and stored in MapProjection.domain_cache, which
+        is keyed by the projection parameters and a hash of the mesh's coordinates and faces; this
+        saves repeated work when many meshes share one geometry (e.g., subjects resampled to the
+        same registration). Cache may also be False or None (no caching) or a dict to use instead.
+        '''
+        if cache is True: cache = MapProjection.domain_cache
+        elif cache is False: cache = None
         if isinstance(obj, Topology):
-            # check the chiralities
-            if obj.chirality is not None and self.chirality is not None:
-                if obj.chirality != self.chirality:
-                    raise ValueError('given topology is the wrong chirality for projection')
-            # We need to figure out if there is a matching registration
-            reg = self.registration
-            if self.registration is None: reg = 'native'
-            if reg in obj.registrations:
-                return self(obj.registrations[reg], tag=tag)
-            else:
-                raise ValueError('given topology does not include the registration %s' % reg)
+            return self(self._source_mesh(obj), tag=tag, cache=cache)
         elif isinstance(obj, Mesh):
             proj = self if self.mesh is obj else self.copy(mesh=obj)
-            submesh = self.select_domain(obj)
-            res = self.forward(submesh)
+            res = self._project_mesh(obj, cache=cache)
             return res if tag is None else res.with_meta({tag:proj})
         elif pimms.is_vector(obj):
             return self.forward(obj) if self.in_domain(obj) else None
         else:
             return self.forward(self.select_domain(obj))
+    def project_many(self, objs, tag='projection', cache=True):
+        '''
+        proj.project_many(objs) yields a list of the results of proj(obj) for each obj in objs,
+          which may be a list of meshes or topologies. The domain selection and projection are
+          performed only once for each distinct geometry (coordinates and faces) among the meshes,
+          and the trimmed tesselation is built only once for each distinct tesselation, so, for
+          example, a list of subjects' meshes resampled to fsaverage is projected in a single pass
+          and the resulting maps share one tesselation; only the vertex properties are trimmed
+          separately for each mesh.
+        The optional arguments tag and cache are handled as in proj(obj); if cache is False, the
+        meshes are still grouped by geometry but nothing is stored in MapProjection.domain_cache.
+        '''
+        if cache is True: cache = MapProjection.domain_cache
+        elif cache is False or cache is None: cache = {}
+        # the meshes are held in this list, so the ids of their tesselations remain unique keys
+        meshes = [self._source_mesh(obj) for obj in objs]
+        tcache = {}
+        res = []
+        for mesh in meshes:
+            if not isinstance(mesh, Mesh): raise ValueError('project_many requires meshes')
+            m = self._project_mesh(mesh, cache=cache, tess_cache=tcache)
+            if tag is not None:
+                proj = self if self.mesh is mesh else self.copy(mesh=mesh)
+                m = m.with_meta({tag:proj})
+            res.append(m)
+        return res
+# the cache used by MapProjection.__call__; entries are discarded oldest-first beyond the given size
+MapProjection.domain_cache = OrderedDict()
+MapProjection.domain_cache_size = 32
 MapProjection.projection_forward_methods = pyr.m(
     orthographic    = MapProjection.orthographic_projection_forward,
     equirectangular = MapProjection.equirectangular_projection_forward,
@@ -2067,6 +3925,16 @@ MapProjection.projection_inverse_methods = pyr.m(
     sinusoidal      = MapProjection.sinusoidal_projection_inverse)
 
         
+def _realized_meshes(raw, meshes):
+    '''
+    _realized_meshes(raw, meshes) yields the (possibly lazy) map raw of mesh data with the entries
+      whose meshes have already been constructed in the lazy map meshes replaced by those meshes;
+      if there are no such entries, raw itself is returned.
+    '''
+    for k in six.iterkeys(meshes):
+        if not meshes.is_lazy(k) and raw[k] is not meshes[k]: raw = raw.set(k, meshes[k])
+    return raw
+
 @pimms.immutable
 class Topology(VertexSet):
     '''
@@ -2126,7 +3994,11 @@ class Topology(VertexSet):
         def _reg_check(key):
             def _lambda_reg_check():
                 val = _registrations[key]
-                if isinstance(val, Mesh): val = val.coordinates
+                if isinstance(val, Mesh):
+                    # meshes over the same tess keep their cached values
+                    if val.tess is tess:
+                        return val.copy(_properties=properties, meta_data=pyr.m()).persist()
+                    val = val.coordinates
                 return Mesh(tess, val, properties=properties).persist()
             if lazyq and _registrations.is_lazy(key):
                 return _lambda_reg_check
@@ -2155,6 +4027,15 @@ class Topology(VertexSet):
         # note that tess.properties always already has labels and indices included
         return pimms.itable(pimms.merge(pp, tp) if _properties is not tess.properties else pp)
     @pimms.value
+    def content_hash(tess, registrations):
+        '''
+        topo.content_hash is a hexadecimal string that identifies the tesselation and the registration
+        coordinates of the given topology (but not its properties or meta-data); note that this
+        requires that all of the registrations be loaded. See also neuropythy.util.content_hash.
+        '''
+        regs = {k:v.coordinates for (k,v) in six.iteritems(registrations)}
+        return content_hash(('Topology', tess, regs))
+    @pimms.value
     def repr(chirality, tess):
         '''
         topo.repr is the representation string yielded by topo.__repr__().
@@ -2164,6 +4045,15 @@ class Topology(VertexSet):
     
     def __repr__(self):
         return self.repr
+    def copy(self, **kwargs):
+        '''
+        topo.copy(...) is equivalent to VertexSet.copy(topo, ...) except that the registration
+          meshes that have already been constructed by topo are passed along to the copy, so that
+          their cached values are reused when, e.g., only the properties of topo are changed.
+        '''
+        if '_registrations' not in kwargs:
+            kwargs['_registrations'] = _realized_meshes(self._registrations, self.registrations)
+        return VertexSet.copy(self, **kwargs)
     def make_mesh(self, coords, properties=None, meta_data=None):
         '''
         topo.make_mesh(coords) yields a Mesh object with the given coordinates and with the
@@ -2189,7 +4079,19 @@ class Topology(VertexSet):
             if self.registrations[name] is coords:
                 return self
         return self.copy(_registrations=self.registrations.set(name, coords))
-    def interpolate(self, topo, data, mask=None, weights=None, method='automatic', n_jobs=1):
+    def icosphere_interpolation(self, order=7, registration='native', method='linear', n_jobs=1):
+        '''
+        topology.icosphere_interpolation(k) is equivalent to
+          topology.registrations['native'].icosphere_interpolation(k); see
+          Mesh.icosphere_interpolation. The optional argument registration may name another
+          spherical registration of the topology, such as 'fsaverage', to resample in that space.
+        '''
+        if registration not in self.registrations:
+            raise ValueError('topology has no registration named %s' % registration)
+        return self.registrations[registration].icosphere_interpolation(order, method=method,
+                                                                       n_jobs=n_jobs)
+    def interpolate(self, topo, data, mask=None, weights=None, method='automatic', n_jobs=1,
+                    registration=None):
         '''
         topology.interpolate(topo, data) yields a numpy array of the data interpolated from the
           given array, data, which must contain the same number of elements as there are vertices
@@ -2213,9 +4115,15 @@ class Topology(VertexSet):
             integral or non-numeric data.
           * n_jobs (default: 1) is passed along to the cKDTree.query method, so may be set to an
             integer to specify how many processors to use, or may be -1 to specify all processors.
+          * registration (default: None) may name the shared registration to use; by default, each
+            shared registration is tried until one succeeds.
         '''
         if not isinstance(topo, Topology):
             raise ValueError('Topologies can only be interpolated with other topologies')
+        if registration is not None:
+            reg = self._shared_registration([topo], registration)
+            return self.registrations[reg].interpolate(topo.registrations[reg], data, mask=mask,
+                                                       method=method, n_jobs=n_jobs)
         reg_names = [k for k in topo.registrations.iterkeys() if k in self.registrations]
         if not reg_names:
             raise RuntimeError('Topologies do not share a matching registration!')
@@ -2231,6 +4139,130 @@ class Topology(VertexSet):
         if res is None:
             raise ValueError('All shared topologies raised errors during interpolation!')
         return res
+    def _shared_registration(self, topos, registration=None):
+        '''
+        topology._shared_registration(topos) yields the name of the one registration other than
+          'native' shared by topology and all of the given topologies, or raises an error if there
+          is no such registration or more than one.
+        topology._shared_registration(topos, name) yields name if it is shared by all of them.
+        '''
+        if registration is not None:
+            for t in [self] + list(topos):
+                if registration not in t.registrations:
+                    raise ValueError('topology %s has no registration named %s' % (t, registration))
+            return registration
+        shared = set(self.registrations.iterkeys())
+        for t in topos: shared &= set(t.registrations.iterkeys())
+        shared.discard('native')
+        if len(shared) != 1:
+            raise ValueError('topologies share %s registrations (%s); the registration must be given'
+                             % ('no' if not shared else 'several', ', '.join(sorted(shared))))
+        return next(iter(shared))
+    def interpolate_many(self, topos, data, registration=None, direction='to', mask=None,
+                         method='automatic', n_jobs=1, output=None):
+        '''
+        topology.interpolate_many(topos, data) yields the data on the given topology interpolated
+          to each of the topologies in the list topos (one-to-many). The data may be a property name,
+          a vector with one value per vertex, or an (n x c) matrix of c columns; the result is the
+          stacked array whose rows are those of the interpolated data for topos[0], then topos[1],
+          etc. (i.e., of length sum([t.vertex_count for t in topos])).
+        topology.interpolate_many(topos, data, direction='from') instead interpolates the data on
+          each of the topologies in topos to the given topology (many-to-one). The data may be a
+          property name (taken from each topology in topos) or a list with one vector or matrix
+          per topology; the result is a (k x n) or (k x n x c) array, where k is len(topos) and n
+          is topology.vertex_count.
+
+        The following options are accepted:
+          * registration (default: None) names the registration in which to interpolate; it must
+            be shared by all of the topologies. If None, the topologies must share exactly one
+            registration other than 'native'.
+          * mask (default: None) may give a mask of the source vertices (see Mesh.interpolate); for
+            direction 'from', this may also be a list with one mask per topology.
+          * method (default: 'automatic') may be 'linear', 'nearest', or 'automatic', in which case
+            linear interpolation is used for floating-point data and nearest interpolation
+            otherwise.
+          * n_jobs (default: 1) specifies the number of threads among which the topologies are
+            divided; -1 indicates one thread per processor. Each thread builds the interpolation
+            matrix of a pair of topologies, applies it, and writes the result to its part of the
+            output, so that only the matrices currently being used are kept in memory.
+          * output (default: None) may be a filename, in which case the result is streamed into a
+            numpy memory-mapped .npy file that is created with that name and returned (see
+            numpy.lib.format.open_memmap), or an existing array of the result's shape into which the
+            result is written.
+        '''
+        topos = list(topos)
+        for t in topos:
+            if not isinstance(t, Topology):
+                raise ValueError('Topologies can only be interpolated with other topologies')
+        direction = direction.lower()
+        if direction not in ('to', 'from'):
+            raise ValueError('direction must be \'to\' or \'from\'')
+        # with no other topologies, there is nothing to interpolate and any registration will do
+        reg = self._shared_registration(topos, registration) if topos or registration else None
+        method = 'automatic' if method is None else method.lower()
+        if method == 'auto': method = 'automatic'
+        if method not in ('linear', 'nearest', 'automatic'):
+            raise ValueError('method argument must be linear, nearest, or automatic')
+        def _vertex_data(t, dat):
+            if pimms.is_str(dat): dat = t.prop(dat)
+            dat = np.asarray(dat)
+            n = t.vertex_count
+            if len(dat.shape) == 2 and dat.shape[0] != n and dat.shape[1] == n: dat = dat.T
+            if dat.shape[0] != n:
+                raise ValueError('interpolation data must have one row per vertex of %s' % t)
+            return dat
+        if direction == 'to':
+            srcs = [self]
+            dat = [_vertex_data(self, data)]
+            masks = [mask]
+            offs = np.cumsum([0] + [t.vertex_count for t in topos], dtype=np.int)
+            shape = (int(offs[-1]),) + dat[0].shape[1:]
+        else:
+            srcs = topos
+            if pimms.is_str(data): data = [data for _ in topos]
+            elif len(data) != len(topos):
+                raise ValueError('interpolate_many requires one data array per topology')
+            dat = [_vertex_data(t, d) for (t,d) in zip(topos, data)]
+            if len(set([d.shape[1:] for d in dat])) > 1:
+                raise ValueError('interpolation data must have the same number of columns for all '
+                                 'topologies')
+            masks = mask if isinstance(mask, (list, tuple)) else [mask for _ in topos]
+            if len(masks) != len(topos):
+                raise ValueError('interpolate_many requires one mask per topology')
+            shape = (len(topos), self.vertex_count) + (dat[0].shape[1:] if dat else ())
+        # linearly interpolated data are floating-point; data interpolated by nearest neighbor
+        # keep their own type (which need not be numeric)
+        lin = [method == 'linear' or (method == 'automatic' and np.issubdtype(d.dtype, np.floating))
+               for d in dat]
+        dtype = np.float if any(lin) or len(dat) == 0 else np.result_type(*[d.dtype for d in dat])
+        if pimms.is_str(output):
+            output = np.lib.format.open_memmap(os.path.expanduser(output), mode='w+',
+                                               dtype=dtype, shape=shape)
+        elif output is None:
+            output = np.empty(shape, dtype=dtype)
+        elif output.shape != shape:
+            raise ValueError('interpolate_many output must have shape %s' % (shape,))
+        def _run(k):
+            (src, tgt) = (self, topos[k]) if direction == 'to' else (topos[k], self)
+            i = 0 if direction == 'to' else k
+            (smesh, tmesh) = (src.registrations[reg], tgt.registrations[reg])
+            (dk, mk) = (dat[i], masks[i])
+            interp = smesh.linear_interpolation(tmesh.coordinates) if lin[i] else \
+                     smesh.nearest_interpolation(tmesh.coordinates)
+            res = smesh.apply_interpolation(interp, dk, mask=mk)
+            if direction == 'to': output[offs[k]:offs[k+1]] = res
+            else:                 output[k] = res
+        if direction == 'to' and topos:
+            # the source mesh is shared by all the threads, so we build its spatial hashes first
+            self.registrations[reg].face_hash
+            self.registrations[reg].vertex_hash
+        if n_jobs == 1 or len(topos) < 2:
+            for k in range(len(topos)): _run(k)
+        else:
+            pool = multiprocessing.pool.ThreadPool(None if n_jobs < 1 else n_jobs)
+            _pool_map(pool, _run, range(len(topos)))
+        if isinstance(output, np.memmap): output.flush()
+        return output
     def projection(self,
                    center=None, center_right=None, radius=None, method='equirectangular',
                    registration='native', chirality=Ellipsis, sphere_radius=None,
@@ -2300,6 +4332,292 @@ def to_mesh(obj, properties=None, meta_data=None):
     else:
         raise ValueError('Could not deduce how object can be convertex into a mesh')
 
+####################################################################################################
+# Icosahedral spheres
+_icospheres = {}
+def icosphere(order=7, radius=100.0):
+    '''
+    icosphere(k) yields a Mesh object of the icosahedral sphere of order k (i.e., the icosahedron
+      whose faces have been subdivided into 4 faces k times, with new vertices pushed out onto the
+      sphere); the mesh has 10*4**k + 2 vertices and 20*4**k faces. As with FreeSurfer's ic0-ic7
+      spheres, the sphere is centered at the origin with a radius of 100, and faces are ordered
+      counter-clockwise when viewed from outside the sphere; the vertex order, however, is not
+      FreeSurfer's: the 12 vertices of the icosahedron come first, followed by the vertices added at
+      each subdivision. The vertices of each order are the first vertices of all higher orders.
+    icosphere(k, r) uses the radius r instead of 100.
+    The icospheres of radius 1 are cached, so each order is only built once; icospheres of other
+    radii are scaled copies of these that share their tesselations. See also
+    Mesh.icosphere_interpolation.
+    '''
+    order = int(order)
+    if order < 0: raise ValueError('icosphere order must be a non-negative integer')
+    radius = float(radius)
+    res = _icospheres.get(order)
+    if res is not None:
+        if radius == 1: return res
+        md = res.meta_data.set('radius', radius)
+        return res.copy(coordinates=res.coordinates * radius, meta_data=md).persist()
+    if order == 0:
+        t = (1.0 + np.sqrt(5.0)) / 2.0
+        x = np.asarray([[-1,t,0], [1,t,0], [-1,-t,0], [1,-t,0], [0,-1,t], [0,1,t],
+                        [0,-1,-t], [0,1,-t], [t,0,-1], [t,0,1], [-t,0,-1], [-t,0,1]], dtype=np.float)
+        faces = np.asarray([[0,11,5], [0,5,1], [0,1,7], [0,7,10], [0,10,11], [1,5,9], [5,11,4],
+                            [11,10,2], [10,7,6], [7,1,8], [3,9,4], [3,4,2], [3,2,6], [3,6,8],
+                            [3,8,9], [4,9,5], [2,4,11], [6,2,10], [8,6,7], [9,8,1]]).T
+        x = x.T
+    else:
+        prev = icosphere(order - 1, 1.0)
+        (x, faces) = (prev.coordinates, prev.tess.indexed_faces)
+        n = x.shape[1]
+        # one new vertex at the midpoint of each edge; edges are identified by their sorted ends
+        (u, v) = (faces, np.roll(faces, -1, axis=0))
+        ecode = np.minimum(u, v) * n + np.maximum(u, v)
+        (ecode, eidx) = np.unique(ecode, return_inverse=True)
+        eidx = n + np.reshape(eidx, u.shape)
+        x = np.hstack([x, 0.5 * (x[:, ecode // n] + x[:, ecode % n])])
+        (a, b, c) = faces
+        (ab, bc, ca) = eidx
+        faces = np.hstack([[a, ab, ca], [b, bc, ab], [c, ca, bc], [ab, bc, ca]])
+    x = x / np.sqrt(np.sum(x**2, axis=0))
+    if order == 0:
+        # make sure that the faces are counter-clockwise when viewed from outside
+        (a, b, c) = [x[:,f] for f in faces]
+        flip = np.sum(np.cross(b - a, c - a, axis=0) * (a + b + c), axis=0) < 0
+        faces[1:,flip] = faces[:0:-1,flip]
+    res = Mesh(faces, x, meta_data={'icosahedral_order': order, 'radius': 1.0}).persist()
+    _icospheres[order] = res
+    return icosphere(order, radius)
+
+####################################################################################################
+# Native (neuropythy) file format: a directory of numpy files or an npz archive
+native_format_version = 1
+_native_derived = {'tess': ('labels', 'indexed_faces', 'edges', 'indexed_edges'),
+                   'mesh': ('face_normals', 'vertex_normals', 'face_areas', 'edge_lengths')}
+def _native_arrays(obj, derived=False):
+    '''
+    _native_arrays(obj) yields (index, arrays) where index is the JSON-able dict that describes the
+      given Tesselation, Mesh, Topology, or Cortex object and arrays is a dict of the numpy arrays
+      that are stored with it; see save_neuropythy.
+    '''
+    from neuropythy.mri import Cortex
+    index = {'format': 'neuropythy', 'version': native_format_version}
+    arrs = {}
+    def _props(prefix, props):
+        if props is None or props.row_count == 0: return []
+        names = sorted(six.iterkeys(props))
+        for (k,nm) in enumerate(names): arrs['%s%d' % (prefix, k)] = np.asarray(props[nm])
+        return names
+    def _derived(prefix, o, names):
+        dd = object.__getattribute__(o, '__dict__')
+        names = names           if derived is True      else \
+                []              if not derived          else \
+                [k for k in names if k in dd] if pimms.is_str(derived) and derived == 'cached' else \
+                [k for k in names if k in derived]
+        for k in names: arrs[prefix + k] = np.asarray(getattr(o, k))
+        return names
+    def _coords(prefix, meshes):
+        names = sorted(six.iterkeys(meshes))
+        for (k,nm) in enumerate(names):
+            arrs['%s%d' % (prefix, k)] = np.asarray(meshes[nm].coordinates)
+        return names
+    tess = obj if isinstance(obj, Tesselation) else obj.tess
+    arrs['tess_faces'] = np.asarray(tess.faces)
+    index['tess_labels'] = tess._labels is not None
+    if tess._labels is not None: arrs['tess_label_order'] = np.asarray(tess._labels)
+    index['tess_properties'] = _props('tess_prop_', tess._properties)
+    index['tess_derived'] = _derived('tess_', tess, _native_derived['tess'])
+    if isinstance(obj, Tesselation):
+        index['type'] = 'Tesselation'
+    elif isinstance(obj, Mesh):
+        index['type'] = 'Mesh'
+        arrs['coordinates'] = np.asarray(obj.coordinates)
+        index['properties'] = _props('prop_', obj._properties)
+        index['mesh_derived'] = _derived('mesh_', obj, _native_derived['mesh'])
+    elif isinstance(obj, Topology):
+        index['type'] = 'Cortex' if isinstance(obj, Cortex) else 'Topology'
+        index['chirality'] = obj.chirality
+        index['registrations'] = _coords('registration_', obj.registrations)
+        index['properties'] = _props('prop_', obj._properties)
+        if isinstance(obj, Cortex): index['surfaces'] = _coords('surface_', obj.surfaces)
+    else: raise ValueError('only Tesselation, Mesh, Topology, and Cortex objects can be saved')
+    # meta-data entries are kept if they are arrays or can be stored as JSON
+    (md, mdarrs) = ({}, [])
+    for (k,v) in six.iteritems(obj.meta_data if obj.meta_data is not None else {}):
+        if not pimms.is_str(k) or k == 'shared_directory': continue
+        if isinstance(v, np.ndarray) and v.dtype != np.dtype('O'):
+            arrs['meta_%d' % len(mdarrs)] = v
+            mdarrs.append(k)
+            continue
+        try:              json.dumps(v)
+        except TypeError: continue
+        md[k] = v
+    index['meta_data'] = md
+    index['meta_arrays'] = mdarrs
+    return (index, arrs)
+def _native_loader(filename, mmap=True):
+    '''
+    _native_loader(filename) yields (index, get) where index is the index dict stored in the given
+      neuropythy directory or archive and get(name) yields the array with the given name.
+    '''
+    if os.path.isdir(filename):
+        flnm = os.path.join(filename, 'index.json')
+        if not os.path.isfile(flnm):
+            raise ValueError('directory %s does not contain a neuropythy object' % filename)
+        with open(flnm, 'r') as fl: index = json.load(fl)
+        def get(nm):
+            flnm = os.path.join(filename, nm + '.npy')
+            if not mmap: return np.load(flnm, allow_pickle=True)
+            try:               return np.load(flnm, mmap_mode='r')
+            except ValueError: return np.load(flnm, allow_pickle=True) # e.g., object arrays
+    else:
+        dat = np.load(filename, allow_pickle=True)
+        if not hasattr(dat, 'files') or 'index' not in dat.files:
+            raise ValueError('file %s does not contain a neuropythy object' % filename)
+        index = json.loads(str(dat['index']))
+        get = lambda nm: dat[nm]
+    if index.get('format') != 'neuropythy':
+        raise ValueError('%s does not contain a neuropythy object' % filename)
+    if index.get('version', 0) > native_format_version:
+        raise ValueError('%s was saved by a newer version of neuropythy (format version %s)'
+                         % (filename, index['version']))
+    return (index, get)
+def _native_object(index, get, meta_data=None):
+    '''
+    _native_object(index, get) yields the object described by the given index and array getter (see
+      _native_loader). Properties, registrations, and surfaces are loaded lazily.
+    _native_object(index, get, meta_data) merges the given meta-data into that of the object.
+    '''
+    def name(nm):
+        # the json module yields unicode strings in Python 2, but names are str elsewhere
+        return nm.encode('utf-8') if six.PY2 and isinstance(nm, six.text_type) else nm
+    def _props(prefix, names):
+        if len(names) == 0: return None
+        return pimms.itable(pimms.lazy_map({name(nm):(lambda k: lambda:get('%s%d' % (prefix, k)))(k)
+                                            for (k,nm) in enumerate(names)}))
+    def _coords(prefix, names):
+        return pimms.lazy_map({name(nm):(lambda k: lambda:get('%s%d' % (prefix, k)))(k)
+                               for (k,nm) in enumerate(names)})
+    def _precomputed(prefix, names):
+        return {name(k):get(prefix + k) for k in names} if len(names) > 0 else None
+    md = {name(k):v for (k,v) in six.iteritems(index.get('meta_data', {}))}
+    for (k,nm) in enumerate(index.get('meta_arrays', [])): md[name(nm)] = get('meta_%d' % k)
+    md = pyr.pmap(md)
+    if meta_data is not None: md = pimms.merge(md, meta_data)
+    (tp, ch) = (index['type'], index.get('chirality'))
+    ch = None if ch is None else name(ch)
+    tess = Tesselation(get('tess_faces'), properties=_props('tess_prop_', index['tess_properties']),
+                       meta_data=(md if tp == 'Tesselation' else None),
+                       labels=(get('tess_label_order') if index.get('tess_labels') else None))
+    pre = _precomputed('tess_', index.get('tess_derived', []))
+    if pre is not None: tess = pimms.imm_copy(tess, _precomputed=pre)
+    tess = tess.persist()
+    if tp == 'Tesselation':
+        return tess
+    elif tp == 'Mesh':
+        obj = Mesh(tess, get('coordinates'), meta_data=md,
+                   properties=_props('prop_', index['properties']))
+        pre = _precomputed('mesh_', index.get('mesh_derived', []))
+        if pre is not None: obj = pimms.imm_copy(obj, _precomputed=pre)
+    elif tp == 'Topology':
+        obj = Topology(tess, _coords('registration_', index['registrations']),
+                       properties=_props('prop_', index['properties']),
+                       meta_data=md, chirality=ch)
+    elif tp == 'Cortex':
+        from neuropythy.mri import Cortex
+        obj = Cortex(ch, tess, _coords('surface_', index['surfaces']),
+                     _coords('registration_', index['registrations']),
+                     properties=_props('prop_', index['properties']), meta_data=md)
+    else: raise ValueError('unrecognized neuropythy object type: %s' % tp)
+    return obj.persist()
+def _sniff_neuropythy(filename, *args, **kwargs):
+    if os.path.isdir(filename): return os.path.isfile(os.path.join(filename, 'index.json'))
+    return filename.lower().endswith('.ny.npz')
+
+@importer('neuropythy', ('ny', 'ny.npz'), sniff=_sniff_neuropythy)
+def load_neuropythy(filename, mmap=True):
+    '''
+    load_neuropythy(filename) yields the Tesselation, Mesh, Topology, or Cortex object saved in the
+      given file or directory by save_neuropythy().
+
+    Objects saved as directories are loaded lazily: their arrays are read-only memory-maps of the
+    files in the directory, and properties, registrations, and surfaces are not read until they are
+    used. Arrays in .npz archives are read from the archive when first used. Any cached derived
+    arrays that were saved with the object are used in place of recalculating them.
+
+    The following options are accepted:
+      * mmap (default: True) may be set to False to read arrays saved in a directory into memory
+        rather than memory-mapping them.
+    '''
+    filename = os.path.expanduser(filename)
+    return _native_object(*_native_loader(filename, mmap=mmap))
+@exporter('neuropythy', ('ny', 'ny.npz'))
+def save_neuropythy(filename, obj, derived='cached', compress=False):
+    '''
+    save_neuropythy(filename, obj) saves the given Tesselation, Mesh, Topology, or Cortex object to
+      the given filename and yields the filename. If the filename ends with .npz, the object is
+      saved as a numpy archive; otherwise the filename is created as a directory of numpy files
+      (with an index.json file) that can be memory-mapped by load_neuropythy().
+
+    The files store the faces, coordinates, properties, registrations and surfaces (for topologies
+    and cortices), and meta-data (only the entries that are arrays or that can be stored as JSON) of
+    the object, and they record the version of the format (neuropythy.geometry.native_format_version)
+    so that future versions can continue to read them.
+
+    The following options are accepted:
+      * derived (default: 'cached') specifies which derived arrays (the labels, indexed faces, and
+        edges of the tesselation and the normals, face areas, and edge lengths of a mesh) are saved
+        along with the object. The value 'cached' saves those that have already been calculated;
+        True calculates and saves all of them, False saves none, and a list of names saves those.
+      * compress (default: False) may be set to True to compress .npz archives.
+    '''
+    filename = os.path.expanduser(filename)
+    (index, arrs) = _native_arrays(obj, derived=derived)
+    if filename.lower().endswith('.npz'):
+        f = np.savez_compressed if compress else np.savez
+        f(filename, index=np.asarray(json.dumps(index)), **arrs)
+    else:
+        if not os.path.isdir(filename): os.makedirs(filename)
+        for (k,v) in six.iteritems(arrs): np.save(os.path.join(filename, k + '.npy'), v)
+        with open(os.path.join(filename, 'index.json'), 'w') as fl: json.dump(index, fl)
+    return filename
+
+# Shared objects are saved in the native format in a directory and attached via memory-maps
+_shared_objects = weakref.WeakValueDictionary()
+def to_shared(obj, directory=None):
+    '''
+    to_shared(obj) saves the given Tesselation, Mesh, Topology, or Cortex object obj, along with the
+      derived topology arrays labels, indexed_faces, edges, and indexed_edges of its tesselation, to
+      a new temporary directory (see save_neuropythy) and yields attach_shared(directory), a
+      duplicate of obj whose arrays are read-only memory-maps of these files.
+    to_shared(obj, directory) uses the given directory, which is created if it does not exist.
+
+    Objects yielded by to_shared() and attach_shared() are pickled as a reference to the directory,
+    so passing them to a multiprocessing pool does not copy their arrays: each worker attaches to
+    the same files, and the operating system shares their pages between processes. Other derived
+    values (e.g., spatial hashes) are still computed per process. Only the meta-data that can be
+    saved by save_neuropythy is shared. The directory is not removed automatically.
+    '''
+    if directory is None: directory = tempfile.mkdtemp(prefix='neuropythy_shared_')
+    directory = os.path.abspath(os.path.expanduser(directory))
+    save_neuropythy(directory, obj, derived=_native_derived['tess'])
+    # forget any object previously attached to this directory
+    if directory in _shared_objects: del _shared_objects[directory]
+    return attach_shared(directory)
+def attach_shared(directory):
+    '''
+    attach_shared(directory) yields the object that was written to the given directory by
+      to_shared(); its arrays are read-only memory-maps of the files in the directory, so attaching
+      is fast and does not copy the data. Within a process, attaching to the same directory more
+      than once yields the same object.
+    '''
+    directory = os.path.abspath(os.path.expanduser(directory))
+    obj = _shared_objects.get(directory)
+    if obj is not None: return obj
+    (index, get) = _native_loader(directory)
+    obj = _native_object(index, get, meta_data=pyr.m(shared_directory=directory))
+    _shared_objects[directory] = obj
+    return obj
+
 # The Gifti importer goes here because it relies on Mesh
 @importer('gifti', ('gii', 'gii.gz'))
 def load_gifti(filename, to='auto'):
@@ -211,11 +211,11 @@ def triangle_area(a,b,c):
     triangle_area(a, b, c) yields the area of the triangle whose vertices are given by the points a,
     b, and c.
     '''
-    (a,b,c) = [np.asarray(x) for x in (a,b,c)]
-    sides = np.sqrt(np.sum([(p1 - p2)**2 for (p1,p2) in zip([b,c,a],[c,a,b])], axis=1))
-    s = 0.5 * np.sum(sides, axis=0)
-    sides = np.clip(s - sides, 0.0, None)
-    return np.sqrt(s * np.prod(sides, axis=0))
+    tri = np.asarray(np.broadcast_arrays(*[np.asarray(x) for x in (a,b,c)]))
+    if len(tri.shape) == 2: return batch_triangle_area(tri)[0]
+    sh = tri.shape[2:]
+    tri = np.reshape(tri, tri.shape[:2] + (-1,))
+    return np.reshape(batch_triangle_area(np.transpose(tri, (2,0,1))), sh)
 
 def triangle_normal(a,b,c):
     '''
@@ -255,10 +255,10 @@ def cartesian_to_barycentric_3D(tri, xy):
     first dimension must always be the triangle vertices and the second 3-sized dimension must be
     the (x,y,z) coordinates.
     '''
-    xy = np.asarray(xy)
-    tri = np.asarray(tri)
+    xy = np.asarray(xy, dtype=np.float)
+    tri = np.asarray(tri, dtype=np.float)
     if len(xy.shape) == 1:
-        return cartesian_to_barycentric_2D(np.transpose(np.asarray([tri]), (1,2,0)),
+        return cartesian_to_barycentric_3D(np.transpose(np.asarray([tri]), (1,2,0)),
                                            np.asarray([xy]).T)[:,0]
     xy = xy if xy.shape[0] == 3 else xy.T
     if tri.shape[0] == 3:
@@ -276,21 +276,9 @@ def cartesian_to_barycentric_3D(tri, xy):
     # The algorithm here is borrowed from this stack-exchange post:
     # http://gamedev.stackexchange.com/questions/23743
     # in which it is attributed to Christer Ericson's book Real-Time Collision Detection.
-    v0 = tri[1] - tri[0]
-    v1 = tri[2] - tri[0]
-    v2 = xy - tri[0]
-    d00 = np.sum(v0 * v0, axis=0)
-    d01 = np.sum(v0 * v1, axis=0)
-    d11 = np.sum(v1 * v1, axis=0)
-    d20 = np.sum(v2 * v0, axis=0)
-    d21 = np.sum(v2 * v1, axis=0)
-    den = d00*d11 - d01*d01
-    zero = np.isclose(den, 0)
-    unit = 1 - zero
-    den += zero
-    l2 = unit * (d11 * d20 - d01 * d21) / den
-    l3 = unit * (d00 * d21 - d01 * d20) / den
-    return np.asarray([1.0 - l2 - l3, l2])
+    # (It is implemented in batch_cartesian_to_barycentric.)
+    bc = batch_cartesian_to_barycentric(np.transpose(tri, (2,0,1)), xy.T)
+    return np.asarray([1.0 - bc[:,1] - bc[:,2], bc[:,1]])
     
 def cartesian_to_barycentric_2D(tri, xy):
     '''
@@ -299,8 +287,8 @@ def cartesian_to_barycentric_2D(tri, xy):
     for the triangle coordinate array tri. The array tri should be 3 (vertices) x 2 (coordinates) x
     n (triangles) unless xy is a tuple, in which case it should be a (3 x 2) matrix.
     '''
-    xy = np.asarray(xy)
-    tri = np.asarray(tri)
+    xy = np.asarray(xy, dtype=np.float)
+    tri = np.asarray(tri, dtype=np.float)
     if len(xy.shape) == 1:
         return cartesian_to_barycentric_2D(np.transpose(np.asarray([tri]), (1,2,0)),
                                            np.asarray([xy]).T)[:,0]
@@ -318,23 +306,7 @@ def cartesian_to_barycentric_2D(tri, xy):
     if tri.shape[2] != xy.shape[1]:
         raise ValueError('number of triangles and coordinates must match')
     # Okay, everything's the right shape...
-    (x,y) = xy
-    ((x1,y1), (x2,y2), (x3,y3)) = tri
-    x_x3  = x  - x3
-    x1_x3 = x1 - x3
-    x3_x2 = x3 - x2
-    y_y3  = y  - y3
-    y1_y3 = y1 - y3
-    y2_y3 = y2 - y3
-    num1 = (y2_y3*x_x3  + x3_x2*y_y3)
-    num2 = (-y1_y3*x_x3 + x1_x3*y_y3)
-    den  = (y2_y3*x1_x3 + x3_x2*y1_y3)
-    zero = np.isclose(den, 0)
-    den += zero
-    unit = 1 - zero
-    l1 = unit * num1 / den
-    l2 = unit * num2 / den
-    return np.asarray((l1, l2))
+    return batch_cartesian_to_barycentric(np.transpose(tri, (2,0,1)), xy.T)[:,0:2].T
 
 def barycentric_to_cartesian(tri, bc):
     '''
@@ -353,7 +325,7 @@ def barycentric_to_cartesian(tri, bc):
     n = bc.shape[1]
     # we know how many bc's there are now; lets reorient tri to match with the last dimension as n
     if len(tri.shape) == 2:
-        tri = np.transpose([tri for _ in range(n)], (1,2,0))
+        tri = np.transpose(np.broadcast_to(tri, (n,) + tri.shape), (1,2,0))
     # the possible orientations of tri:
     if tri.shape[0] == 3:
         if tri.shape[1] in [2,3] and tri.shape[2] == n:
@@ -378,10 +350,7 @@ def barycentric_to_cartesian(tri, bc):
         raise ValueError('Triangle array did not have dimensions of sizes 3 and (2 or 3)')
     if tri.shape[2] != n:
         raise ValueError('number of triangles and coordinates must match')
-    (l1,l2) = bc
-    (p1, p2, p3) = tri
-    l3 = (1 - l1 - l2)
-    return np.asarray([x1*l1 + x2*l2 + x3*l3 for (x1,x2,x3) in zip(p1, p2, p3)])
+    return batch_barycentric_to_cartesian(np.transpose(tri, (2,0,1)), bc.T).T
     
 def triangle_address(fx, pt):
     '''
@@ -432,84 +401,209 @@ def triangle_unaddress(fx, tr):
     return np.asarray([ax + tr[1]*(abx + tr[0]*bcx) for (ax, bcx, abx) in zip(fx[0], bc, ab)])
 
 def point_in_triangle(tri, pt):
+    '''
+    point_in_triangle(tri, pt) yields True if the given point pt lies in the triangle given by the
+      (3 x d) matrix tri and False otherwise. If tri is an (n x 3 x d) array of triangles and/or pt
+      is an (n x d) matrix of points, a boolean vector is yielded instead; a single triangle or
+      point is tested against each of the n points or triangles. For 3D triangles, which are
+      assumed to lie on a sphere centered at the origin, the test is whether the point lies in the
+      cone from the origin through the triangle. See also batch_point_in_triangle.
+    '''
     tri = np.asarray(tri)
     pt  = np.asarray(pt)
     if len(tri.shape) == 2 and len(pt.shape) == 1:
-        if len(pt) == 2:
-            tol = 1e-13
-            v0 = tri[2] - tri[0]
-            v1 = tri[1] - tri[0]
-            v2 = pt - tri[0]
-            d00 = np.dot(v0, v0)
-            d01 = np.dot(v0, v1)
-            d02 = np.dot(v0, v2)
-            d11 = np.dot(v1, v1)
-            d12 = np.dot(v1, v2)
-            invDenom = (d00*d11 - d01*d01)
-            if np.isclose(invDenom, 0): return False
-            s = (d11*d02 - d01*d12) / invDenom
-            if (s + tol) < 0 or (s - tol) >= 1: return False
-            t = (d00*d12 - d01*d02) / invDenom
-            return False if (t + tol) < 0 or (s + t - tol) > 1 else True
+        return batch_point_in_triangle(tri, pt)[0]
+    elif len(tri.shape) == 3 and len(pt.shape) == 2 and len(pt) != len(tri):
+        raise ValueError('the number of triangles and points must be equal')
+    elif len(tri.shape) in (2,3) and len(pt.shape) in (1,2):
+        return batch_point_in_triangle(tri, pt)
+    else:
+        raise ValueError('triangles and pts do not have parallel shapes')
+
+####################################################################################################
+# Batched triangle kernels
+# These functions are array-first versions of the triangle functions above: triangles are given as
+# (n x 3 x d) stacks (n triangles, 3 vertices, d dimensions) and points as (n x d) matrices; either
+# may instead be a single triangle (3 x d) or point (d) that is used for all n. Each function
+# accepts an optional out array into which its result is written, and large inputs are processed
+# in chunks of batch_chunk_size triangles so that temporary arrays stay small; each chunk is
+# calculated in double precision regardless of the type of the inputs.
+batch_chunk_size = 65536
+def _batch_triangles(tris):
+    tris = np.asarray(tris)
+    if len(tris.shape) == 2: tris = tris[None]
+    if len(tris.shape) != 3 or tris.shape[1] != 3:
+        raise ValueError('triangles must be given as an (n x 3 x d) array')
+    return tris
+def _batch_points(pts, d):
+    pts = np.asarray(pts)
+    if len(pts.shape) == 1: pts = pts[None]
+    if len(pts.shape) != 2 or pts.shape[1] != d:
+        raise ValueError('points must be given as an (n x %d) array' % d)
+    return pts
+def _batch_setup(out, shape, dtype, *arrs):
+    # yields (out, slices) for the given argument arrays, any of which may have length 1
+    ns = set([len(a) for a in arrs if len(a) != 1])
+    if len(ns) > 1: raise ValueError('the number of triangles and points must match')
+    n = ns.pop() if len(ns) > 0 else 1
+    shape = (n,) + tuple(shape)
+    if out is None: out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape: raise ValueError('out array must have shape %s' % (shape,))
+    step = max(1, int(batch_chunk_size))
+    return (out, [slice(i, min(n, i + step)) for i in range(0, n, step)])
+def _batch_chunk(a, sl):
+    return np.asarray(a if len(a) == 1 else a[sl], dtype=np.float)
+def _batch_dot(u, v):
+    return np.einsum('...i,...i->...', u, v)
+
+def batch_triangle_area(tris, out=None):
+    '''
+    batch_triangle_area(tris) yields the length-n vector of the areas of the triangles in the given
+      (n x 3 x d) array tris. See also triangle_area.
+    '''
+    tris = _batch_triangles(tris)
+    (out, sls) = _batch_setup(out, (), np.float, tris)
+    for sl in sls:
+        t = _batch_chunk(tris, sl)
+        (u, v) = (t[:,1] - t[:,0], t[:,2] - t[:,0])
+        if t.shape[2] == 2:
+            out[sl] = 0.5 * np.abs(u[:,0]*v[:,1] - u[:,1]*v[:,0])
+        elif t.shape[2] == 3:
+            c = np.cross(u, v)
+            out[sl] = 0.5 * np.sqrt(_batch_dot(c, c))
+        else:
+            uv = _batch_dot(u, v)
+            out[sl] = 0.5 * np.sqrt(np.clip(_batch_dot(u, u)*_batch_dot(v, v) - uv*uv, 0, None))
+    return out
+def batch_triangle_normal(tris, out=None):
+    '''
+    batch_triangle_normal(tris) yields the (n x 3) matrix of the unit normal vectors of the triangles
+      in the given (n x 3 x d) array tris; the normals of 2D triangles are (0,0,1) or (0,0,-1), and
+      the normals of degenerate triangles are (0,0,0). Note that, unlike triangle_normal, the
+      normals yielded by this function are always unit vectors.
+    '''
+    tris = _batch_triangles(tris)
+    (out, sls) = _batch_setup(out, (3,), np.float, tris)
+    for sl in sls:
+        t = _batch_chunk(tris, sl)
+        (u, v) = (t[:,1] - t[:,0], t[:,2] - t[:,0])
+        if t.shape[2] == 2:
+            out[sl,0:2] = 0
+            out[sl,2] = np.sign(u[:,0]*v[:,1] - u[:,1]*v[:,0])
         else:
-            dp1 = np.dot(pt - tri[0], np.cross(tri[0], tri[1] - tri[0]))
-            dp2 = np.dot(pt - tri[1], np.cross(tri[1], tri[2] - tri[1]))
-            db3 = np.dot(pt - tri[2], np.cross(tri[2], tri[0] - tri[2]))
-            return ((dp1 > 0 or np.isclose(dp1, 0)) and
-                    (dp2 > 0 or np.isclose(dp2, 0)) and
-                    (dp3 > 0 or np.isclose(dp3, 0)))
-    elif len(tri.shape) == 3 and len(pt.shape) == 2:
-        if len(pt) != len(tri):
-            raise ValueError('the number of triangles and points must be equal')
-        if pt.shape[1] == 2:
+            c = np.cross(u, v)
+            nrm = np.sqrt(_batch_dot(c, c))
+            z = np.isclose(nrm, 0)
+            out[sl] = c * (~z / (nrm + z))[:,None]
+    return out
+def batch_cartesian_to_barycentric(tris, pts, out=None):
+    '''
+    batch_cartesian_to_barycentric(tris, pts) yields the (n x 3) matrix of the barycentric
+      coordinates of the n points in the (n x d) matrix pts with respect to the triangles in the
+      (n x 3 x d) array tris; rows of the result sum to 1 except for degenerate triangles, whose
+      rows are 0. For 3D triangles, the points are projected into the planes of the triangles. See
+      also cartesian_to_barycentric_2D and cartesian_to_barycentric_3D.
+    '''
+    tris = _batch_triangles(tris)
+    pts = _batch_points(pts, tris.shape[2])
+    (out, sls) = _batch_setup(out, (3,), np.float, tris, pts)
+    for sl in sls:
+        (t, x) = (_batch_chunk(tris, sl), _batch_chunk(pts, sl))
+        if t.shape[2] == 2:
+            (x_x3, x1_x3, x3_x2) = (x - t[:,2], t[:,0] - t[:,2], t[:,2] - t[:,1])
+            y2_y3 = t[:,1,1] - t[:,2,1]
+            den = y2_y3*x1_x3[:,0] + x3_x2[:,0]*x1_x3[:,1]
+            l1 = y2_y3*x_x3[:,0] + x3_x2[:,0]*x_x3[:,1]
+            l2 = x1_x3[:,0]*x_x3[:,1] - x1_x3[:,1]*x_x3[:,0]
+        else:
+            # see the cartesian_to_barycentric_3D function for the source of this algorithm
+            (v0, v1, v2) = (t[:,1] - t[:,0], t[:,2] - t[:,0], x - t[:,0])
+            (d00, d01, d11) = (_batch_dot(v0, v0), _batch_dot(v0, v1), _batch_dot(v1, v1))
+            (d20, d21) = (_batch_dot(v2, v0), _batch_dot(v2, v1))
+            den = d00*d11 - d01*d01
+            l1 = d11*d20 - d01*d21
+            l2 = d00*d21 - d01*d20
+            (l1, l2) = (den - l1 - l2, l1)
+        z = np.isclose(den, 0)
+        den = ~z / (den + z)
+        out[sl,0] = l1 * den
+        out[sl,1] = l2 * den
+        out[sl,2] = ~z - out[sl,0] - out[sl,1]
+    return out
+def batch_barycentric_to_cartesian(tris, bcs, out=None):
+    '''
+    batch_barycentric_to_cartesian(tris, bcs) yields the (n x d) matrix of the points whose
+      barycentric coordinates, with respect to the triangles in the (n x 3 x d) array tris, are
+      given by the (n x 3) or (n x 2) matrix bcs; if only 2 barycentric coordinates are given, the
+      third is 1 minus their sum. See also barycentric_to_cartesian.
+    '''
+    tris = _batch_triangles(tris)
+    bcs = np.asarray(bcs)
+    if len(bcs.shape) == 1: bcs = bcs[None]
+    if len(bcs.shape) != 2 or bcs.shape[1] not in (2,3):
+        raise ValueError('barycentric coordinates must be given as an (n x 3) or (n x 2) array')
+    (out, sls) = _batch_setup(out, (tris.shape[2],), np.float, tris, bcs)
+    for sl in sls:
+        (t, b) = (_batch_chunk(tris, sl), _batch_chunk(bcs, sl))
+        if b.shape[1] == 2: b = np.hstack((b, 1 - b[:,0:1] - b[:,1:2]))
+        if len(t) == 1: out[sl] = np.dot(b, t[0])
+        else:           out[sl] = np.einsum('ik,ikj->ij', b, t)
+    return out
+def batch_point_in_triangle(tris, pts, out=None):
+    '''
+    batch_point_in_triangle(tris, pts) yields a boolean vector whose i'th element is True if the
+      i'th point in the (n x d) matrix pts lies in the i'th triangle in the (n x 3 x d) array tris.
+      For 3D triangles, which are assumed to lie on a sphere centered at the origin, the test is
+      whether the point lies in the cone from the origin through the triangle. See also
+      point_in_triangle.
+    '''
+    tris = _batch_triangles(tris)
+    pts = _batch_points(pts, tris.shape[2])
+    (out, sls) = _batch_setup(out, (), np.bool, tris, pts)
+    for sl in sls:
+        (t, x) = (_batch_chunk(tris, sl), _batch_chunk(pts, sl))
+        if t.shape[2] == 2:
             tol = 1e-13
-            v0 = tri[:,2] - tri[:,0]
-            v1 = tri[:,1] - tri[:,0]
-            v2 = pt - tri[:,0]
-            d00 = np.sum(v0*v0, axis=1)
-            d01 = np.sum(v0*v1, axis=1)
-            d02 = np.sum(v0*v2, axis=1)
-            d11 = np.sum(v1*v1, axis=1)
-            d12 = np.sum(v1*v2, axis=1)
-            invDenom = (d00*d11 - d01*d01)
-            zeros = np.isclose(invDenom, 0)
-            invDenom[zeros] = 1.0
-            s = (d11*d02 - d01*d12) / invDenom
-            t = (d00*d12 - d01*d02) / invDenom
-            return ~((s + tol < 0) | (s - tol >= 1) | (t + tol < 0) | (s + t - tol > 1) | zeros)
+            (v0, v1, v2) = (t[:,2] - t[:,0], t[:,1] - t[:,0], x - t[:,0])
+            (d00, d01, d02) = (_batch_dot(v0, v0), _batch_dot(v0, v1), _batch_dot(v0, v2))
+            (d11, d12) = (_batch_dot(v1, v1), _batch_dot(v1, v2))
+            den = d00*d11 - d01*d01
+            z = np.isclose(den, 0)
+            den = den + z
+            s = (d11*d02 - d01*d12) / den
+            r = (d00*d12 - d01*d02) / den
+            out[sl] = ~((s + tol < 0) | (s - tol >= 1) | (r + tol < 0) | (s + r - tol > 1) | z)
         else:
-            x0 = np.sum((pt - tri[:,0]) * np.cross(tri[:,0], tri[:,1] - tri[:,0], axis=1), axis=1)
-            x1 = np.sum((pt - tri[:,1]) * np.cross(tri[:,1], tri[:,2] - tri[:,1], axis=1), axis=1)
-            x2 = np.sum((pt - tri[:,2]) * np.cross(tri[:,2], tri[:,0] - tri[:,2], axis=1), axis=1)
-            return (((x0 > 0) | np.isclose(x0, 0)) &
-                    ((x1 > 0) | np.isclose(x1, 0)) &
-                    ((x2 > 0) | np.isclose(x2, 0)))
-    elif len(tri.shape) == 3 and len(pt.shape) == 1:
-        return point_in_triangle(tri, np.asarray([pt for _ in tri]))
-    elif len(tri.shape) == 2 and len(pt.shape) == 1:
-        return point_in_triangle(np.asarray([tri for _ in pt]), pt)
-    else:
-        raise ValueError('triangles and pts do not have parallel shapes')
+            res = np.ones(len(t) if len(t) > 1 else len(x), dtype=np.bool)
+            for k in range(3):
+                (a, b) = (t[:,k], t[:,(k+1) % 3])
+                q = _batch_dot(x - a, np.cross(a, b - a))
+                res &= (q > 0) | np.isclose(q, 0)
+            out[sl] = res
+    return out
 
 def det4D(m):
     '''
     det4D(array) yields the determinate of the given matrix array, which may have more than 2
       dimensions, in which case the later dimensions are multiplied and added point-wise.
     '''
-    # I just solved this in Mathematica, copy-pasted, and replaced the string '] m' with ']*m':
-    # Mathematica code: Det@Table[m[i][j], {i, 0, 3}, {j, 0, 3}]
-    return (m[0][3]*m[1][2]*m[2][1]*m[3][0] - m[0][2]*m[1][3]*m[2][1]*m[3][0] -
-            m[0][3]*m[1][1]*m[2][2]*m[3][0] + m[0][1]*m[1][3]*m[2][2]*m[3][0] +
-            m[0][2]*m[1][1]*m[2][3]*m[3][0] - m[0][1]*m[1][2]*m[2][3]*m[3][0] -
-            m[0][3]*m[1][2]*m[2][0]*m[3][1] + m[0][2]*m[1][3]*m[2][0]*m[3][1] +
-            m[0][3]*m[1][0]*m[2][2]*m[3][1] - m[0][0]*m[1][3]*m[2][2]*m[3][1] -
-            m[0][2]*m[1][0]*m[2][3]*m[3][1] + m[0][0]*m[1][2]*m[2][3]*m[3][1] +
-            m[0][3]*m[1][1]*m[2][0]*m[3][2] - m[0][1]*m[1][3]*m[2][0]*m[3][2] -
-            m[0][3]*m[1][0]*m[2][1]*m[3][2] + m[0][0]*m[1][3]*m[2][1]*m[3][2] +
-            m[0][1]*m[1][0]*m[2][3]*m[3][2] - m[0][0]*m[1][1]*m[2][3]*m[3][2] -
-            m[0][2]*m[1][1]*m[2][0]*m[3][3] + m[0][1]*m[1][2]*m[2][0]*m[3][3] +
-            m[0][2]*m[1][0]*m[2][1]*m[3][3] - m[0][0]*m[1][2]*m[2][1]*m[3][3] -
-            m[0][1]*m[1][0]*m[2][2]*m[3][3] + m[0][0]*m[1][1]*m[2][2]*m[3][3])
+    # Laplace expansion along the first two rows: the determinant is the signed sum of the products
+    # of the 2x2 minors of rows 0-1 with the complementary 2x2 minors of rows 2-3; this needs only 12
+    # minors rather than the 24 full products of the Leibniz formula
+    (m0, m1, m2, m3) = m
+    s0 = m0[0]*m1[1] - m1[0]*m0[1]
+    s1 = m0[0]*m1[2] - m1[0]*m0[2]
+    s2 = m0[0]*m1[3] - m1[0]*m0[3]
+    s3 = m0[1]*m1[2] - m1[1]*m0[2]
+    s4 = m0[1]*m1[3] - m1[1]*m0[3]
+    s5 = m0[2]*m1[3] - m1[2]*m0[3]
+    c5 = m2[2]*m3[3] - m3[2]*m2[3]
+    c4 = m2[1]*m3[3] - m3[1]*m2[3]
+    c3 = m2[1]*m3[2] - m3[1]*m2[2]
+    c2 = m2[0]*m3[3] - m3[0]*m2[3]
+    c1 = m2[0]*m3[2] - m3[0]*m2[2]
+    c0 = m2[0]*m3[1] - m3[0]*m2[1]
+    return s0*c5 - s1*c4 + s2*c3 + s3*c2 - s4*c1 + s5*c0
 def det_4x3(a,b,c,d):
     '''
     det_4x3(a,b,c,d) yields the determinate of the matrix formed the given rows, which may have
@@ -534,7 +628,8 @@ def tetrahedral_barycentric_coordinates(tetra, pt):
     '''
     # I found a description of this algorithm here (Nov. 2017):
     # http://steve.hollasch.net/cgindex/geometry/ptintet.html
-    tetra = np.asarray(tetra)
+    tetra = np.asarray(tetra, dtype=np.float)
+    pt = np.asarray(pt, dtype=np.float)
     if tetra.shape[0] != 4:
         if tetra.shape[1] == 4:
             if tetra.shape[0] == 3:
@@ -548,16 +643,8 @@ def tetrahedral_barycentric_coordinates(tetra, pt):
     elif tetra.shape[1] != 3:
         tetra = np.transpose(tetra, (0,2,1))
     if pt.shape[0] != 3: pt = pt.T
-    # Okay, calculate the determinants...
-    d_ = det_4x3(tetra[0], tetra[1], tetra[2], tetra[3])
-    d0 = det_4x3(pt,       tetra[1], tetra[2], tetra[3])
-    d1 = det_4x3(tetra[0], pt,       tetra[2], tetra[3])
-    d2 = det_4x3(tetra[0], tetra[1], pt,       tetra[3])
-    d3 = det_4x3(tetra[0], tetra[1], tetra[2], pt)
-    s_ = np.sign(d_)
-    z_ = (np.isclose(d_, 0) | np.any([s_ != si for si in np.sign([d0,d1,d2,d3])], axis=0))
-    d_inv = np.logical_not(z_) / (d_ + z_)
-    return np.asarray([d_inv * dq for dq in (d0,d1,d2,d3)])
+    ((tetra,), pt, sh) = _batch_legacy_args((tetra,), pt)
+    return _batch_legacy_result(batch_tetrahedral_barycentric_coordinates(tetra, pt), sh)
 
 def point_in_tetrahedron(tetra, pt):
     '''
@@ -575,29 +662,17 @@ def prism_barycentric_coordinates(tri1, tri2, pt):
       the point is not inside the tetrahedron. The returned weights are in a 2 x 3 matrix where the
       first row gives weights for tri1 and the second for tri2.
     '''
-    pt = np.asarray(pt)
-    tri1 = np.asarray(tri1)
-    tri2 = np.asarray(tri2)
+    pt = np.asarray(pt, dtype=np.float)
+    tri1 = np.asarray(tri1, dtype=np.float)
+    tri2 = np.asarray(tri2, dtype=np.float)
     (tri1,tri2) = [
         (np.transpose(tri, (1,0) if len(tri.shape) == 2 else (2,0,1)) if tri.shape[0] != 3 else
          np.transpose(tri, (0,2,1))                                   if tri.shape[1] != 3 else
          tri)
         for tri in (tri1,tri2)]
     pt = pt.T if pt.shape[0] != 3 else pt
-    # get the individual tetrahedron bc coordinates
-    bcs1 = tetrahedral_barycentric_coordinates([tri1[0], tri1[1], tri1[2], tri2[0]], pt)
-    bcs2 = tetrahedral_barycentric_coordinates([tri1[1], tri1[2], tri2[0], tri2[1]], pt)
-    bcs3 = tetrahedral_barycentric_coordinates([tri1[2], tri2[0], tri2[1], tri2[2]], pt)
-    bcs4 = tetrahedral_barycentric_coordinates([tri1[0], tri1[1], tri2[0], tri2[1]], pt)
-    bcs5 = tetrahedral_barycentric_coordinates([tri1[0], tri1[2], tri2[0], tri2[2]], pt)
-    bcs6 = tetrahedral_barycentric_coordinates([tri1[1], tri1[2], tri2[1], tri2[2]], pt)
-    bcs = ((bcs1[0] + bcs4[0] + bcs5[0],
-            bcs1[1] + bcs2[0] + bcs4[1] + bcs6[0],
-            bcs1[2] + bcs2[1] + bcs3[0] + bcs5[1] + bcs6[1]),
-           (bcs1[3] + bcs2[2] + bcs3[1] + bcs4[2] + bcs5[2],
-            bcs2[3] + bcs3[2] + bcs4[3] + bcs6[2],
-            bcs3[3] + bcs5[3] + bcs6[3]))
-    return np.asarray(bcs)
+    ((tri1, tri2), pt, sh) = _batch_legacy_args((tri1, tri2), pt)
+    return _batch_legacy_result(batch_prism_barycentric_coordinates(tri1, tri2, pt), sh)
 
 def point_in_prism(tri1, tri2, pt):
     '''
@@ -607,5 +682,131 @@ def point_in_prism(tri1, tri2, pt):
       coordinates; e.g., a 3 x 3 x n array will be assumed to organized such that element [0,1,k] is
       the y coordinate of the first vertex of the k'th triangle.
     '''
-    bcs = prism_barycentric_coordinates(tri1, tri2, pt)
-    return np.logical_not(np.isclose(np.sum(bcs[0] + bcs[1], axis=0), 0))
+    (tri1, tri2, pt) = [np.asarray(x, dtype=np.float) for x in (tri1, tri2, pt)]
+    (tri1,tri2) = [
+        (np.transpose(tri, (1,0) if len(tri.shape) == 2 else (2,0,1)) if tri.shape[0] != 3 else
+         np.transpose(tri, (0,2,1))                                   if tri.shape[1] != 3 else
+         tri)
+        for tri in (tri1,tri2)]
+    pt = pt.T if pt.shape[0] != 3 else pt
+    ((tri1, tri2), pt, sh) = _batch_legacy_args((tri1, tri2), pt)
+    return _batch_legacy_result(batch_point_in_prism(tri1, tri2, pt), sh)
+
+# Batch versions of the tetrahedron and prism functions, in the style of the batch triangle functions
+# above: tetrahedra are (n x 4 x 3) stacks, prisms are pairs of (n x 3 x 3) triangle stacks, points
+# are (n x 3) matrices, and work is done in chunks of batch_chunk_size so that peak memory is fixed.
+def _batch_simplices(x, k, name):
+    x = np.asarray(x)
+    if len(x.shape) == 2: x = x[None]
+    if len(x.shape) != 3 or x.shape[1] != k or x.shape[2] != 3:
+        raise ValueError('%s must be given as an (n x %d x 3) array' % (name, k))
+    return x
+def _batch_legacy_args(xs, pt):
+    # converts the (k x 3 x ...) simplex arrays xs and the (3 x ...) point array pt, as given to the
+    # older tetrahedron and prism functions, into batch arguments; yields (xs, pt, shape) where
+    # shape is the broadcast shape of their trailing dimensions
+    sh = np.broadcast(*([x[0,0] for x in xs] + [pt[0]])).shape
+    xs = [x[None] if len(x.shape) == 2 else
+          np.transpose(np.reshape(np.broadcast_to(x, x.shape[:2] + sh), x.shape[:2] + (-1,)),
+                       (2,0,1))
+          for x in xs]
+    pt = pt[None] if len(pt.shape) == 1 else \
+         np.reshape(np.broadcast_to(pt, (3,) + sh), (3, -1)).T
+    return (xs, pt, sh)
+def _batch_legacy_result(res, sh):
+    # converts an (n x ...) batch result back into the (... x shape) layout of the older functions
+    if sh == (): return res[0]
+    return np.reshape(np.moveaxis(res, 0, -1), res.shape[1:] + sh)
+def _batch_tetrahedra(t, x, out):
+    # barycentric coordinates of the points x in the tetrahedra t (chunks, either of which may have
+    # length 1) written into out; see tetrahedral_barycentric_coordinates for the algorithm
+    (a, b, c, d) = (t[:,0], t[:,1], t[:,2], t[:,3])
+    (ba, ca, da, xa) = (b - a, c - a, d - a, x - a)
+    dd = _batch_dot(ba, np.cross(ca, da))
+    out[:,1] = _batch_dot(xa, np.cross(ca, da))
+    out[:,2] = _batch_dot(xa, np.cross(da, ba))
+    out[:,3] = _batch_dot(xa, np.cross(ba, ca))
+    out[:,0] = dd - out[:,1] - out[:,2] - out[:,3]
+    z = np.isclose(dd, 0) | np.any(np.sign(out) != np.sign(dd)[:,None], axis=1)
+    out *= (~z / (dd + z))[:,None]
+    return out
+def batch_tetrahedral_barycentric_coordinates(tetras, pts, out=None):
+    '''
+    batch_tetrahedral_barycentric_coordinates(tetras, pts) yields the (n x 4) matrix of the
+      barycentric coordinates of the n points in the (n x 3) matrix pts with respect to the
+      tetrahedra in the (n x 4 x 3) array tetras; rows are all 0 for points that are not inside
+      their tetrahedra. See also tetrahedral_barycentric_coordinates.
+    '''
+    tetras = _batch_simplices(tetras, 4, 'tetrahedra')
+    pts = _batch_points(pts, 3)
+    (out, sls) = _batch_setup(out, (4,), np.float, tetras, pts)
+    for sl in sls:
+        (t, x) = (_batch_chunk(tetras, sl), _batch_chunk(pts, sl))
+        _batch_tetrahedra(t, x, out[sl])
+    return out
+def batch_point_in_tetrahedron(tetras, pts, out=None):
+    '''
+    batch_point_in_tetrahedron(tetras, pts) yields a boolean vector whose i'th element is True if
+      the i'th point in the (n x 3) matrix pts lies in the i'th tetrahedron in the (n x 4 x 3) array
+      tetras. See also point_in_tetrahedron.
+    '''
+    tetras = _batch_simplices(tetras, 4, 'tetrahedra')
+    pts = _batch_points(pts, 3)
+    (out, sls) = _batch_setup(out, (), np.bool, tetras, pts)
+    buf = None
+    for sl in sls:
+        (t, x) = (_batch_chunk(tetras, sl), _batch_chunk(pts, sl))
+        n = max(len(t), len(x))
+        if buf is None or len(buf) != n: buf = np.empty((n, 4))
+        out[sl] = ~np.all(np.isclose(_batch_tetrahedra(t, x, buf), 0), axis=1)
+    return out
+# the six tetrahedra over whose barycentric coordinates prism coordinates are summed; the prism's
+# vertices are numbered 0-2 for the first triangle and 3-5 for the second
+_prism_tetrahedra = ((0,1,2,3), (1,2,3,4), (2,3,4,5), (0,1,3,4), (0,2,3,5), (1,2,4,5))
+def batch_prism_barycentric_coordinates(tris1, tris2, pts, out=None):
+    '''
+    batch_prism_barycentric_coordinates(tris1, tris2, pts) yields the (n x 2 x 3) array of the
+      weights of the vertices of the n prisms that stretch from the triangles in the (n x 3 x 3)
+      array tris1 to those in tris2 for the points in the (n x 3) matrix pts; element [i,0,k] is
+      the weight of the k'th vertex of tris1[i] and element [i,1,k] that of tris2[i]. The weights of
+      points that are not inside their prisms are all 0. See also prism_barycentric_coordinates.
+    '''
+    (tris1, tris2) = [_batch_simplices(t, 3, 'triangles') for t in (tris1, tris2)]
+    pts = _batch_points(pts, 3)
+    (out, sls) = _batch_setup(out, (2,3), np.float, tris1, tris2, pts)
+    buf = None
+    for sl in sls:
+        (t1, t2, x) = [_batch_chunk(u, sl) for u in (tris1, tris2, pts)]
+        n = max(len(t1), len(t2), len(x))
+        if buf is None or len(buf) != n: buf = np.empty((n, 4))
+        vs = np.concatenate(np.broadcast_arrays(t1, t2), axis=1)
+        res = np.zeros((n, 6))
+        for ii in _prism_tetrahedra:
+            res[:,ii] += _batch_tetrahedra(vs[:,ii], x, buf)
+        out[sl] = np.reshape(res, (n, 2, 3))
+    return out
+def batch_point_in_prism(tris1, tris2, pts, out=None):
+    '''
+    batch_point_in_prism(tris1, tris2, pts) yields a boolean vector whose i'th element is True if
+      the i'th point in the (n x 3) matrix pts lies in the prism that stretches from the i'th
+      triangle in the (n x 3 x 3) array tris1 to the i'th triangle in tris2. Each of the prism's
+      tetrahedra is only tested against the points not yet found in an earlier one. See also
+      point_in_prism.
+    '''
+    (tris1, tris2) = [_batch_simplices(t, 3, 'triangles') for t in (tris1, tris2)]
+    pts = _batch_points(pts, 3)
+    (out, sls) = _batch_setup(out, (), np.bool, tris1, tris2, pts)
+    for sl in sls:
+        (t1, t2, x) = [_batch_chunk(u, sl) for u in (tris1, tris2, pts)]
+        n = max(len(t1), len(t2), len(x))
+        vs = np.concatenate(np.broadcast_arrays(t1, t2), axis=1)
+        (vs, x) = [np.broadcast_to(u, (n,) + u.shape[1:]) for u in (vs, x)]
+        (found, ii) = (np.zeros(n, dtype=np.bool), np.arange(n))
+        for tt in _prism_tetrahedra:
+            if len(ii) == 0: break
+            res = _batch_tetrahedra(vs[ii][:,tt], x[ii], np.empty((len(ii), 4)))
+            inq = ~np.all(np.isclose(res, 0), axis=1)
+            found[ii[inq]] = True
+            ii = ii[~inq]
+        out[sl] = found
+    return out
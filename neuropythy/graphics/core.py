@@ -342,6 +342,10 @@ def curvature_colors(m):
     curvature_colors(m) yields an array of curvature colors for the vertices of the given
       property-bearing object m.
     '''
+    if isinstance(m, geo.VertexSet):
+        return m.map(lambda p: np.where(np.asarray(p['curvature'])[:,None] > -0.025,
+                                        [[0.2,0.2,0.2,1.0]], [[0.7,0.7,0.7,1.0]]),
+                     vectorized=True)
     return np.asarray(m.map(vertex_curvature_color))
 def retino_colors(vcolorfn, *args, **kwargs):
     'See eccen_colors, angle_colors, sigma_colors, and varea_colors.'
@@ -31,9 +31,9 @@ def guess_import_format(filename, **kwargs):
     Keyword arguments that are passed to load should also be passed to guess_import_format.
     '''
     # first try file extension
-    (_,filename) = os.path.split(filename)
-    if '.' in filename:
-        fnm = filename.lower()
+    (_,fnm) = os.path.split(filename)
+    if '.' in fnm:
+        fnm = fnm.lower()
         fmt = next((k for (k,(_,es,_)) in six.iteritems(importers)
                     if any(fnm.endswith('.' + e) for e in es)),
                    None)
@@ -96,7 +96,7 @@ def importer(name, extensions=None, sniff=None):
     if name in importers:
         raise ValueError('An importer for type %s already exists; see forget_importer' % name)
     if extensions is None:         extensions = ()
-    elif pimms.is_str(extensions): (extensions,)
+    elif pimms.is_str(extensions): extensions = (extensions,)
     else:                          extensions = tuple(extensions)
     def _importer(f):
         global importers
@@ -639,7 +639,11 @@ class Cortex(geo.Topology):
         '''
         def _make_mesh(name):
             val = surface_coordinates[name]
-            if isinstance(val, geo.Mesh): val = val.coordinates
+            if isinstance(val, geo.Mesh):
+                # meshes over the same tess keep their cached values
+                if val.tess is tess:
+                    return lambda:val.copy(_properties=properties, meta_data=pyr.m()).persist()
+                val = val.coordinates
             def _lambda():
                 return geo.Mesh(tess, val, properties=properties).persist()
             return _lambda
@@ -693,6 +697,20 @@ class Cortex(geo.Topology):
 
     def __repr__(self):
         return self.repr
+    def copy(self, **kwargs):
+        '''
+        cortex.copy(...) is equivalent to Topology.copy(cortex, ...) except that the surface meshes
+          that have already been constructed are also passed along to the copy.
+        '''
+        if 'surface_coordinates' not in kwargs:
+            kwargs['surface_coordinates'] = geo.mesh._realized_meshes(self.surface_coordinates,
+                                                                      self.surfaces)
+        return geo.Topology.copy(self, **kwargs)
+    def _layer_mesh(self, coords, basis):
+        # intermediate layers refit the spatial hashes of the nearer of the white and pial surfaces
+        mesh = self.make_mesh(coords)
+        sh = basis.spatial_hash_basis()
+        return mesh if sh is None else mesh.copy(_spatial_hashes=sh)
     def surface(self, name='white'):
         '''
         cortex.surface() yields the white surface of the given cortex
@@ -711,11 +729,12 @@ class Cortex(geo.Topology):
         elif pimms.is_vector(name, 'real') and len(name) == 1:
             x0 = self.white_surface.coordinates
             dx = self.white_to_pial_vectors
-            return self.make_mesh(x0 + name[0]*dx)
+            return self._layer_mesh(x0 + name[0]*dx, self.white_surface)
         elif pimms.is_real(name):
             x0 = self.white_surface.coordinates
             x1 = self.pial_surface.coordinates
-            return self.make_mesh((1 - name)*x0 + name*x1)
+            basis = self.white_surface if name <= 0.5 else self.pial_surface
+            return self._layer_mesh((1 - name)*x0 + name*x1, basis)
         else:
             raise ValueError('could not understand surface layer: %s' % name)
     def from_image(self, image, surface='midgray', affine=None, method=None, fill=0, dtype=None,
@@ -748,31 +767,35 @@ def _vertex_to_voxel_linear_interpolation(hemi, gray_indices, image_shape, voxel
     # the face, and of those we find the closest; this nearest point is then used for trilinear
     # interpolation of the points in the triangle.
     N = 256
-    sofar = 0
-    # go ahead and make our interp matrix
-    interp = sps.lil_matrix((n, vcount), dtype=np.float)
-    # Okay, we look for those isect's within the triangles
-    ii = np.asarray(range(n)) # the subset not yet matched
-    for i in range(N):
-        if len(ii) == 0: break
-        if i >= sofar:
-            sofar = max(4, 2*sofar)
-            idcs = shash.query(xyz[ii], sofar)[1].T
-        # we look at just the i'th column of the indices
-        col = fids[idcs[i]]
-        bcs = geo.prism_barycentric_coordinates(fwcoords[:,:,col], fpcoords[:,:,col], xyz[ii].T)
-        bcs = bcs[0] + bcs[1] # since the layers are the same in this case...
-        outp = np.isclose(np.sum(bcs, axis=0), 0)
-        inp = np.logical_not(outp)
-        # for those in their prisms, we linearly interpolate using the bc coordinates
-        bcs = bcs[:,inp]
-        ii_inp = ii[inp]
-        fs = faces[:, col[inp]]
-        for k in (0,1,2): interp[(ii_inp, fs[k])] = bcs[k]
-        # trim down those that matched so we don't keep looking for them
-        ii = ii[outp]
-        idcs = idcs[:,outp]
-        # And continue!
+    (fwcoords, fpcoords) = [np.transpose(x, (2,0,1)) for x in (fwcoords, fpcoords)]
+    (rows, cols, vals) = ([], [], [])
+    # the voxels are matched in blocks so that the candidate-face matrices (which grow up to N
+    # columns) and the temporary arrays of the prism tests stay bounded in size
+    blk = max(1, int(geo.util.batch_chunk_size))
+    for b0 in range(0, n, blk):
+        ii = np.arange(b0, min(n, b0 + blk)) # the subset of this block not yet matched
+        sofar = 0
+        for i in range(N):
+            if len(ii) == 0: break
+            if i >= sofar:
+                sofar = max(4, 2*sofar)
+                idcs = shash.query(xyz[ii], sofar)[1].T
+            # we look at just the i'th column of the indices
+            col = fids[idcs[i]]
+            bcs = geo.batch_prism_barycentric_coordinates(fwcoords[col], fpcoords[col], xyz[ii])
+            bcs = bcs[:,0] + bcs[:,1] # since the layers are the same in this case...
+            outp = np.isclose(np.sum(bcs, axis=1), 0)
+            inp = np.logical_not(outp)
+            # for those in their prisms, we linearly interpolate using the bc coordinates
+            rows.append(np.repeat(ii[inp], 3))
+            cols.append(faces[:, col[inp]].T.flatten())
+            vals.append(bcs[inp].flatten())
+            # trim down those that matched so we don't keep looking for them
+            ii = ii[outp]
+            idcs = idcs[:,outp]
+            # And continue!
+    (rows, cols, vals) = [np.concatenate(u + [[]]) for u in (rows, cols, vals)]
+    interp = sps.csr_matrix((vals, (rows.astype(np.int), cols.astype(np.int))), shape=(n, vcount))
     # last, we normalize the rows
     rowsums = np.asarray(interp.sum(axis=1))[:,0]
     z = np.isclose(rowsums, 0)
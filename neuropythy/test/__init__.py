@@ -0,0 +1,26 @@
+####################################################################################################
+# neuropythy/test/__init__.py
+# Tests for the neuropythy library; these can be run with:
+#   python -m unittest discover neuropythy/test
+# The benchmarks in neuropythy/test/benchmarks.py are not run as tests; see that file.
+
+'''
+The neuropythy.test package contains the unit tests of the neuropythy library (test_*.py) and a
+set of reproducible benchmarks (neuropythy.test.benchmarks).
+'''
+
+import numpy               as np
+import neuropythy.geometry as geo
+
+def shuffled_icosphere(order=3, seed=0):
+    '''
+    shuffled_icosphere(k) yields the icosphere of order k (see neuropythy.geometry.icosphere) with
+      its vertices in a random order (fixed by the optional argument seed), which mimics the poor
+      locality of a surface whose vertex order is arbitrary.
+    '''
+    ico = geo.icosphere(order)
+    n = ico.vertex_count
+    perm = np.random.RandomState(seed).permutation(n)
+    inv = np.empty(n, dtype=np.int)
+    inv[perm] = np.arange(n)
+    return geo.Mesh(inv[ico.tess.indexed_faces], ico.coordinates[:,perm])
@@ -0,0 +1,41 @@
+####################################################################################################
+# neuropythy/test/benchmarks.py
+# Reproducible benchmarks of neuropythy's performance-sensitive operations; run with:
+#   python -m neuropythy.test.benchmarks
+
+import sys, time
+import numpy            as np
+import neuropythy.geometry as geo
+
+from neuropythy.test import shuffled_icosphere
+
+def reorder_benchmark(order=7, columns=16, repeats=20, seed=0):
+    '''
+    reorder_benchmark() yields a dict of the mean time (in seconds) of the product of the vertex
+      adjacency matrix of a shuffled icosphere (see shuffled_icosphere) with an (n x columns) dense
+      matrix, for the shuffled vertex order ('shuffled') and for the orders produced by
+      Mesh.reorder ('rcm' and 'morton').
+    '''
+    mesh = shuffled_icosphere(order, seed)
+    x = np.random.RandomState(seed).rand(mesh.vertex_count, columns)
+    meshes = [('shuffled', mesh, np.arange(mesh.vertex_count))]
+    for method in ('rcm', 'morton'):
+        (rmesh, fwd, _) = mesh.reorder(method)
+        meshes.append((method, rmesh, fwd))
+    res = {}
+    for (name, m, fwd) in meshes:
+        adj = m.tess.adjacency_matrix.astype(np.float)
+        xx = np.ascontiguousarray(x[fwd])
+        adj.dot(xx)
+        t0 = time.time()
+        for _ in range(repeats): adj.dot(xx)
+        res[name] = (time.time() - t0) / repeats
+    return res
+
+def main(args):
+    res = reorder_benchmark()
+    print('adjacency-matrix products on a shuffled order-7 icosphere (mean seconds per product):')
+    for k in ('shuffled', 'rcm', 'morton'): print('  %-9s %.4f' % (k, res[k]))
+    return 0
+
+if __name__ == '__main__': sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,233 @@
+####################################################################################################
+# neuropythy/test/test_mesh.py
+# Tests of the Tesselation, Mesh, and Topology classes.
+
+import unittest, pimms
+import numpy               as np
+import neuropythy.geometry as geo
+
+from neuropythy.test import shuffled_icosphere
+
+class TestReorder(unittest.TestCase):
+    def test_reorder_keeps_labels(self):
+        mesh = shuffled_icosphere()
+        mesh = mesh.with_prop(z=mesh.coordinates[2])
+        for method in ('rcm', 'morton'):
+            (rmesh, fwd, inv) = mesh.reorder(method)
+            self.assertTrue(np.array_equal(rmesh.labels, mesh.labels[fwd]))
+            self.assertTrue(np.array_equal(rmesh.labels[inv], mesh.labels))
+            self.assertTrue(np.array_equal(rmesh.coordinates, mesh.coordinates[:,fwd]))
+            self.assertTrue(np.array_equal(rmesh.prop('z'), mesh.prop('z')[fwd]))
+            # label-based lookups refer to the same vertices
+            u = mesh.labels[7]
+            self.assertEqual(rmesh.tess.index[u], inv[7])
+            # the faces are written in the same labels
+            fs = lambda t: sorted(map(tuple, np.sort(t.faces, axis=0).T))
+            self.assertEqual(fs(rmesh.tess), fs(mesh.tess))
+            (a, b) = (mesh.tess.adjacency_matrix, rmesh.tess.adjacency_matrix)
+            self.assertEqual((a[fwd][:,fwd] != b).nnz, 0)
+    def test_reorder_improves_bandwidth(self):
+        mesh = shuffled_icosphere()
+        (rmesh, _, _) = mesh.reorder('rcm')
+        bw = lambda m: np.max(np.abs(np.diff(np.sort(m.tess.indexed_edges, axis=0), axis=0)))
+        self.assertLess(bw(rmesh), bw(mesh) / 4)
+    def test_reorder_open_mesh(self):
+        mesh = shuffled_icosphere()
+        band = mesh.submesh(np.where(np.abs(mesh.coordinates[2]) < 60)[0])
+        (rband, fwd, inv) = band.reorder('rcm')
+        # the boundary and the label lookups refer to the same vertices
+        bv = rband.tess.boundary_vertices
+        self.assertTrue(len(bv) > 0)
+        self.assertTrue(np.array_equal(np.sort(bv), band.tess.boundary_vertices))
+        self.assertTrue(np.array_equal(rband.tess.index(bv), inv[band.tess.index(bv)]))
+        self.assertTrue(np.array_equal(rband.tess.labels[rband.tess.index(bv)], bv))
+        for k in ('areas', 'gaussian', 'mean', 'k1', 'k2'):
+            (c, rc) = (band.vertex_curvature[k], rband.vertex_curvature[k])
+            self.assertTrue(np.allclose(rc, c[fwd]))
+    def test_open_mesh_gaussian_curvature(self):
+        ico = geo.icosphere(3)
+        band = ico.submesh(np.where(np.abs(ico.coordinates[2]) < 60)[0])
+        (rband, fwd, _) = band.reorder('rcm')
+        self.assertFalse(np.all(np.diff(rband.labels) > 0))
+        (k, rk) = (band.vertex_curvature['gaussian'], rband.vertex_curvature['gaussian'])
+        self.assertTrue(np.allclose(rk, k[fwd]))
+    def test_unknown_labels(self):
+        tess = geo.Tesselation([[0,1,2], [1,2,3]])
+        self.assertRaises(ValueError, lambda:geo.Tesselation([[0,1,2]], labels=[0,1]).labels)
+        self.assertTrue(np.array_equal(tess.indexed_faces, [[0,1], [1,2], [2,3]]))
+
+class TestCacheReuse(unittest.TestCase):
+    def test_property_changes_reuse_caches(self):
+        mesh = geo.icosphere(3)
+        vals = {k:getattr(mesh, k) for k in ('face_hash', 'vertex_hash', 'face_normals',
+                                             'vertex_normals', 'face_areas')}
+        tvals = {k:getattr(mesh.tess, k) for k in ('indexed_faces', 'indexed_edges', 'edges',
+                                                   'adjacency_matrix')}
+        for m in (mesh.with_prop(z=mesh.coordinates[2]),
+                  mesh.with_prop(z=mesh.coordinates[2]).wout_prop('z'),
+                  mesh.with_meta(note='copy')):
+            for (k,v) in vals.items(): self.assertIs(getattr(m, k), v, k)
+            self.assertIs(m.tess, mesh.tess)
+            for (k,v) in tvals.items(): self.assertIs(getattr(m.tess, k), v, k)
+        # tess-derived values are also shared when only the coordinates change
+        m = mesh.copy(coordinates=mesh.coordinates * 2)
+        self.assertIs(m.tess, mesh.tess)
+        for (k,v) in tvals.items(): self.assertIs(getattr(m.tess, k), v, k)
+
+class TestSpatialHashRefit(unittest.TestCase):
+    def test_moved_copy_refits_face_bvh(self):
+        mesh = geo.icosphere(3)
+        bvh = mesh.face_bvh
+        x = mesh.coordinates * (1 + 0.01*np.random.RandomState(0).randn(mesh.vertex_count))
+        moved = mesh.copy(coordinates=x)
+        self.assertIs(moved.face_bvh['order'], bvh['order'])
+        fresh = geo.Mesh(mesh.tess, x)
+        for k in ('face_id', 't'):
+            u = np.random.RandomState(1).randn(50, 3)
+            self.assertTrue(np.array_equal(moved.ray_intersections(np.zeros((50,3)), u)[k],
+                                           fresh.ray_intersections(np.zeros((50,3)), u)[k]))
+        # the kd-trees are always rebuilt as plain scipy trees
+        self.assertIsInstance(moved.vertex_hash, type(mesh.vertex_hash))
+        self.assertTrue(np.array_equal(moved.vertex_hash.data, x.T))
+    def test_changed_dimension_rebuilds(self):
+        mesh = geo.icosphere(2)
+        mesh.face_bvh
+        flat = mesh.copy(coordinates=mesh.coordinates[:2])
+        self.assertIsNone(flat._spatial_hashes)
+        self.assertEqual(flat.face_bvh['lower'].shape[1], 2)
+        self.assertIsNone(geo.mesh._refit_bvh(mesh.face_bvh, flat.face_coordinates, 2.0))
+
+class TestNativeFormat(unittest.TestCase):
+    def test_round_trip_with_derived_values(self):
+        import os, shutil, tempfile
+        mesh = geo.icosphere(3).with_prop(curv=np.linspace(0, 1, 642))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            flnm = os.path.join(tmpdir, 'mesh.ny.npz')
+            geo.save_neuropythy(flnm, mesh, derived=True)
+            loaded = geo.load_neuropythy(flnm)
+            self.assertIsNotNone(loaded._precomputed)
+            for k in ('face_normals', 'vertex_normals', 'face_areas', 'edge_lengths'):
+                self.assertTrue(np.allclose(getattr(loaded, k), getattr(mesh, k)), k)
+            for k in ('labels', 'indexed_faces', 'edges', 'indexed_edges'):
+                self.assertTrue(np.array_equal(getattr(loaded.tess, k), getattr(mesh.tess, k)), k)
+            self.assertTrue(all(type(k) is str for k in loaded.properties.keys()))
+            self.assertTrue(all(type(k) is str for k in loaded.meta_data.keys()))
+            # values precomputed for the saved coordinates are not used by moved copies
+            moved = loaded.copy(coordinates=loaded.coordinates * 2)
+            self.assertIsNone(moved._precomputed)
+            self.assertTrue(np.allclose(moved.face_areas, mesh.face_areas * 4))
+        finally: shutil.rmtree(tmpdir)
+
+class TestSelfIntersections(unittest.TestCase):
+    def test_pushed_vertex(self):
+        mesh = geo.icosphere(3)
+        self.assertEqual(len(mesh.self_intersections()), 0)
+        # push a vertex through its fan, past one of its neighbors
+        fs = mesh.tess.indexed_faces
+        nei = np.setdiff1d(fs[:, np.any(fs == 100, axis=0)], [100])[0]
+        x = np.array(mesh.coordinates)
+        y = 1.5*x[:,nei] - 0.5*x[:,100]
+        x[:,100] = y * np.linalg.norm(x[:,100]) / np.linalg.norm(y)
+        ii = mesh.copy(coordinates=x).self_intersections()
+        self.assertGreater(len(ii), 0)
+        nshared = np.sum(fs[:,None,ii[:,0]] == fs[None,:,ii[:,1]], axis=(0,1))
+        self.assertTrue(np.any(nshared > 0))
+    def test_shared_vertices(self):
+        # two triangles that share a vertex and cross each other
+        mesh = geo.Mesh([[0,1,2], [0,3,4]],
+                        [[0,0,0], [1,0,0], [0.3,1,0], [0.5,0.5,-1], [0.5,0.5,1]])
+        self.assertTrue(np.array_equal(mesh.self_intersections(), [[0,1]]))
+        # two triangles that share an edge, either folded onto each other or not
+        x = [[0,0,0], [1,0,0], [0.3,1,0], [0.6,1,0]]
+        self.assertTrue(np.array_equal(geo.Mesh([[0,1,2], [0,1,3]], x).self_intersections(),
+                                       [[0,1]]))
+        x[3] = [0.6,-1,0]
+        self.assertEqual(len(geo.Mesh([[0,1,2], [0,1,3]], x).self_intersections()), 0)
+
+class TestPyramid(unittest.TestCase):
+    @staticmethod
+    def topology(tess):
+        # (Euler characteristic, boundary loop count, max faces per edge) of a tesselation
+        import scipy.sparse as sps
+        from scipy.sparse.csgraph import connected_components
+        (n, fs) = (tess.vertex_count, tess.indexed_faces)
+        es = np.sort(np.hstack([fs[[0,1]], fs[[1,2]], fs[[2,0]]]), axis=0)
+        (es, cnt) = np.unique(es[0]*n + es[1], return_counts=True)
+        (u, v) = (es[cnt == 1] // n, es[cnt == 1] % n)
+        g = sps.coo_matrix((np.ones(len(u)), (u, v)), shape=(n, n))
+        comps = connected_components(g, directed=False)[1]
+        loops = len(np.unique(comps[np.union1d(u, v)]))
+        return (n - len(es) + tess.face_count, loops, np.max(cnt))
+    def test_levels_keep_topology(self):
+        ico = geo.icosphere(4)
+        band = ico.submesh(np.where(np.abs(ico.coordinates[2]) < 60)[0])
+        for mesh in (ico, band):
+            lvls = mesh.pyramid()
+            self.assertGreater(len(lvls), 2)
+            topo = self.topology(mesh.tess)
+            for dat in lvls[1:]:
+                self.assertEqual(self.topology(dat['tess']), topo)
+                self.assertTrue(np.allclose(dat['prolongation'].sum(axis=1), 1))
+    def test_properties_are_restricted(self):
+        mesh = geo.icosphere(3)
+        mesh = mesh.with_prop(z=mesh.coordinates[2], label=np.arange(mesh.vertex_count))
+        (l0, l1) = mesh.pyramid(levels=2)
+        (m1, rmtx) = (l1['mesh'], l1['restriction'])
+        self.assertTrue(np.allclose(m1.prop('z'), rmtx.dot(mesh.prop('z'))))
+        self.assertTrue(np.array_equal(m1.prop('label'), l1['vertices']))
+    def test_cached_coarsening_keeps_own_properties(self):
+        tess = geo.icosphere(3).tess
+        n = tess.vertex_count
+        (ta, tb) = (tess.with_prop(a=np.arange(n)), tess.with_prop(b=-np.arange(n)))
+        (ca, cb) = (ta.coarsen(), tb.coarsen())
+        self.assertIs(ca['prolongation'], cb['prolongation'])
+        self.assertTrue(np.array_equal(ca['tess'].prop('a'), ca['vertices']))
+        self.assertTrue(np.array_equal(cb['tess'].prop('b'), -cb['vertices']))
+        self.assertNotIn('a', cb['tess'].properties)
+        self.assertNotIn('b', ca['tess'].properties)
+
+class TestIcosphere(unittest.TestCase):
+    def test_radii_share_unit_spheres(self):
+        (a, b) = (geo.icosphere(3), geo.icosphere(3, 2.5))
+        self.assertIs(a.tess, b.tess)
+        self.assertTrue(np.allclose(np.sqrt(np.sum(a.coordinates**2, axis=0)), 100))
+        self.assertTrue(np.allclose(a.coordinates / 40.0, b.coordinates))
+        self.assertEqual(b.meta_data['radius'], 2.5)
+        self.assertTrue(all(pimms.is_int(k) for k in geo.mesh._icospheres))
+
+class TestInterpolateMany(unittest.TestCase):
+    def test_empty_topologies_and_dtypes(self):
+        topos = [geo.Topology(ico.tess, {'sphere': ico.coordinates})
+                 for k in (2, 3) for ico in [geo.icosphere(k)]]
+        (a, b) = [t.with_prop(x=t.registrations['sphere'].coordinates[0],
+                              name=np.asarray(['u', 'v'])[t.indices % 2])
+                  for t in topos]
+        self.assertEqual(a.interpolate_many([], 'x').shape, (0,))
+        self.assertEqual(a.interpolate_many([], 'x', direction='from').shape, (0, a.vertex_count))
+        self.assertEqual(a.interpolate_many([b, b], 'x').dtype, np.dtype(np.float))
+        res = a.interpolate_many([b], 'name', method='nearest')
+        self.assertEqual(res.dtype, a.prop('name').dtype)
+        # the vertices of the lower-order icosphere are the first vertices of the higher order
+        self.assertTrue(np.array_equal(res[:a.vertex_count], a.prop('name')))
+
+class TestMapProjection(unittest.TestCase):
+    def test_whole_mesh_projection_rebuilds_hashes(self):
+        mesh = geo.icosphere(3)
+        mesh.face_bvh
+        proj = geo.MapProjection(center=[1,0,0], method='equirectangular', radius=10)
+        flat = proj(mesh, cache=False)
+        self.assertEqual(flat.vertex_count, mesh.vertex_count)
+        self.assertIsNone(flat._spatial_hashes)
+        self.assertEqual(flat.face_bvh['lower'].shape[1], 2)
+    def test_project_many_shares_tesselation(self):
+        mesh = geo.icosphere(3)
+        (a, b) = (mesh.with_prop(a=np.arange(642)), mesh.with_prop(b=np.arange(642)))
+        proj = geo.MapProjection(center=[1,0,0], method='orthographic', radius=np.pi/3)
+        (fa, fb) = proj.project_many([a, b], cache=False)
+        self.assertIs(fa.tess, fb.tess)
+        self.assertIn('a', fa.properties)
+        self.assertNotIn('a', fb.properties)
+        self.assertTrue(np.array_equal(fb.prop('b'), proj(b, cache=False).prop('b')))
+
+if __name__ == '__main__': unittest.main()
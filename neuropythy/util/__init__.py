@@ -3,6 +3,7 @@
 # This file defines the general tools that are available as part of neuropythy.
 
 from .core import (CommandLineParser, ObjectWithMetaData, to_affine, simplex_summation_matrix,
-                   simplex_averaging_matrix, zinv, zdiv, library_path)
+                   simplex_averaging_matrix, zinv, zdiv, library_path,
+                   precision_policy, set_precision_policy, apply_precision, content_hash)
 
 
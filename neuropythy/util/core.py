@@ -8,7 +8,10 @@ import scipy.sparse                 as sps
 import pyrsistent                   as pyr
 import nibabel                      as nib
 import nibabel.freesurfer.mghformat as fsmgh
-import types, inspect, pimms, os
+import types, inspect, pimms, os, sys, six, hashlib, weakref
+
+if sys.version_info[0] == 3: from   collections import abc as colls
+else:                        import collections            as colls
 
 @pimms.immutable
 class CommandLineParser(object):
@@ -335,6 +338,128 @@ def zdiv(a, b, null=0):
     res[z] = null
     return res
 
+# The storage precision policy of neuropythy: 'double' (the default) leaves data in the types in
+# which it was given (generally float64 and the platform int) while 'single' stores floating-point
+# data as float32, faces and vertex indices as int32, and other integer data (such as labels) in the
+# narrowest integer type that holds it.
+_precision_policy = 'double'
+def precision_policy():
+    '''
+    precision_policy() yields the current global storage precision policy of neuropythy, which is
+      either 'double' or 'single'; see set_precision_policy for more information.
+    '''
+    return _precision_policy
+def set_precision_policy(policy):
+    '''
+    set_precision_policy(policy) sets the global storage precision policy of neuropythy to the
+      given policy and yields the previous policy. The policy may be either 'double' (the default),
+      in which case data are stored in the types in which they are given, or 'single', in which
+      case mesh coordinates, derived geometry (normals, lengths, areas, interpolation weights), and
+      floating-point properties are stored as float32, faces and vertex labels/indices are stored
+      as int32, and integer properties (such as visual area labels) are stored in the narrowest
+      integer type that can hold them (e.g., int8).
+    The policy is applied when objects are created; existing objects are not changed, but they may
+    be converted using obj.with_precision(policy). Accuracy-critical calculations (e.g., barycentric
+    coordinates and containment tests) are always performed in double precision.
+    '''
+    global _precision_policy
+    if not pimms.is_str(policy) or policy.lower() not in ('double', 'single'):
+        raise ValueError('precision policy must be \'double\' or \'single\'')
+    (old, _precision_policy) = (_precision_policy, policy.lower())
+    return old
+def apply_precision(x, kind='data', policy=None):
+    '''
+    apply_precision(x) yields the array x converted to the types required by the current storage
+      precision policy (see set_precision_policy); under the 'double' policy, x is returned as-is.
+    The optional argument kind specifies what x represents: 'float' converts only floating-point
+    data (e.g., coordinates); 'index' converts integer data to the policy's index type (e.g., faces
+    and vertex labels); and 'data' (the default) converts floating-point data and narrows integer
+    data (e.g., properties). The optional argument policy may be given to use a policy other than
+    the global policy; if policy is explicitly 'double', then single-precision and narrow integer
+    data are converted back to float64 and the platform int.
+    '''
+    if policy is None:
+        if _precision_policy == 'double': return x
+        policy = _precision_policy
+    policy = policy.lower()
+    if policy == 'double':
+        x = np.asarray(x)
+        if np.issubdtype(x.dtype, np.floating):
+            return x if x.dtype == np.float64 or kind == 'index' else x.astype(np.float64)
+        elif not np.issubdtype(x.dtype, np.integer) or kind == 'float': return x
+        else: return x if x.dtype == np.int else x.astype(np.int)
+    elif policy != 'single': raise ValueError('unrecognized precision policy: %s' % policy)
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.floating):
+        return x if kind == 'index' or x.dtype == np.float32 else x.astype(np.float32)
+    elif not np.issubdtype(x.dtype, np.integer) or kind == 'float': return x
+    elif kind == 'index':
+        return x if x.dtype == np.int32 else x.astype(np.int32)
+    elif kind != 'data': raise ValueError('unrecognized data kind: %s' % kind)
+    elif x.size == 0: return x
+    (mn, mx) = (np.min(x), np.max(x))
+    for t in (np.int8, np.int16, np.int32, np.int64):
+        ii = np.iinfo(t)
+        if ii.min <= mn and mx <= ii.max: return x if x.dtype == t else x.astype(t)
+    return x
+
+# Content hashes of read-only arrays are remembered, by id, for as long as the array exists
+_content_hash_chunk_size = 1 << 22
+_array_hashes = {}
+def _is_frozen(a):
+    # true if neither a nor any array whose memory it views can be written
+    while isinstance(a, np.ndarray):
+        if a.flags.writeable: return False
+        a = a.base
+    return True
+def _array_content_hash(a):
+    h = hashlib.md5()
+    h.update(('ndarray:%s:%s:' % (a.dtype.str, a.shape)).encode('utf-8'))
+    if a.dtype == np.dtype('O'):
+        for u in a.flat: h.update(content_hash(u).encode('utf-8'))
+    elif a.size > 0:
+        # hash the raw buffer in chunks so that non-contiguous arrays are never copied whole
+        a = a.reshape((a.shape[0], -1)) if len(a.shape) > 1 else a.reshape((-1, 1))
+        step = max(1, _content_hash_chunk_size // max(1, a.shape[1] * a.itemsize))
+        for i in range(0, a.shape[0], step):
+            h.update(np.ascontiguousarray(a[i:i+step]).view(np.uint8))
+    return h.hexdigest()
+def content_hash(x):
+    '''
+    content_hash(x) yields a hexadecimal string that identifies the content of x, for use as a key
+      in caches that should not depend on the identity of objects. Arrays with the same dtype, shape,
+      and values (regardless of memory layout) yield the same hash; tuples, lists, and maps are
+      hashed by their elements; scipy sparse matrices by their dtype, shape, and nonzero elements;
+      and strings, numbers, and None by their values. Any object that has a content_hash attribute,
+      such as a Tesselation, Mesh, or Topology, yields that value.
+    The hashes of read-only arrays (e.g., the parameters of immutable neuropythy objects) are
+    remembered for as long as the arrays exist, so they are only calculated once.
+    '''
+    if isinstance(x, np.ndarray):
+        k = id(x)
+        memo = _array_hashes.get(k)
+        if memo is not None and memo[0]() is x: return memo[1]
+        h = _array_content_hash(x)
+        if _is_frozen(x):
+            _array_hashes[k] = (weakref.ref(x, lambda r,k=k: _array_hashes.pop(k, None)), h)
+        return h
+    h = getattr(x, 'content_hash', None)
+    if pimms.is_str(h): return h
+    if pimms.is_str(x): s = 'str:' + x
+    elif x is None or isinstance(x, (bool, np.bool_)) or pimms.is_number(x):
+        s = 'num:' + repr(x.item() if isinstance(x, np.generic) else x)
+    elif sps.issparse(x):
+        x = x.tocsr()
+        x.sum_duplicates()
+        s = 'sparse:' + ':'.join(content_hash(u) for u in (x.shape, x.data, x.indices, x.indptr))
+    elif isinstance(x, colls.Mapping):
+        s = 'map:' + ':'.join(content_hash(k) + '=' + content_hash(v)
+                              for (k,v) in sorted(six.iteritems(x), key=lambda kv:repr(kv[0])))
+    elif isinstance(x, (tuple, list)):
+        s = 'seq:' + ':'.join(content_hash(u) for u in x)
+    else: raise ValueError('cannot calculate the content hash of object of type %s' % type(x))
+    return hashlib.md5(s.encode('utf-8')).hexdigest()
+
 def library_path():
     '''
     library_path() yields the path of the neuropythy library.
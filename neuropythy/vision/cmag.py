@@ -80,8 +80,8 @@ def cmag(mesh, retinotopy='any', surface=None, to='vertices'):
     # get the visual coordinates at each face also
     vx = np.asarray([vcoords[:,f] for f in faces])
     # we already have enough data to calculate areal magnification
-    s_areas = geo.triangle_area(*sx)
-    v_areas = geo.triangle_area(*vx)
+    s_areas = geo.batch_triangle_area(np.transpose(sx, (2,0,1)))
+    v_areas = geo.batch_triangle_area(np.transpose(vx, (2,0,1)))
     arl_mag = s_areas * zinv(v_areas)
     # calculate the gradient at each triangle; this array is dimension 2 x 2 x m where m is the
     # number of triangles; the first dimension is (vx,vy) and the second dimension is (fx,fy); fx
@@ -156,10 +156,10 @@ def neighborhood_cortical_magnification(mesh, coordinates):
         # areal is easy
         voronoi_vis = (pts_vis - x0col_vis) * 0.5 + x0col_vis
         voronoi_srf = (pts_srf - x0col_srf) * 0.5 + x0col_srf
-        area_vis = np.sum([geo.triangle_area(x0_vis, a, b)
-                           for (a,b) in zip(voronoi_vis.T, np.roll(voronoi_vis, 1, axis=1).T)])
-        area_srf = np.sum([geo.triangle_area(x0_srf, a, b)
-                           for (a,b) in zip(voronoi_srf.T, np.roll(voronoi_srf, 1, axis=1).T)])
+        (area_vis, area_srf) = [
+            np.sum(geo.batch_triangle_area(np.transpose(
+                np.broadcast_arrays(x0col, vor, np.roll(vor, 1, axis=1)), (2,0,1))))
+            for (x0col, vor) in [(x0col_vis, voronoi_vis), (x0col_srf, voronoi_srf)]]
         res[idx,2] = np.inf if np.isclose(area_vis, 0) else area_srf/area_vis
         # radial and tangentual we do together because they are very similar:
         # find the intersection lines then add up their distances along the cortex
@@ -266,9 +266,8 @@ def path_cortical_magnification(mesh, path, mask=None, return_all=False,
         for edge in map(tuple, map(sorted, [(a,b), (c,a), (b,c)])):
             if edge not in edge_idx: edge_idx[edge] = set([])
             edge_idx[edge].add(tid)
-    # we may need this to find arbitrary intersections:
-    all_edges = edge_idx.keys()
-    all_segs = np.asarray([vis_reg.coordinates[:,us] for us in np.transpose(all_edges)])
+    # we may need to find arbitrary intersections; these use the mesh's edge hash
+    all_edges = [tuple(sorted(e)) for e in vis_reg.tess.edges.T]
     for (tid,next_tid,pt,next_pt) in zip(tids, np.roll(tids,-1), pth, np.roll(pth,-1,axis=0)):
         # This could be the last point or there could be a break;
         # We handle breaks as separate paths
@@ -316,14 +315,14 @@ def path_cortical_magnification(mesh, path, mask=None, return_all=False,
             if tid is None:
                 if len(ss) > 1: steps.append(ss)
                 ss = []
-                isect = np.asarray(geo.segment_intersection_2D((pt0, next_pt), all_segs)).T
+                ts = vis_reg.segment_intersections(pt0, next_pt)
                 # we want to ignore intersections in the current triangle tid0
-                isect_idcs = [idc for idc in np.where(np.logical_not(np.isnan(isect[:,0])))[0]
-                              if edge_idx[all_edges[idc]] != tid0_set]
-                if len(isect_idcs) == 0:
+                ii = [k for (k,idc) in enumerate(ts.indices) if edge_idx[all_edges[idc]] != tid0_set]
+                if len(ii) == 0:
                     # nothing left but the last point
                     break
-                isect = isect[isect_idcs]
+                isect_idcs = ts.indices[ii]
+                isect = pt0 + np.outer(ts.data[ii], next_pt - pt0)
                 pts_by_nearness = sorted(
                     [(i,isct,d) for (i,isct) in enumerate(isect) for d in [np.dot(isct-pt, projdir)]
                      if d > 0 and not np.isclose(d, 0)],
@@ -388,163 +387,47 @@ def path_cortical_magnification(mesh, path, mask=None, return_all=False,
 def isoangular_path(mesh, pathtype, val, mask=None, min_segment_length=4,
                     polar_angle='polar_angle', eccentricity='eccentricity'):
     '''
-    isoangular_path(mesh, pathtype, val) yields a list of isoangular paths, each of whichs is given
-      as a tuple (spath, vpath) of the points along the cortical surface (spath, n x 3) and the
-      points in the visual field (vpath, n x 2).  The path must be specified as either 'angle' or
-      'eccen' followed by a polar angle or eccentricity value.
+    isoangular_path(mesh, pathtype, val) yields a tuple (spaths, vpaths) of the isoangular paths
+      on the given mesh; spaths is a list of the paths' points along the cortical surface (each
+      n x 3) and vpaths is a list of the same paths' points in the visual field (each n x 2). The
+      path must be specified as either 'angle' or 'eccen' followed by a polar angle or eccentricity
+      value. Paths that form closed loops end with a repeat of their first point.
 
     The following options are accepted:
       * mask (default: None) may be a boolean mask of vertices to include in the calculation.
       * min_segment_length (default: 4) the minimum number of faces that need to be included in a
         path segment in order to be included in the result.
+
+    The paths are extracted by mesh.isolines(); see it for a version that yields compact arrays
+    and that handles many values at once.
     '''
     ang = extract_retinotopy_argument(mesh, 'polar_angle', polar_angle, default='predicted')
     ecc = extract_retinotopy_argument(mesh, 'eccentricity', eccentricity, default='predicted')
-    srf = mesh.coordinates.T
-    ids = np.asarray(range(len(srf)))
-    if mask is not None:
-        msk = np.where(mask)[0]
-        ids = ids[msk]
-        ang = ang[msk]
-        ecc = ecc[msk]
-        srf = srf[msk]
-    # edit out values we can't use
-    okays = [k for (k,i,a,e) in zip(range(len(ids)), ids, ang, ecc)
-             if np.issubdtype(type(a), np.number)
-             if np.issubdtype(type(e), np.number)]
-    if len(okays) != len(ids):
-        ids = ids[okays]
-        ang = ang[okays]
-        ecc = ecc[okays]
-        srf = srf[okays]
-    # okay; now we have the subset we can use; lets get the appropriate triangles...
-    okays = set(ids)
-    tris = np.asarray([f for f in mesh.tess.indexed_faces.T if all(a in okays for a in f)]).T
-    # in case anything wasn't connected by triangle:
-    okays = set(np.unique(tris))
-    idcs = [k for (k,i) in enumerate(ids) if i in okays]
-    ids = ids[idcs]
-    ang = ang[idcs]
-    ecc = ecc[idcs]
-    srf = srf[idcs]
-    okays = {i:k for (k,i) in enumerate(ids)}
-    # now we can recreate the triangles with proper id's
-    tris = np.asarray([[okays[a] for a in f] for f in tris.T]).T
-    # get the x/y coordinates in visual space
-    vis_coords = ecc * np.asarray([np.cos(np.pi/180*(90-ang)), np.sin(np.pi/180*(90-ang))])
-    vis_coords = vis_coords.T
-    # okay, setup the topology/registrations
-    tess = geo.Tesselation(tris)
-    srf_reg = tess.make_mesh(srf.T)
-    vis_reg = tess.make_mesh(vis_coords)
-    # now the Great Work begins...
-    # Find all triangles that intersect this particular angle line
+    (ang, ecc) = [np.asarray([u if np.issubdtype(type(u), np.number) else np.nan for u in x],
+                             dtype=np.float)
+                  for x in (ang, ecc)]
     pathtype = pathtype.lower()
-    trisect = None
     if pathtype in ['angle', 'polar_angle', 'radial', 'rad']:
         vals = ang
     elif pathtype in ['eccen', 'eccentricity', 'tangential', 'tan']:
         vals = ecc
     else:
         raise ValueError('Unrecognized pathtype: %s' % pathtype)
-    angsides = (np.sign(vals - val) + 1).astype(np.bool)
-    angsides = angsides.astype(np.int)
-    tris = tris.T
-    trisides = np.sum([angsides[tt] for tt in tris.T], axis=0)
-    trii = np.intersect1d(np.where(trisides > 0)[0], np.where(trisides < 3)[0])
-    # Make an adjacency list of these intersecting triangles
-    tadj = {}
-    tmp = {}
-    for (u,v,i) in zip(np.hstack((tris[trii,0], tris[trii,0], tris[trii,1])),
-                       np.hstack((tris[trii,1], tris[trii,2], tris[trii,2])),
-                       np.hstack((trii, trii, trii))):
-        # if (u/v) doesn't cross the iso-line, ignore it
-        if angsides[u] == angsides[v] or vals[u] == val or vals[v] == val:
-            continue
-        elif (v,u) in tmp:
-            k = tmp[(v,u)]
-            del tmp[(v,u)]
-            tadj[(i,k)] = (u,v)
-            tadj[(k,i)] = (u,v)
-        else:
-            tmp[(u,v)] = i
-    # Okay, now we stitch these together into segments; this is basically a union-find problem
-    seg = {ti:[ti] for ti in trii} # cluster end triangle
-    cls = {ti:ti   for ti in trii}
-    def _find(k):
-        kc = cls[k]
-        if k == kc or cls[kc] == kc: return kc
-        kcc = _find(kc)
-        cls[k] = kcc
-        return kcc
-    def _union(u, v):
-        uc = _find(u)
-        vc = _find(v)
-        if uc == vc: return
-        us = seg[uc]
-        vs = seg[vc]
-        (u0,ue) = (us[0],us[-1])
-        (v0,ve) = (vs[0],vs[-1])
-        # either u or v must be adjacent to the end of the other
-        if   u0 == u and v0 == v: (a,b) = (reversed(us), vs)
-        elif u0 == u and ve == v: (a,b) = (reversed(us), reversed(vs))
-        elif ue == u and v0 == v: (a,b) = (us,           vs)
-        elif ue == u and ve == v: (a,b) = (us,           reversed(vs))
-        else: return # nothing joined; can't connect at intersection
-        a = list(a)
-        b = list(b)
-        for bb in b: a.append(bb)
-        seg[uc] = a
-        seg[vc] = a
-        cls[vc] = uc
-        cls[u] = uc
-        cls[v] = uc
-    for (ti, tj) in tadj.iterkeys(): _union(ti, tj)
-    for ti       in trii: _find(ti)
-    # Okay, we should have the segments now...
-    clarr = np.asarray([cls[ti] for ti in trii])
-    seg_ids = np.unique(clarr)
-    seg_vis = []
-    seg_srf = []
+    # get the x/y coordinates in visual space
+    vis_coords = ecc * np.asarray([np.cos(np.pi/180*(90-ang)), np.sin(np.pi/180*(90-ang))])
+    ok = np.isfinite(ang) & np.isfinite(ecc)
+    if mask is not None:
+        msk = np.zeros(len(ok), dtype=np.bool)
+        msk[np.where(mask)[0]] = True
+        ok &= msk
+    iso = mesh.isolines(vals, val, mask=ok, parameters=vis_coords)
+    (srf, vis, offs) = (iso['coordinates'].T, iso['parameters'].T, iso['offsets'])
     if min_segment_length < 2: min_segment_length = 2
-    srf_coords = srf_reg.coordinates
-    for sid in seg_ids:
-        s = seg[sid]
-        if len(s) < min_segment_length: continue
-        # Okay, we want to walk through the triangles in order; make a list of the ordered edges
-        # handle the first triangle/segment start point
-        (u,v) = tadj[(s[0], s[1])]
-        w = np.setdiff1d(tris[s[0]], (u,v))[0]
-        if vals[w] == val:
-            pts_vis = [vis_coords[w]]
-            pts_srf = [srf_coords[w]]
-        else:
-            if angsides[w] != angsides[v]: u = v
-            w_frac = (vals[w] - val) / (vals[w] - vals[u])
-            u_frac = 1.0 - w_frac
-            pts_vis = [w_frac*vis_coords[w] + u_frac*vis_coords[u]]
-            pts_srf = [w_frac*srf_coords[w] + u_frac*srf_coords[u]]
-        # Okay, walk along the adjacent edges
-        for (s0,s1) in zip(s[:-1], s[1:]):
-            (u,v) = tadj[(s0,s1)]
-            v_frac = (vals[v] - val) / (vals[v] - vals[u])
-            u_frac = 1.0 - v_frac
-            pts_vis.append(v_frac*vis_coords[v] + u_frac*vis_coords[u])
-            pts_srf.append(v_frac*srf_coords[v] + u_frac*srf_coords[u])
-        # And finally handle the end-point
-        (u,v) = tadj[(s[-2], s[-1])]
-        w = np.setdiff1d(tris[s[-1]], (u,v))[0]
-        if vals[w] == val:
-            pts_vis.append(vis_coords[w])
-            pts_srf.append(srf_coords[w])
-        else:
-            if angsides[w] != angsides[v]: u = v
-            w_frac = (vals[w] - val) / (vals[w] - vals[u])
-            u_frac = 1.0 - w_frac
-            pts_vis.append(w_frac*vis_coords[w] + u_frac*vis_coords[u])
-            pts_srf.append(w_frac*srf_coords[w] + u_frac*srf_coords[u])
-        # Just append these points
-        seg_vis.append(pts_vis)
-        seg_srf.append(pts_srf)
-    # That's it!
+    seg_srf = []
+    seg_vis = []
+    for (k0, k1, closed, nf) in zip(offs[:-1], offs[1:], iso['closed'], iso['face_counts']):
+        if nf < min_segment_length: continue
+        ii = np.concatenate((np.arange(k0, k1), [k0])) if closed else np.arange(k0, k1)
+        seg_srf.append(srf[ii])
+        seg_vis.append(vis[ii])
     return (seg_srf, seg_vis)
@@ -577,6 +577,9 @@ def retinotopy_model(name='benson17', hemi=None,
     mdl = load_fmm_model(fname).persist()
     retinotopy_model.cache[tup] = mdl
     return mdl
+# Models are cached by the arguments that locate them rather than by a content hash (see
+# neuropythy.util.content_hash) because the cache exists to avoid finding and loading the model
+# file, and its content is not known until it has been loaded.
 retinotopy_model.cache = {}
 
 # Tools for retinotopy registration:
@@ -1081,7 +1084,9 @@ def calc_initial_state(cortex, model, empirical_retinotopy, resample=Ellipsis, p
         distorted by inflation, registration, and flattening from being sufficiently small to
         dominate the registration initially. The default value is Ellipsis, which specifies that the
         'fsaverage' or 'fsaverage_sym' resampling should be applied if the model is registered to
-        either of those, and otherwise no resampling should be applied.
+        either of those, and otherwise no resampling should be applied. The registration_map may
+        instead be resampled to an icosahedral sphere by giving 'ico' followed by its order, e.g.,
+        'ico6' (see neuropythy.geometry.icosphere); this does not require loading any subject.
       @ prior May specify an alternate registration to which the native mesh should be projected
         prior to flattening and registration. The default value, None, indicates that the model's
         default registration should just be used. Generally models will be registered to either the 
@@ -1121,7 +1126,19 @@ def calc_initial_state(cortex, model, empirical_retinotopy, resample=Ellipsis, p
         # and now, resampling...
     if resample is Ellipsis:
         resample = model_reg if model_reg == 'fsaverage' or model_reg == 'fsaverage_sym' else None
-    if resample is not None and resample is not False:
+    if pimms.is_str(resample) and resample.lower().startswith('ico'):
+        try: order = int(resample[3:])
+        except: raise ValueError('Could not parse icosphere resampling: %s' % resample)
+        # the interpolation matrices are cached for the native mesh (see icosphere_interpolation);
+        # as with interpolate, floating-point data are interpolated linearly and others by nearest
+        ico = native_mesh.icosphere_interpolation(order)
+        fwd = lambda u: ico['forward'] if pimms.is_vector(u, np.inexact) else \
+                        native_mesh.icosphere_interpolation(order, method='nearest')['forward']
+        props = native_mesh.properties
+        preregmesh = ico['icosphere'].with_prop(
+            {k:native_mesh.apply_interpolation(fwd(u), u)
+             for k in six.iterkeys(props) for u in [props[k]]})
+    elif resample is not None and resample is not False:
         # make a map from the appropriate hemisphere...
         preregmesh = getattr(nyfs.subject(resample), ch).registrations['native']
         # resample properties over...
@@ -1401,7 +1418,8 @@ def register_retinotopy(hemi,
       * resample (default: Ellipsis) specifies that the data should be resampled to one of
         the uniform meshes, 'fsaverage' or 'fsaverage_sym', prior to registration; if None then no
         resampling is performed; if Ellipsis, then auto-detect either fsaverage or fsaverage_sym
-        based on the model_hemi option (if it is None, fsaverage_sym, else fsaverage).
+        based on the model_hemi option (if it is None, fsaverage_sym, else fsaverage). An
+        icosahedral sphere, such as 'ico6', may also be given (see calc_initial_state).
     '''
     # create the imap
     m = retinotopy_registration(
@@ -52,7 +52,8 @@ setup(
               'neuropythy.registration',
               'neuropythy.vision',
               'neuropythy.graphics',
-              'neuropythy.commands'],
+              'neuropythy.commands',
+              'neuropythy.test'],
     include_package_data=True,
     package_data={
         '': ['LICENSE.txt',